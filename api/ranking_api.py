@@ -0,0 +1,245 @@
+# api/ranking_api.py
+#
+# Read-only HTTP/JSON service over the final ranking.
+#   python api/ranking_api.py --port 8765
+#
+# Endpoints (all GET, paginated with offset/limit):
+#   /health
+#   /top?k=25
+#   /drugs/<name>                 (candidate + paper evidence cards)
+#   /papers/<paper_id>/abstract
+#   /search?q=done
+#   /filter?min_final=&min_phase2=&min_confidence=&min_papers=&model=animal
+#
+# RankingIndex has the same methods as the endpoints, so tests and local
+# tooling can use it in-process as a stand-in for the service.
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from phase3.config import PAPERS_CSV_PATH, PAPER_STORE_PATH, ALIASES_PATH
+from phase3.phase3_dedup import load_aliases, alias_map
+from phase3.phase3_store import ensure_paper_store, load_paper_cards, load_abstract
+from common.ranking import sort_ranked
+
+FINAL_PATH = os.path.join(PROJECT_ROOT, "final_ranked_candidates.csv")
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 500
+
+def file_version(paths) -> str:
+    """Cheap content version: path + size + mtime of every input file."""
+    h = hashlib.sha1()
+    for p in paths:
+        if p and os.path.exists(p):
+            st = os.stat(p)
+            h.update(f"{p}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def json_records(df: pd.DataFrame) -> list:
+    """DataFrame -> JSON-safe records (NaN -> None)."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def page(items_fn, positions, offset: int, limit: int) -> dict:
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_LIMIT))
+    window = positions[offset:offset + limit]
+    return {
+        "total": int(len(positions)),
+        "offset": offset,
+        "limit": limit,
+        "items": items_fn(window),
+    }
+
+class RankingIndex:
+    """
+    In-memory index over final_ranked_candidates.csv and the paper store.
+    Everything is loaded once; queries are array/dict lookups.
+    """
+
+    def __init__(self, final_path: str = FINAL_PATH,
+                 papers_csv: str = PAPERS_CSV_PATH, store_path: str = PAPER_STORE_PATH):
+        df = pd.read_csv(final_path)
+        # Full ranking built once at load; every query reads positions from it
+        df = sort_ranked(df, "final_score").reset_index(drop=True)
+        df.insert(0, "rank", np.arange(1, len(df) + 1))
+
+        self.records = json_records(df)
+        self.keys = df["drug_name"].astype(str).str.strip().str.lower().to_numpy()
+        self.by_key = {}
+        for pos, key in enumerate(self.keys):
+            self.by_key.setdefault(key, pos)
+
+        # Columns used by /filter
+        self.final_score = df["final_score"].fillna(0.0).to_numpy(dtype=float)
+        self.phase2_score = df["phase2_score"].fillna(0.0).to_numpy(dtype=float)
+        self.confidence = df["confidence"].fillna(0.0).to_numpy(dtype=float)
+        self.n_papers = df["n_papers"].fillna(0).to_numpy(dtype=float)
+        self.models = df["models"].fillna("").astype(str)
+
+        # Paper evidence cards grouped by drug key
+        self.store_path = ensure_paper_store(papers_csv, store_path)
+        self.papers_by_key = {}
+        if self.store_path:
+            cards = load_paper_cards(self.store_path)
+            cards["key"] = cards["drug"].astype(str).str.strip().str.lower()
+            for key, grp in cards.groupby("key", sort=False):
+                self.papers_by_key[key] = json_records(grp.drop(columns=["key"]))
+
+        # Aliases share the evidence of the representative Phase 3 mined
+        self.aliases = {k: v.strip().lower() for k, v in alias_map(load_aliases(ALIASES_PATH)).items()}
+
+        self.version = file_version([final_path, self.store_path, ALIASES_PATH])
+
+    def _items(self, positions) -> list:
+        return [self.records[i] for i in positions]
+
+    def health(self) -> dict:
+        return {"status": "ok", "candidates": len(self.records), "version": self.version}
+
+    def top(self, k: int = DEFAULT_LIMIT, offset: int = 0, limit: int = DEFAULT_LIMIT) -> dict:
+        positions = np.arange(min(max(k, 0), len(self.records)))
+        return page(self._items, positions, offset, limit)
+
+    def drug(self, name: str):
+        pos = self.by_key.get(str(name).strip().lower())
+        if pos is None:
+            return None
+        key = self.aliases.get(self.keys[pos], self.keys[pos])
+        return {**self.records[pos], "papers": self.papers_by_key.get(key, [])}
+
+    def abstract(self, paper_id: int):
+        if not self.store_path:
+            return None
+        abstract = load_abstract(paper_id, self.store_path)
+        if abstract is None:
+            return None
+        return {"paper_id": paper_id, "abstract": abstract}
+
+    def search(self, q: str, offset: int = 0, limit: int = DEFAULT_LIMIT) -> dict:
+        """Case-insensitive substring search; prefix matches rank first."""
+        q = (q or "").strip().lower()
+        if not q:
+            return page(self._items, np.arange(0), offset, limit)
+        hits = np.flatnonzero(np.char.find(self.keys.astype(str), q) >= 0)
+        prefix = np.char.startswith(self.keys[hits].astype(str), q)
+        positions = np.concatenate([hits[prefix], hits[~prefix]])
+        return page(self._items, positions, offset, limit)
+
+    def filter(self, min_final: float = 0.0, min_phase2: float = 0.0, min_confidence: float = 0.0,
+               min_papers: float = 0.0, model: str = None,
+               offset: int = 0, limit: int = DEFAULT_LIMIT) -> dict:
+        mask = (
+            (self.final_score >= min_final) &
+            (self.phase2_score >= min_phase2) &
+            (self.confidence >= min_confidence) &
+            (self.n_papers >= min_papers)
+        )
+        if model:
+            mask &= self.models.str.split(";").apply(lambda ms: model in ms).to_numpy(dtype=bool)
+        return page(self._items, np.flatnonzero(mask), offset, limit)
+
+def make_handler(index: RankingIndex):
+    """Binds a request handler class to one loaded index."""
+
+    class RankingHandler(BaseHTTPRequestHandler):
+        server_version = "NeuroScreenAPI/1.0"
+
+        def _send(self, status: int, payload=None, etag: str = None):
+            body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+
+            # Responses are a pure function of (data version, URL)
+            etag = '"' + hashlib.sha1(f"{index.version}:{self.path}".encode("utf-8")).hexdigest()[:20] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, etag=etag)
+                return
+
+            try:
+                offset = int(qs.get("offset", 0))
+                limit = int(qs.get("limit", DEFAULT_LIMIT))
+
+                if parts == ["health"]:
+                    result = index.health()
+                elif parts == ["top"]:
+                    result = index.top(int(qs.get("k", DEFAULT_LIMIT)), offset, limit)
+                elif len(parts) == 2 and parts[0] == "drugs":
+                    result = index.drug(parts[1])
+                elif len(parts) == 3 and parts[0] == "papers" and parts[2] == "abstract":
+                    result = index.abstract(int(parts[1]))
+                elif parts == ["search"]:
+                    result = index.search(qs.get("q", ""), offset, limit)
+                elif parts == ["filter"]:
+                    result = index.filter(
+                        min_final=float(qs.get("min_final", 0)),
+                        min_phase2=float(qs.get("min_phase2", 0)),
+                        min_confidence=float(qs.get("min_confidence", 0)),
+                        min_papers=float(qs.get("min_papers", 0)),
+                        model=qs.get("model"),
+                        offset=offset,
+                        limit=limit
+                    )
+                else:
+                    self._send(404, {"error": f"unknown endpoint: {url.path}"})
+                    return
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+
+            if result is None:
+                self._send(404, {"error": "not found"})
+                return
+            self._send(200, result, etag=etag)
+
+        def log_message(self, format, *args):
+            # Keep high-QPS runs quiet
+            pass
+
+    return RankingHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the final candidate ranking as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--final", default=FINAL_PATH, help="final_ranked_candidates.csv path")
+    args = parser.parse_args()
+
+    print(" Loading ranking index...")
+    index = RankingIndex(args.final)
+    print(f" Indexed {len(index.records)} candidates, {len(index.papers_by_key)} with papers")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(index))
+    print(f" Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
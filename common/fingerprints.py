@@ -0,0 +1,261 @@
+# common/fingerprints.py
+#
+# Structural similarity search over SMILES.
+#  - Morgan fingerprints via RDKit (required: without it there is no
+#    structural fingerprint, and callers leave analogs out; see rdkit_available)
+#  - fingerprints packed into uint64 words: 2048 bits = 32 words per compound
+#  - Tanimoto = popcount(a & b) / (popcount(a) + popcount(b) - popcount(a & b)),
+#    computed over row blocks with vectorized popcount
+#  - persisted as .npz; optional multiprocessing for building and batch queries
+#
+# CLI (larger libraries):
+#   python -m common.fingerprints build library.csv library_fps.npz [--smiles-col SMILES] [--name-col name]
+#   python -m common.fingerprints query library_fps.npz "CCO..." [-k 10]
+
+import os
+import hashlib
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+from common.ranking import top_k_positions
+
+NBITS = 2048
+RADIUS = 2
+BLOCK_ROWS = 1 << 16   # database rows per popcount block (bounds temporary memory)
+
+# ------------------------------
+# Popcount
+# ------------------------------
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a (..., n_words) uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int32)
+    bytes_ = words.view(np.uint8)
+    return _POP8[bytes_].sum(axis=-1, dtype=np.int32)
+
+# ------------------------------
+# Fingerprints
+# ------------------------------
+_MORGAN = {}
+
+def rdkit_available() -> bool:
+    try:
+        import rdkit  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def fingerprint_method() -> str:
+    """Fingerprint kind recorded with an index; raises ImportError without RDKit."""
+    if not rdkit_available():
+        raise ImportError("structural fingerprints need RDKit (pip install rdkit)")
+    return "morgan"
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    return np.packbits(bits.astype(np.uint8), bitorder="little").view("<u8")
+
+def _morgan_bits(smiles: str, nbits: int, radius: int) -> np.ndarray:
+    from rdkit import Chem, RDLogger
+    from rdkit.Chem import rdFingerprintGenerator
+
+    if (nbits, radius) not in _MORGAN:
+        RDLogger.DisableLog("rdApp.*")
+        _MORGAN[(nbits, radius)] = rdFingerprintGenerator.GetMorganGenerator(radius=radius, fpSize=nbits)
+    mol = Chem.MolFromSmiles(smiles) if smiles else None
+    if mol is None:
+        return np.zeros(nbits, dtype=bool)
+    return _MORGAN[(nbits, radius)].GetFingerprintAsNumPy(mol).astype(bool)
+
+def smiles_fingerprint(smiles: str, nbits: int = NBITS, radius: int = RADIUS, method: str = None) -> np.ndarray:
+    """Packed uint64 fingerprint (nbits / 64 words); invalid or empty SMILES give all zeros."""
+    smiles = smiles if isinstance(smiles, str) else ""
+    method = method or fingerprint_method()
+    if method != "morgan":
+        raise ValueError(f"unsupported fingerprint method {method!r}")
+    return _pack(_morgan_bits(smiles.strip(), nbits, radius))
+
+def _fingerprint_chunk(args):
+    smiles, nbits, radius, method = args
+    return np.stack([smiles_fingerprint(s, nbits, radius, method) for s in smiles]) if smiles \
+        else np.zeros((0, nbits // 64), dtype=np.uint64)
+
+def fingerprint_matrix(smiles, nbits: int = NBITS, radius: int = RADIUS,
+                       method: str = None, processes: int = None) -> np.ndarray:
+    """(n, nbits / 64) uint64 matrix; processes > 1 splits the SMILES across a Pool."""
+    smiles = list(smiles)
+    method = method or fingerprint_method()
+    if not processes or processes <= 1 or len(smiles) < 1000:
+        return _fingerprint_chunk((smiles, nbits, radius, method))
+
+    step = -(-len(smiles) // (processes * 4))
+    chunks = [(smiles[i:i + step], nbits, radius, method) for i in range(0, len(smiles), step)]
+    with Pool(processes) as pool:
+        return np.concatenate(pool.map(_fingerprint_chunk, chunks))
+
+# ------------------------------
+# Index
+# ------------------------------
+_POOL_INDEX = None
+
+def _init_pool(index):
+    global _POOL_INDEX
+    _POOL_INDEX = index
+
+def _query_chunk(args):
+    queries, k, exclude = args
+    return _POOL_INDEX.query_many(queries, k, exclude=exclude)
+
+class FingerprintIndex:
+    """Packed fingerprints + names, with Tanimoto top-K queries."""
+
+    def __init__(self, fps: np.ndarray, keys, method: str, nbits: int = NBITS,
+                 radius: int = RADIUS, source_hash: str = ""):
+        self.fps = np.ascontiguousarray(fps, dtype=np.uint64)
+        self.keys = np.asarray(keys, dtype=object)
+        self.counts = popcount_rows(self.fps)
+        self.method = method
+        self.nbits = nbits
+        self.radius = radius
+        self.source_hash = source_hash
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, keys, smiles, nbits: int = NBITS, radius: int = RADIUS, processes: int = None):
+        keys, smiles = list(keys), list(smiles)
+        method = fingerprint_method()
+        fps = fingerprint_matrix(smiles, nbits, radius, method, processes)
+        return cls(fps, keys, method, nbits, radius, source_hash(keys, smiles, method, nbits, radius))
+
+    def similarities(self, fp: np.ndarray) -> np.ndarray:
+        """Tanimoto of one packed fingerprint against every indexed compound."""
+        q_count = popcount_rows(fp)
+        sims = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.fps[start:start + BLOCK_ROWS]
+            inter = popcount_rows(block & fp)
+            union = self.counts[start:start + BLOCK_ROWS] + q_count - inter
+            np.divide(inter, union, out=sims[start:start + len(block)], where=union > 0)
+            sims[start:start + len(block)][union == 0] = 0.0
+        return sims
+
+    def query(self, fp: np.ndarray, k: int = 10, exclude: int = None):
+        """(positions, similarities) of the k most similar compounds, best first."""
+        sims = self.similarities(fp)
+        if exclude is not None and 0 <= exclude < len(sims):
+            sims[exclude] = -1.0
+        pos = top_k_positions(sims, k)
+        pos = pos[sims[pos] >= 0]
+        return pos, sims[pos]
+
+    def query_smiles(self, smiles: str, k: int = 10):
+        return self.query(smiles_fingerprint(smiles, self.nbits, self.radius, self.method), k)
+
+    def query_many(self, fps: np.ndarray, k: int = 10, exclude=None, processes: int = None):
+        """
+        Top-k for many queries -> (positions (m, k), similarities (m, k)), padded with -1.
+        exclude[i] is a position to skip for query i (e.g. the query itself).
+        """
+        fps = np.atleast_2d(fps)
+        m = len(fps)
+        if processes and processes > 1 and m >= 1000:
+            step = -(-m // (processes * 4))
+            chunks = [(fps[i:i + step], k, None if exclude is None else exclude[i:i + step])
+                      for i in range(0, m, step)]
+            with Pool(processes, initializer=_init_pool, initargs=(self,)) as pool:
+                parts = pool.map(_query_chunk, chunks)
+            return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+        positions = np.full((m, k), -1, dtype=np.int64)
+        sims = np.full((m, k), -1.0, dtype=np.float32)
+        for i in range(m):
+            pos, s = self.query(fps[i], k, exclude=None if exclude is None else int(exclude[i]))
+            positions[i, :len(pos)] = pos
+            sims[i, :len(s)] = s
+        return positions, sims
+
+    def nearest_neighbours(self, processes: int = None):
+        """Closest other compound for every indexed compound -> (positions, similarities)."""
+        pos, sims = self.query_many(self.fps, k=1, exclude=np.arange(len(self)), processes=processes)
+        return pos[:, 0], sims[:, 0]
+
+    # ---- persistence ----
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp, fps=self.fps, keys=self.keys.astype(str),
+            meta=np.array([self.method, str(self.nbits), str(self.radius), self.source_hash]),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            method, nbits, radius, src = data["meta"].tolist()
+            return cls(data["fps"], data["keys"].astype(object), method, int(nbits), int(radius), src)
+
+def source_hash(keys, smiles, method: str, nbits: int, radius: int) -> str:
+    h = hashlib.sha1(f"{method}:{nbits}:{radius}".encode("utf-8"))
+    for k, s in zip(keys, smiles):
+        h.update(f"{k}\t{s if isinstance(s, str) else ''}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def load_or_build(path: str, keys, smiles, nbits: int = NBITS, radius: int = RADIUS,
+                  processes: int = None) -> FingerprintIndex:
+    """Reuses the persisted index when it was built from the same names/SMILES; rebuilds otherwise."""
+    keys, smiles = list(keys), list(smiles)
+    expected = source_hash(keys, smiles, fingerprint_method(), nbits, radius)
+    if os.path.exists(path):
+        try:
+            index = FingerprintIndex.load(path)
+            if index.source_hash == expected:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = FingerprintIndex.build(keys, smiles, nbits, radius, processes)
+    index.save(path)
+    return index
+
+# ------------------------------
+# CLI
+# ------------------------------
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Fingerprint similarity index over SMILES.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Build a persisted index from a CSV.")
+    b.add_argument("csv")
+    b.add_argument("out")
+    b.add_argument("--smiles-col", default="SMILES")
+    b.add_argument("--name-col", default=None, help="Default: first column.")
+    b.add_argument("--processes", type=int, default=os.cpu_count())
+
+    q = sub.add_parser("query", help="Top-K analogs of a SMILES.")
+    q.add_argument("index")
+    q.add_argument("smiles")
+    q.add_argument("-k", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if args.cmd == "build":
+        df = pd.read_csv(args.csv)
+        name_col = args.name_col or df.columns[0]
+        index = FingerprintIndex.build(df[name_col].astype(str), df[args.smiles_col],
+                                       processes=args.processes)
+        index.save(args.out)
+        print(f" Saved {args.out} ({len(index)} compounds, {index.method})")
+    else:
+        index = FingerprintIndex.load(args.index)
+        pos, sims = index.query_smiles(args.smiles, args.k)
+        for p, s in zip(pos, sims):
+            print(f"{s:.3f}\t{index.keys[p]}")
+
+if __name__ == "__main__":
+    main()
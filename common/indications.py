@@ -0,0 +1,192 @@
+# common/indications.py
+#
+# Indication profiles: everything that ties Phase 2 and Phase 3 to one disease.
+#  - query: disease clause of the literature search
+#  - disease_terms / model_markers / outcomes: Phase 3 hard gates, in order
+#    (outcomes also become the paper's outcome tags)
+#  - study_models: study-model detection, checked in order (first match wins)
+#  - model_weights: evidence weight per study model (keys: MODEL_WEIGHTS)
+#  - modules / symptomatic / gene_set: Phase 2 target modules and the broad
+#    gene set (DisGeNET export under database/) behind them
+# Phase 3 fetches papers once with the union of the active profiles' queries
+# (phase3.config.INDICATIONS) and gates each paper against every profile in
+# one pass. "AD" is the original Alzheimer configuration and keeps the
+# original output names; other profiles write suffixed twins (indication_path).
+
+import os
+
+DEFAULT_INDICATION = "AD"
+
+# Study-model vocabulary shared by every profile ("unknown" when no study
+# model matches) with the default evidence weight of each
+MODEL_WEIGHTS = {
+    "cell": 1.0,
+    "animal": 2.0,
+    "human_observational": 2.5,
+    "clinical": 3.5,
+    "unknown": 0.2
+}
+
+INDICATION_PROFILES = {
+    "AD": {
+        "name": "Alzheimer's disease",
+        "query": "Alzheimer",
+        # Strict Alzheimer pathology terms
+        "disease_terms": [
+            "alzheimer", "alzheimer's disease",
+            "amyloid plaque", "aβ plaque",
+            "phospho-tau", "tau tangle", "tauopathy"
+        ],
+        # Strong preclinical AD model markers
+        "model_markers": [
+            "app/ps1", "5xfad", "3xtg", "tg2576", "p301s",
+            "transgenic mouse", "morris water maze",
+            "y-maze", "novel object recognition"
+        ],
+        "study_models": [
+            ("clinical", ["phase ii", "phase iii", "double-blind", "placebo"]),
+            ("human_observational", ["cohort", "case-control", "observational"]),
+            ("animal", ["mouse", "mice", "rat", "transgenic", "5xfad", "3xtg", "app/ps1"]),
+            ("cell", ["cell", "in vitro", "neuronal culture", "primary neurons"]),
+        ],
+        "outcomes": {
+            "amyloid": ["amyloid", "aβ", "abeta", "plaque", "app", "bace1", "secretase"],
+            "tau": ["tau", "phospho-tau", "hyperphosphorylation", "tangle", "mapt", "gsk3b", "cdk5"],
+            "microglia": ["microglia", "neuroinflammation", "trem2", "csf1r", "tyrobp"],
+            "mitochondria": ["mitochondria", "atp", "oxidative", "ros", "respiration", "membrane potential"],
+            "synapse": ["synapse", "synaptic", "psd95", "spine", "synaptophysin"],
+            "cognition": ["memory", "cognitive", "learning", "morris water maze", "y-maze", "novel object recognition"]
+        },
+        "model_weights": dict(MODEL_WEIGHTS),
+        # Core disease-modifying modules, then secondary supportive ones
+        "modules": {
+            "core": {
+                "amyloid": {"APP", "BACE1", "PSEN1", "PSEN2", "ADAM10"},
+                "tau": {"MAPT", "GSK3B", "CDK5", "MARK4", "CSNK1D", "CSNK1E"},  # add casein kinases (tau-related)
+                "microglia": {"TREM2", "CSF1R", "TYROBP", "SPI1"},              # microglia/immune genetics
+                "lipid": {"APOE", "CLU", "ABCA7", "SORL1"},
+            },
+            "secondary": {
+                "inflam": {"TNF", "IL1B", "IL6", "NFKB1", "PTGS2"},
+                "mito_ox": {"NFE2L2", "SOD1", "SOD2", "PPARGC1A", "PINK1", "PARK7"},
+            },
+        },
+        # Symptomatic target (keep, but low weight)
+        "symptomatic": {"ACHE"},
+        "gene_set": ("ad_genes_disgenet.csv", "ad_genes.pkl"),
+    },
+    "PD": {
+        "name": "Parkinson's disease",
+        "query": "Parkinson",
+        "disease_terms": [
+            "parkinson", "parkinson's disease",
+            "lewy body", "α-synuclein", "alpha-synuclein", "synucleinopathy",
+            "dopaminergic neuron"
+        ],
+        "model_markers": [
+            "mptp", "6-ohda", "6-hydroxydopamine", "rotenone", "paraquat",
+            "a53t", "pff", "preformed fibril", "rotarod", "pole test",
+            "tyrosine hydroxylase", "substantia nigra"
+        ],
+        "study_models": [
+            ("clinical", ["phase ii", "phase iii", "double-blind", "placebo"]),
+            ("human_observational", ["cohort", "case-control", "observational"]),
+            ("animal", ["mouse", "mice", "rat", "transgenic", "mptp", "6-ohda", "a53t"]),
+            ("cell", ["cell", "in vitro", "sh-sy5y", "neuronal culture", "primary neurons"]),
+        ],
+        "outcomes": {
+            "synuclein": ["synuclein", "lewy", "aggregation", "fibril", "snca"],
+            "dopamine": ["dopamine", "dopaminergic", "tyrosine hydroxylase", "striatal", "nigral"],
+            "microglia": ["microglia", "neuroinflammation", "nlrp3", "astrocyte"],
+            "mitochondria": ["mitochondria", "atp", "oxidative", "ros", "mitophagy", "complex i"],
+            "lysosome": ["lysosom", "autophagy", "gba", "glucocerebrosidase", "lrrk2"],
+            "motor": ["motor", "rotarod", "pole test", "locomotor", "bradykinesia", "updrs"]
+        },
+        "model_weights": dict(MODEL_WEIGHTS),
+        "modules": {
+            "core": {
+                "synuclein": {"SNCA", "LRRK2", "PLK2"},
+                "mitophagy": {"PINK1", "PRKN", "PARK7", "FBXO7"},
+                "lysosome": {"GBA1", "GBA", "ATP13A2", "VPS35", "TMEM175"},
+            },
+            "secondary": {
+                "inflam": {"TNF", "IL1B", "IL6", "NFKB1", "PTGS2", "NLRP3"},
+                "oxidative": {"NFE2L2", "SOD1", "SOD2", "PPARGC1A"},
+            },
+        },
+        # Dopamine replacement / preservation (symptomatic)
+        "symptomatic": {"MAOB", "COMT", "DDC"},
+        "gene_set": ("pd_genes_disgenet.csv", "pd_genes.pkl"),
+    },
+    "ALS": {
+        "name": "Amyotrophic lateral sclerosis",
+        "query": "amyotrophic lateral sclerosis",
+        "disease_terms": [
+            "amyotrophic lateral sclerosis", "motor neuron disease",
+            "tdp-43", "c9orf72", "sod1 mutant", "sod1-g93a"
+        ],
+        "model_markers": [
+            "sod1-g93a", "g93a", "tdp-43 transgenic", "c9orf72 repeat", "wobbler",
+            "ipsc-derived motor neuron", "grip strength", "rotarod", "survival in sod1",
+            "motor neuron survival", "alsfrs"
+        ],
+        "study_models": [
+            ("clinical", ["phase ii", "phase iii", "double-blind", "placebo"]),
+            ("human_observational", ["cohort", "case-control", "observational"]),
+            ("animal", ["mouse", "mice", "rat", "transgenic", "g93a", "wobbler"]),
+            ("cell", ["cell", "in vitro", "ipsc", "motor neuron culture", "primary neurons"]),
+        ],
+        "outcomes": {
+            "proteostasis": ["tdp-43", "aggregation", "inclusion", "stress granule", "autophagy"],
+            "motor_neuron": ["motor neuron", "neuromuscular junction", "axonal", "denervation"],
+            "microglia": ["microglia", "neuroinflammation", "astrocyte", "glial"],
+            "mitochondria": ["mitochondria", "atp", "oxidative", "ros", "respiration"],
+            "excitotoxicity": ["glutamate", "excitotoxic", "eaat2", "calcium"],
+            "function": ["survival in sod1", "motor neuron survival", "grip strength", "alsfrs",
+                         "motor function", "disease onset"]
+        },
+        "model_weights": dict(MODEL_WEIGHTS),
+        "modules": {
+            "core": {
+                "proteostasis": {"SOD1", "TARDBP", "FUS", "C9ORF72", "UBQLN2"},
+                "autophagy": {"OPTN", "TBK1", "SQSTM1", "VCP"},
+                "excitotoxicity": {"SLC1A2", "GRIA2"},
+            },
+            "secondary": {
+                "inflam": {"TNF", "IL1B", "IL6", "NFKB1", "PTGS2"},
+                "oxidative": {"NFE2L2", "SOD2", "PPARGC1A"},
+            },
+        },
+        "symptomatic": set(),
+        "gene_set": ("als_genes_disgenet.csv", "als_genes.pkl"),
+    },
+}
+
+def get_profile(code: str) -> dict:
+    """Profile by code (case-insensitive); ValueError lists the known ones."""
+    key = str(code).strip().upper()
+    if key not in INDICATION_PROFILES:
+        raise ValueError(f"unknown indication {code!r}; known: {', '.join(INDICATION_PROFILES)}")
+    return INDICATION_PROFILES[key]
+
+def disease_clause(codes) -> str:
+    """Disease part of a search: one profile's query, or the OR of several."""
+    queries = [get_profile(c)["query"] for c in codes]
+    queries = [f'"{q}"' if " " in q else q for q in queries]
+    return queries[0] if len(queries) == 1 else "(" + " OR ".join(queries) + ")"
+
+def indication_path(path: str, code: str) -> str:
+    """Per-indication twin of an output path ("x.csv" -> "x_pd.csv"); AD keeps the path unchanged."""
+    if code == DEFAULT_INDICATION:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{code.lower()}{ext}"
+
+def outcome_tags(codes=None) -> list:
+    """Outcome tags of the given profiles (default: all), first occurrence order."""
+    tags = []
+    for code in codes or INDICATION_PROFILES:
+        for tag in get_profile(code)["outcomes"]:
+            if tag not in tags:
+                tags.append(tag)
+    return tags
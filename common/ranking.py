@@ -0,0 +1,69 @@
+# common/ranking.py
+#
+# Shared ranking helpers. Every phase ranks "higher score first"; this keeps
+# tie-breaking identical everywhere and lets head lists (reports, UI, API)
+# use an O(n) partial selection instead of a full sort.
+
+import numpy as np
+import pandas as pd
+
+def _primary_key(values, descending: bool = True) -> np.ndarray:
+    """Ascending sort key of the values (NaN last)."""
+    v = np.asarray(values, dtype=float)
+    key = -v if descending else v.copy()
+    key[np.isnan(key)] = np.inf
+    return key
+
+def _tie_codes(ties, positions=None) -> np.ndarray:
+    """
+    Codes that order `ties` ascending (as strings), for the given positions
+    only (default: all). Codes are only comparable within one call.
+    """
+    s = pd.Series(ties)
+    if positions is not None:
+        s = s.iloc[positions]
+    codes, _ = pd.factorize(s.astype(str), sort=True)
+    return codes
+
+def rank_order(values, ties=None, descending: bool = True) -> np.ndarray:
+    """
+    Full ranking: positions sorted by value (best first, NaN last),
+    then by `ties` ascending, then by original position (stable).
+    """
+    key = _primary_key(values, descending)
+    if ties is None:
+        return np.lexsort((np.arange(len(key)), key))
+    return np.lexsort((np.arange(len(key)), _tie_codes(ties), key))
+
+def top_k_positions(values, k: int, ties=None, descending: bool = True) -> np.ndarray:
+    """
+    Positions of the k best values, in the same order rank_order() gives.
+    Uses argpartition, so cost is O(n + k log k) instead of O(n log n);
+    `ties` are only encoded for the selected window.
+    """
+    key = _primary_key(values, descending)
+    n = len(key)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.arange(0)
+    if k == n:
+        return rank_order(values, ties, descending)
+
+    # Everything at or above the k-th key (boundary ties included), then rank
+    kth = np.partition(key, k - 1)[k - 1]
+    cand = np.flatnonzero(key <= kth)
+    if ties is None:
+        order = np.lexsort((cand, key[cand]))
+    else:
+        order = np.lexsort((cand, _tie_codes(ties, cand), key[cand]))
+    return cand[order[:k]]
+
+def top_k(df: pd.DataFrame, col: str, k: int, tie_col: str = None, ascending: bool = False) -> pd.DataFrame:
+    """DataFrame twin of top_k_positions: the k best rows by `col`, ranked."""
+    ties = df[tie_col] if tie_col else None
+    return df.iloc[top_k_positions(df[col].to_numpy(), k, ties, descending=not ascending)]
+
+def sort_ranked(df: pd.DataFrame, col: str, tie_col: str = None, ascending: bool = False) -> pd.DataFrame:
+    """Full ranked sort (use once, when persisting a table)."""
+    ties = df[tie_col] if tie_col else None
+    return df.iloc[rank_order(df[col].to_numpy(), ties, descending=not ascending)]
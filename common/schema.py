@@ -0,0 +1,117 @@
+# common/schema.py
+#
+# Typed, compact in-memory layout for the paper and ranking tables.
+#  - repeated strings (drug, model, direction, outcomes, models) -> categoricals
+#  - outcome tags -> one bitmask integer per paper (bit i = OUTCOME_TAGS[i])
+#  - small counts -> int8/int16; scores stay float64 (float32 would tie close scores)
+# Scoring code works on the integer codes (np.bincount / lookup tables)
+# instead of grouping Python strings.
+
+import numpy as np
+import pandas as pd
+
+from common.indications import MODEL_WEIGHTS, outcome_tags
+
+# Tags of every indication profile, AD's first, so one bitmask layout serves all
+OUTCOME_TAGS = outcome_tags()
+OUTCOME_DTYPE = np.uint8 if len(OUTCOME_TAGS) <= 8 else np.uint16
+OUTCOME_BITS = {tag: 1 << i for i, tag in enumerate(OUTCOME_TAGS)}
+# Set bits per mask value (tag count), indexed by the mask itself
+OUTCOME_POPCOUNT = np.array([bin(m).count("1") for m in range(1 << len(OUTCOME_TAGS))], dtype=np.int8)
+
+DIRECTIONS = ["positive", "negative", "neutral"]
+MODELS = sorted(MODEL_WEIGHTS)
+
+# read_csv / astype dtypes per table
+PAPER_DTYPES = {
+    "drug": "category",
+    "model": "category",
+    "direction": pd.CategoricalDtype(DIRECTIONS),
+    "outcomes": "category",
+    "journal": "category",
+    "pos_hits": np.int16,
+    "neg_hits": np.int16,
+    "pmid": "string",
+}
+FINAL_DTYPES = {
+    "models": "category",
+    "n_papers": np.int16,
+    "net_positive": np.int16,
+    "phase2_score": np.float64,
+    "signed_score": np.float64,
+    "confidence": np.float64,
+    "final_score": np.float64,
+    "analog_similarity": np.float32,
+}
+LIT_DTYPES = {
+    "drug": "category",
+    "models": "category",
+    "n_papers": np.int16,
+    "n_positive": np.int16,
+    "n_negative": np.int16,
+    "net_positive": np.int16,
+    "evidence_score": np.float64,
+    "signed_score": np.float64,
+    "confidence": np.float64,
+}
+
+# ------------------------------
+# Outcome bitmasks
+# ------------------------------
+def outcome_mask(outcomes) -> np.ndarray:
+    """';'-joined outcome tags -> bitmask per row (parsed once per distinct string)."""
+    codes, uniques = pd.factorize(pd.Series(outcomes, dtype=object).fillna(""))
+    table = np.array([
+        sum(OUTCOME_BITS.get(t.strip(), 0) for t in str(u).split(";")) for u in uniques
+    ], dtype=OUTCOME_DTYPE)
+    return table[codes] if len(table) else np.zeros(len(codes), dtype=OUTCOME_DTYPE)
+
+def outcome_count(mask) -> np.ndarray:
+    return OUTCOME_POPCOUNT[np.asarray(mask, dtype=np.int64)]
+
+def has_outcome(mask, tag: str) -> np.ndarray:
+    """Boolean filter on one outcome tag, straight on the bitmask."""
+    return (np.asarray(mask) & OUTCOME_BITS[tag]) != 0
+
+def outcome_labels(mask) -> list:
+    """Bitmask -> ';'-joined tags (for display / CSV)."""
+    return [";".join(t for t in OUTCOME_TAGS if m & OUTCOME_BITS[t]) for m in np.asarray(mask)]
+
+# ------------------------------
+# Table conversion / loading
+# ------------------------------
+def _apply_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    for col, dtype in dtypes.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        if isinstance(dtype, type) and issubclass(dtype, np.integer):
+            # counts: missing means none
+            df[col] = df[col].fillna(0).astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def compact_papers(df: pd.DataFrame) -> pd.DataFrame:
+    """Paper table with categoricals, int16 hit counts and an `outcome_mask` column."""
+    df = _apply_dtypes(df.copy(), PAPER_DTYPES)
+    if "outcomes" in df.columns and "outcome_mask" not in df.columns:
+        df["outcome_mask"] = outcome_mask(df["outcomes"].astype(object))
+    return df
+
+def compact_final(df: pd.DataFrame) -> pd.DataFrame:
+    return _apply_dtypes(df.copy(), FINAL_DTYPES)
+
+def compact_lit_evidence(df: pd.DataFrame) -> pd.DataFrame:
+    return _apply_dtypes(df.copy(), LIT_DTYPES)
+
+def load_papers(path: str, usecols=None) -> pd.DataFrame:
+    """Reads string columns straight into categoricals (no object-dtype intermediate)."""
+    read_as = {c: t for c, t in PAPER_DTYPES.items()
+               if t == "category" or isinstance(t, pd.CategoricalDtype) or c == "pmid"}
+    return compact_papers(pd.read_csv(path, usecols=usecols, dtype=read_as))
+
+def load_final(path: str) -> pd.DataFrame:
+    return compact_final(pd.read_csv(path, dtype={"models": "category"}))
+
+def load_lit_evidence(path: str) -> pd.DataFrame:
+    return compact_lit_evidence(pd.read_csv(path, dtype={"drug": "category", "models": "category"}))
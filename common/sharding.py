@@ -0,0 +1,67 @@
+# common/sharding.py
+#
+# Deterministic work partitioning for runs spread over several machines or
+# containers that share a filesystem.
+#  - a key (drug name) belongs to shard sha1(key) mod N, so every node
+#    computes the same split without coordination, independent of list order
+#  - `--shard i/N` selects shard i (0-based) of N
+#  - each shard writes its own partition of an output ("x.csv" ->
+#    "x.shard-i-of-N.csv"); a merge step reads them back as text, so values
+#    are carried over byte for byte, and restores single-node order
+
+import os
+import hashlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+def parse_shard(spec: str) -> tuple:
+    """"i/N" -> (i, N), with 0 <= i < N. Usable as an argparse `type`."""
+    try:
+        i, n = (int(x) for x in str(spec).split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N (e.g. 0/4), got {spec!r}")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {spec!r}")
+    return i, n
+
+def shard_of(key: str, n: int) -> int:
+    """Shard of a key; stable across processes and machines (unlike hash())."""
+    h = hashlib.sha1(str(key).strip().encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big") % n
+
+def shard_mask(keys, shard: tuple) -> np.ndarray:
+    """Boolean mask of the keys that belong to `shard` (i, N)."""
+    i, n = shard
+    return np.fromiter((shard_of(k, n) == i for k in keys), dtype=bool)
+
+def partition_path(path: str, shard: tuple) -> str:
+    """Per-shard twin of an output path; None shard keeps the path unchanged."""
+    if shard is None:
+        return path
+    i, n = shard
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{i}-of-{n}{ext}"
+
+def partition_paths(path: str, n: int) -> list:
+    return [partition_path(path, (i, n)) for i in range(n)]
+
+def read_partitions(path: str, n: int) -> pd.DataFrame:
+    """
+    Concatenated partitions of `path` as text columns (empty strings for
+    missing values), so writing them back reproduces every field exactly.
+    Raises FileNotFoundError naming any shard that has not written its partition.
+    """
+    paths = partition_paths(path, n)
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError("missing shard partitions: " + ", ".join(missing))
+
+    parts = []
+    for p in paths:
+        try:
+            parts.append(pd.read_csv(p, dtype=str, keep_default_na=False))
+        except pd.errors.EmptyDataError:
+            continue  # shard with no rows
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
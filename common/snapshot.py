@@ -0,0 +1,178 @@
+# common/snapshot.py
+#
+# Prebuilt dashboard snapshot, written by final_merge.py next to the ranking.
+# A directory of plain .npy files (np.load(mmap_mode="r"), no pickle) plus a
+# small meta.json:
+#  - the ranking table in leaderboard order, one array per column (float64
+#    scores, int16 counts, categorical codes, fixed-width strings)
+#  - the extracted ScoringKernel arrays, so live re-weighting needs no paper parse
+#  - a drug -> paper index (CSR: offsets into store rowids, aliases resolved)
+# Readers check the recorded source files (size + mtime) and fall back to the
+# CSVs when the snapshot is missing or stale.
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 2
+META_FILE = "meta.json"
+
+def file_signature(path: str):
+    """(size, mtime_ns) of a source file, None when it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def _column_arrays(df) -> tuple:
+    """
+    Table columns -> ({file name: array}, column meta).
+    Empty strings are stored as missing, so the frame reads back like the CSV.
+    """
+    arrays, columns = {}, []
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            if "" in s.cat.categories:
+                s = s.cat.remove_categories([""])
+            arrays[col] = s.cat.codes.to_numpy()
+            columns.append({"name": col, "kind": "category",
+                            "categories": [str(c) for c in s.cat.categories]})
+        elif s.dtype.kind in "biuf":
+            arrays[col] = s.to_numpy()
+            columns.append({"name": col, "kind": "numeric"})
+        else:
+            # Fixed-width unicode keeps strings mmap-able; NaN -> ""
+            arrays[col] = s.fillna("").astype(str).to_numpy(dtype=str)
+            columns.append({"name": col, "kind": "string"})
+    return arrays, columns
+
+def paper_index(paper_drug: np.ndarray, paper_row: np.ndarray, n_drugs: int) -> tuple:
+    """
+    Drug slot -> papers as CSR: store rowids of slot d are
+    paper_ids[indptr[d]:indptr[d + 1]], in extraction (rowid) order.
+    """
+    order = np.argsort(paper_drug, kind="stable")
+    paper_ids = (np.asarray(paper_row)[order] + 1).astype(np.int64)
+    indptr = np.zeros(n_drugs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(paper_drug, minlength=n_drugs), out=indptr[1:])
+    return indptr, paper_ids
+
+def write_snapshot(path: str, df: pd.DataFrame, kernel=None, sources=()):
+    """
+    Writes the snapshot directory atomically (built in path + ".tmp", then swapped in).
+    `sources` are the files it was derived from; their signatures decide staleness.
+    """
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    arrays, columns = _column_arrays(df)
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "n_rows": len(df),
+        "columns": columns,
+        "sources": {os.path.abspath(p): file_signature(p) for p in sources},
+        "kernel": None,
+    }
+    for col, values in arrays.items():
+        np.save(os.path.join(tmp, f"col_{col}.npy"), values)
+
+    if kernel is not None:
+        kernel_arrays = kernel.to_arrays()
+        for name, values in kernel_arrays.items():
+            np.save(os.path.join(tmp, f"kernel_{name}.npy"), values)
+        meta["kernel"] = {
+            "arrays": sorted(kernel_arrays),
+            "model_names": list(getattr(kernel, "model_names", [])),
+        }
+        if kernel.has_papers:
+            indptr, paper_ids = paper_index(kernel.paper_drug, kernel.paper_row, kernel.n_drugs)
+            np.save(os.path.join(tmp, "paper_indptr.npy"), indptr)
+            np.save(os.path.join(tmp, "paper_ids.npy"), paper_ids)
+
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    if os.path.exists(path):
+        old = path + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp, path)
+
+def read_meta(path: str):
+    """meta.json of a current-version snapshot whose sources are unchanged, else None."""
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return None
+    for src, sig in meta.get("sources", {}).items():
+        if file_signature(src) != sig:
+            return None
+    return meta
+
+class Snapshot:
+    """Memory-mapped view of a snapshot directory; arrays are paged in on first use."""
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.n_rows = meta["n_rows"]
+
+    @classmethod
+    def open(cls, path: str):
+        """Snapshot at `path`, or None when missing / stale (caller falls back to CSVs)."""
+        meta = read_meta(path)
+        return cls(path, meta) if meta is not None else None
+
+    def array(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    def frame(self, columns=None) -> pd.DataFrame:
+        """Ranking table as a DataFrame (categoricals rebuilt from their codes)."""
+        data = {}
+        for col in self.meta["columns"]:
+            name = col["name"]
+            if columns is not None and name not in columns:
+                continue
+            values = self.array(f"col_{name}")
+            if col["kind"] == "category":
+                data[name] = pd.Categorical.from_codes(values, col["categories"])
+            elif col["kind"] == "string":
+                values = pd.Series(values, dtype="str")
+                data[name] = values.mask(values == "")
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
+
+    def kernel(self):
+        """ScoringKernel rebuilt from the stored arrays, or None if none were written."""
+        info = self.meta.get("kernel")
+        if not info:
+            return None
+        from phase3.phase3_kernel import ScoringKernel
+
+        arrays = {name: self.array(f"kernel_{name}") for name in info["arrays"]}
+        return ScoringKernel.from_arrays(arrays, info["model_names"])
+
+    def paper_ids(self, row: int, limit: int = None) -> np.ndarray:
+        """Store rowids of the papers behind table row `row` (aliases already resolved)."""
+        info = self.meta.get("kernel")
+        if not info or "row_drug" not in info["arrays"]:
+            return np.arange(0)
+        slot = int(self.array("kernel_row_drug")[row])
+        if slot < 0:
+            return np.arange(0)
+        indptr = self.array("paper_indptr")
+        ids = self.array("paper_ids")[indptr[slot]:indptr[slot + 1]]
+        return np.asarray(ids[:limit] if limit is not None else ids)
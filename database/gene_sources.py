@@ -0,0 +1,221 @@
+# database/gene_sources.py
+#
+# Gene-set source layer for data prep.
+#  - conditional GETs (ETag / If-Modified-Since): unchanged upstream = one 304, no parsing
+#  - versioned local snapshots: gene_sets/<source>/<sha12>.txt + meta.json
+#  - targeted parsing: only the table whose header has a "Symbol" column
+#  - pluggable sources: register_source(...) adds more sets to the union
+#
+# Consumers (Phase 2) load the precomputed set with load_gene_set().
+
+import os
+import json
+import pickle
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+import pandas as pd
+
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(DATABASE_DIR, "gene_sets")
+GENES_CSV_PATH = os.path.join(DATABASE_DIR, "ad_genes_disgenet.csv")
+GENES_PICKLE_PATH = os.path.join(DATABASE_DIR, "ad_genes.pkl")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# ------------------------------
+# Sources
+# ------------------------------
+class GeneSetSource(ABC):
+    """A named URL plus a parser turning the response body into gene symbols."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+
+    @abstractmethod
+    def parse(self, content: bytes) -> list:
+        """Gene symbols in a response body (local file bytes for a local path)."""
+
+class HarmonizomeSource(GeneSetSource):
+    """Harmonizome gene-set page: reads the Symbol column of the gene table only."""
+
+    def parse(self, content: bytes) -> list:
+        import lxml.html
+
+        doc = lxml.html.fromstring(content)
+        for table in doc.iter("table"):
+            header = [th.text_content().strip().lower() for th in table.xpath(".//thead//th | .//tr[1]/th")]
+            if "symbol" not in header:
+                continue
+            col = header.index("symbol") + 1
+            # Data rows with or without a <tbody> (lxml.html does not add one)
+            cells = table.xpath(f".//tr[td]/td[{col}]")
+            return [c.text_content().strip() for c in cells if c.text_content().strip()]
+        raise ValueError(f"{self.name}: no table with a 'Symbol' column at {self.url}")
+
+class CsvSource(GeneSetSource):
+    """CSV (local path or URL) with one gene symbol column."""
+
+    def __init__(self, name: str, url: str, column: str = "gene_symbol"):
+        super().__init__(name, url)
+        self.column = column
+
+    def parse(self, content: bytes) -> list:
+        import io
+        df = pd.read_csv(io.BytesIO(content), usecols=[self.column], dtype=str)
+        return df[self.column].dropna().str.strip().tolist()
+
+SOURCES = {
+    "disgenet": HarmonizomeSource(
+        "disgenet",
+        "https://maayanlab.cloud/Harmonizome/gene_set/Alzheimer%2BDisease/DisGeNET%2BGene-Disease%2BAssociations",
+    ),
+}
+
+def register_source(source: GeneSetSource):
+    SOURCES[source.name] = source
+
+# ------------------------------
+# Snapshot store
+# ------------------------------
+def _source_dir(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, name)
+
+def read_meta(name: str) -> dict:
+    path = os.path.join(_source_dir(name), "meta.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_atomic(path: str, data: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_meta(name: str, meta: dict):
+    os.makedirs(_source_dir(name), exist_ok=True)
+    _write_atomic(os.path.join(_source_dir(name), "meta.json"), json.dumps(meta, indent=2))
+
+def genes_version(genes) -> str:
+    return hashlib.sha256("\n".join(sorted(genes)).encode("utf-8")).hexdigest()[:12]
+
+def read_snapshot(name: str, version: str) -> list:
+    with open(os.path.join(_source_dir(name), f"{version}.txt"), "r", encoding="utf-8") as f:
+        return f.read().split()
+
+def write_snapshot(name: str, genes) -> str:
+    version = genes_version(genes)
+    path = os.path.join(_source_dir(name), f"{version}.txt")
+    if not os.path.exists(path):
+        os.makedirs(_source_dir(name), exist_ok=True)
+        _write_atomic(path, "\n".join(sorted(genes)) + "\n")
+    return version
+
+# ------------------------------
+# Fetch
+# ------------------------------
+def _read_local(source: GeneSetSource, meta: dict):
+    """Local files use mtime in place of Last-Modified."""
+    mtime = str(os.path.getmtime(source.url))
+    if meta.get("current") and meta.get("last_modified") == mtime:
+        return None, {}
+    with open(source.url, "rb") as f:
+        return f.read(), {"last_modified": mtime}
+
+def _read_remote(source: GeneSetSource, meta: dict, session):
+    import requests
+
+    headers = dict(HEADERS)
+    if meta.get("current"):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = (session or requests).get(source.url, headers=headers, timeout=60)
+    if r.status_code == 304:
+        return None, {}
+    r.raise_for_status()
+    return r.content, {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+def fetch_source(source: GeneSetSource, session=None, force: bool = False):
+    """
+    Returns (genes, status) where status is "not-modified", "unchanged" or "updated".
+    Only a changed body is parsed and only a changed gene list becomes a new snapshot.
+    A body that parses to no genes raises ValueError.
+    """
+    meta = {} if force else read_meta(source.name)
+    if os.path.exists(source.url):
+        content, validators = _read_local(source, meta)
+    else:
+        content, validators = _read_remote(source, meta, session)
+
+    if content is None:
+        return read_snapshot(source.name, meta["current"]), "not-modified"
+
+    genes = sorted(set(source.parse(content)))
+    if not genes:
+        # Nothing written: the previous snapshot, meta and outputs stay current
+        raise ValueError(f"{source.name}: no gene symbols parsed from {source.url}")
+    version = write_snapshot(source.name, genes)
+    status = "unchanged" if version == meta.get("current") else "updated"
+
+    meta = read_meta(source.name)
+    history = meta.get("history", [])
+    if status == "updated":
+        history.append({
+            "version": version,
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "genes": len(genes),
+        })
+    meta.update(validators)
+    meta.update({"url": source.url, "current": version, "history": history})
+    write_meta(source.name, meta)
+    return genes, status
+
+def build_gene_set(names=None, session=None, force: bool = False):
+    """Union of the selected sources. Returns (frozenset of upper-case symbols, any_changed)."""
+    genes, changed = set(), False
+    for name in names or list(SOURCES):
+        g, status = fetch_source(SOURCES[name], session=session, force=force)
+        print(f" {name}: {len(g)} genes ({status})")
+        changed |= status == "updated"
+        genes.update(s.upper() for s in g)
+    return frozenset(genes), changed
+
+# ------------------------------
+# Outputs / loading
+# ------------------------------
+def write_gene_set(genes, csv_path: str = GENES_CSV_PATH, pickle_path: str = GENES_PICKLE_PATH) -> bool:
+    """Writes CSV + frozenset pickle; skipped when both already hold this set. Empty sets raise ValueError."""
+    genes = frozenset(genes)
+    if not genes:
+        raise ValueError("empty gene set: Phase 2 would score every drug without it")
+    if os.path.exists(pickle_path) and os.path.exists(csv_path):
+        with open(pickle_path, "rb") as f:
+            if pickle.load(f) == genes:
+                return False
+
+    pd.DataFrame({"gene_symbol": sorted(genes)}).to_csv(csv_path, index=False)
+    tmp = pickle_path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(genes, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, pickle_path)
+    return True
+
+def load_gene_set(csv_path: str = GENES_CSV_PATH, pickle_path: str = GENES_PICKLE_PATH) -> frozenset:
+    """Upper-case AD gene symbols; the pickle is used unless the CSV is newer."""
+    if os.path.exists(pickle_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(pickle_path) >= os.path.getmtime(csv_path)
+    ):
+        with open(pickle_path, "rb") as f:
+            return pickle.load(f)
+    ad = pd.read_csv(csv_path)
+    return frozenset(ad["gene_symbol"].astype(str).str.strip().str.upper())
@@ -1,9 +1,38 @@
 # final_merge.py
+import time
+import argparse
+import numpy as np
 import pandas as pd
 
+from common.ranking import top_k, sort_ranked
+from common.fingerprints import load_or_build, rdkit_available
+from common.snapshot import write_snapshot
+from phase3.config import ALIASES_PATH, PAPERS_CSV_PATH
+from phase3.phase3_dedup import load_aliases, fan_out, alias_map
+from phase3.phase3_kernel import ScoringKernel
+from phase3.phase3_store import FEATURE_COLUMNS
+from common.schema import load_lit_evidence, load_papers, load_final
+from common.indications import get_profile, indication_path, DEFAULT_INDICATION
+
 PHASE2_PATH = "phase2/outputs/phase2_scored_drugs.csv" 
 PHASE3_PATH = "phase3/outputs/phase3_lit_evidence.csv"
 OUT_PATH    = "final_ranked_candidates.csv"
+FP_INDEX_PATH = "phase1/outputs/bbb_fingerprints.npz"
+SNAPSHOT_PATH = "dashboard_snapshot"
+UNCERTAINTY_PATH = "final_rank_uncertainty.csv"
+# Every path above (and PAPERS_CSV_PATH) has a per-indication twin for
+# --indication PD / ALS (common.indications.indication_path); AD keeps these
+
+# --bootstrap defaults: resamples, reported rank interval, top-K inclusion cut-offs
+BOOTSTRAP_RESAMPLES = 1000
+BOOTSTRAP_INTERVAL = 0.9
+BOOTSTRAP_TOP_K = (10, 25, 50)
+
+# Hackathon-friendly weights:
+# - Phase 2: plausibility (target/mechanism) = 45%
+# - Phase 3: literature support (signed_score) = 45%
+# - Confidence = 10%
+MERGE_WEIGHTS = {"phase2": 0.45, "phase3": 0.45, "confidence": 0.10}
 
 def minmax(s: pd.Series) -> pd.Series:
     s = s.fillna(0.0).astype(float)
@@ -11,9 +40,89 @@ def minmax(s: pd.Series) -> pd.Series:
         return s * 0.0
     return (s - s.min()) / (s.max() - s.min())
 
-def main():
-    p2 = pd.read_csv(PHASE2_PATH)
-    p3 = pd.read_csv(PHASE3_PATH)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Merge Phase 2 and Phase 3 into the final ranking")
+    parser.add_argument(
+        "--bootstrap", type=int, nargs="?", const=BOOTSTRAP_RESAMPLES, default=None, metavar="N",
+        help=f"also estimate rank stability from N paper resamples (default {BOOTSTRAP_RESAMPLES})"
+    )
+    parser.add_argument(
+        "--weight-concentration", type=float, default=None,
+        help="with --bootstrap: also draw merge weights from a Dirichlet around MERGE_WEIGHTS "
+             "with this concentration (smaller = wider)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="bootstrap random seed")
+    parser.add_argument(
+        "--indication", default=DEFAULT_INDICATION,
+        help="indication profile to merge (AD, PD, ALS); reads and writes that profile's files"
+    )
+    return parser.parse_args(argv)
+
+def indication_paths(code: str) -> dict:
+    """Input / output paths of one indication profile."""
+    return {name: indication_path(path, code) for name, path in {
+        "phase2": PHASE2_PATH, "phase3": PHASE3_PATH, "papers": PAPERS_CSV_PATH, "out": OUT_PATH,
+        "fp_index": FP_INDEX_PATH, "snapshot": SNAPSHOT_PATH, "uncertainty": UNCERTAINTY_PATH,
+    }.items()}
+
+def load_kernel(aliases: pd.DataFrame, out_path: str = OUT_PATH, papers_path: str = PAPERS_CSV_PATH):
+    """
+    (final table, ScoringKernel) from the CSV just written, so both hold exactly
+    what the UI would parse.
+    """
+    final = load_final(out_path)
+    papers = None
+    try:
+        papers = load_papers(papers_path, usecols=FEATURE_COLUMNS)
+    except (FileNotFoundError, ValueError):
+        pass
+    return final, ScoringKernel(final, papers, aliases=alias_map(aliases))
+
+def write_dashboard_snapshot(final: pd.DataFrame, kernel: ScoringKernel, path: str = SNAPSHOT_PATH,
+                             sources=(OUT_PATH, PAPERS_CSV_PATH, ALIASES_PATH)):
+    """
+    Dashboard snapshot (common.snapshot): the saved ranking in compact dtypes plus
+    the scoring-kernel arrays and drug -> paper index, so the UI skips the CSV parses.
+    """
+    write_snapshot(path, final, kernel, sources=list(sources))
+    print("✅ Saved:", path)
+
+def write_rank_uncertainty(final: pd.DataFrame, kernel: ScoringKernel, n_resamples: int,
+                           weight_concentration: float = None, seed: int = 0,
+                           path: str = UNCERTAINTY_PATH, params: dict = None) -> pd.DataFrame:
+    """
+    Bootstrap rank stability of the saved ranking (ScoringKernel.rank_uncertainty):
+    each drug's papers are resampled with replacement, so a rank resting on a
+    couple of lucky papers shows up as a wide interval and a low top-K probability.
+    """
+    started = time.perf_counter()
+    stats = kernel.rank_uncertainty(
+        MERGE_WEIGHTS, n_resamples, top_k=BOOTSTRAP_TOP_K, interval=BOOTSTRAP_INTERVAL,
+        weight_concentration=weight_concentration, seed=seed, params=params
+    )
+    out = pd.concat([
+        pd.DataFrame({
+            "drug_name": final["drug_name"].to_numpy(),
+            "rank": np.arange(1, len(final) + 1),
+            "n_papers": final["n_papers"].to_numpy(),
+            "final_score": final["final_score"].to_numpy(),
+        }),
+        stats,
+    ], axis=1)
+    out.to_csv(path, index=False)
+    print(f"✅ Saved: {path} ({n_resamples} resamples in {time.perf_counter() - started:.1f}s)")
+    return out
+
+def main(argv=None):
+    args = parse_args(argv)
+    code = args.indication.strip().upper()
+    profile = get_profile(code)
+    paths = indication_paths(code)
+    p2 = pd.read_csv(paths["phase2"])
+    # Phase 3 mines one representative per structure; give every alias its row
+    # (categorical models / int counts; scores stay float64 for the saved ranking)
+    aliases = load_aliases(ALIASES_PATH)
+    p3 = fan_out(load_lit_evidence(paths["phase3"]), aliases)
 
     # ---- detect name columns ----
     # Phase 2: prefer drug_name_out, else compound_name, else drug_name
@@ -48,21 +157,17 @@ def main():
     for c in ["signed_score", "evidence_score", "net_positive", "n_papers", "confidence"]:
         merged[c] = merged[c].fillna(0)
 
-    merged["models"] = merged["models"].fillna("")
+    merged["models"] = merged["models"].cat.add_categories([""]).fillna("")
 
-    # ---- normalize and final score ----
-    # Hackathon-friendly weights:
-    # - Phase 2: plausibility (target/mechanism) = 45%
-    # - Phase 3: literature support (signed_score) = 45%
-    # - Confidence = 10%
+    # ---- normalize and final score (see MERGE_WEIGHTS) ----
     merged["phase2_norm"] = minmax(merged[p2_score_col])
     merged["phase3_norm"] = minmax(merged["signed_score"])
     merged["conf_norm"]   = minmax(merged["confidence"])
 
     merged["final_score"] = (
-        0.45 * merged["phase2_norm"] +
-        0.45 * merged["phase3_norm"] +
-        0.10 * merged["conf_norm"]
+        MERGE_WEIGHTS["phase2"] * merged["phase2_norm"] +
+        MERGE_WEIGHTS["phase3"] * merged["phase3_norm"] +
+        MERGE_WEIGHTS["confidence"] * merged["conf_norm"]
     )
 
     # Output nice columns
@@ -82,12 +187,40 @@ def main():
         "final_score"
     ]
 
-    merged = merged.sort_values("final_score", ascending=False)
-
-    merged[out_cols].to_csv(OUT_PATH, index=False)
-    print("✅ Saved:", OUT_PATH)
+    # The saved leaderboard is the fully sorted ranking, built once here
+    merged = sort_ranked(merged, "final_score")
+
+    # ---- structural analogs (closest other BBB+ drug by Tanimoto on Morgan
+    #      fingerprints; indexed in leaderboard order so the dashboard reuses
+    #      the same file). Left out without RDKit: no structural fingerprint. ----
+    if "SMILES" in merged.columns and not rdkit_available():
+        print("RDKit not installed: nearest_analog / analog_similarity left out")
+    elif "SMILES" in merged.columns:
+        fp_index = load_or_build(paths["fp_index"], merged["drug_name"], merged["SMILES"])
+        pos, sim = fp_index.nearest_neighbours()
+        found = (pos >= 0) & (sim > 0)
+        merged["nearest_analog"] = np.where(found, fp_index.keys[pos], "")
+        merged["analog_similarity"] = np.where(found, sim, 0.0).round(3)
+        out_cols += ["nearest_analog", "analog_similarity"]
+
+    top = top_k(merged, "final_score", 15)
+
+    merged[out_cols].to_csv(paths["out"], index=False)
+    print("✅ Saved:", paths["out"])
+    final, kernel = load_kernel(aliases, paths["out"], paths["papers"])
+    write_dashboard_snapshot(
+        final, kernel, paths["snapshot"], sources=[paths["out"], paths["papers"], ALIASES_PATH]
+    )
     print("\nTop 15 candidates:")
-    print(merged[out_cols].head(15).to_string(index=False))
+    print(top[out_cols].to_string(index=False))
+
+    if args.bootstrap:
+        uncertainty = write_rank_uncertainty(
+            final, kernel, args.bootstrap, args.weight_concentration, args.seed,
+            path=paths["uncertainty"], params={"model_weights": profile["model_weights"]}
+        )
+        print(f"\nRank stability of the top 15 ({BOOTSTRAP_INTERVAL:.0%} bootstrap rank interval):")
+        print(uncertainty.head(15).to_string(index=False))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,276 @@
+# phase1/phase1_model_selection.py
+#
+# Model selection for the BBB classifier:
+#  - stratified k-fold CV instead of one 80/20 split
+#  - grid over random-forest and gradient-boosting variants
+#  - folds run in parallel (joblib) and are memoized on disk by
+#    (model, params, fold, number of folds, data hash, rung)
+#  - successive halving: every config is scored on a small training fraction,
+#    only the best 1/eta advance to a larger fraction
+#
+# Usage (from the project root):
+#   python phase1/phase1_model_selection.py [--folds 5] [--jobs -1] [--eta 3]
+#
+# Outputs:
+#   phase1/outputs/phase1_model_selection.csv
+#   phase1/outputs/phase1_model_selection.txt
+#   phase1/outputs/phase1_best_model.json   (picked up by phase1_predict_bbb_drugs.py)
+
+import os
+import json
+import time
+import argparse
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed, Memory
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+OUTPUT_DIR = "phase1/outputs"
+CACHE_DIR = "phase1/cache"
+SELECTION_CSV = os.path.join(OUTPUT_DIR, "phase1_model_selection.csv")
+SELECTION_TXT = os.path.join(OUTPUT_DIR, "phase1_model_selection.txt")
+BEST_PARAMS_PATH = os.path.join(OUTPUT_DIR, "phase1_best_model.json")
+
+# ------------------------------
+# Search space
+# ------------------------------
+ESTIMATORS = {
+    "random_forest": RandomForestClassifier,
+    "extra_trees": ExtraTreesClassifier,
+    "hist_gradient_boosting": HistGradientBoostingClassifier,
+}
+
+GRID = {
+    "random_forest": {
+        "n_estimators": [100, 200, 400],
+        "max_features": ["sqrt", 0.3],
+        "min_samples_leaf": [1, 3],
+    },
+    "extra_trees": {
+        "n_estimators": [200, 400],
+        "max_features": ["sqrt", 0.3],
+        "min_samples_leaf": [1, 3],
+    },
+    "hist_gradient_boosting": {
+        "learning_rate": [0.05, 0.1],
+        "max_iter": [200, 400],
+        "max_leaf_nodes": [15, 31],
+    },
+}
+
+def expand_grid(grid: dict = GRID) -> list:
+    """[(model, params), ...] for every combination, in a stable order."""
+    configs = []
+    for model, space in grid.items():
+        keys = sorted(space)
+        for values in product(*(space[k] for k in keys)):
+            configs.append((model, dict(zip(keys, values))))
+    return configs
+
+def make_estimator(model: str, params: dict, random_state: int = 42):
+    # Forests use one core each: parallelism comes from running folds/configs side by side
+    extra = {"n_jobs": 1} if model != "hist_gradient_boosting" else {}
+    return ESTIMATORS[model](random_state=random_state, **params, **extra)
+
+def config_label(model: str, params: dict) -> str:
+    return model + "(" + ", ".join(f"{k}={v}" for k, v in sorted(params.items())) + ")"
+
+# ------------------------------
+# One fold (memoized)
+# ------------------------------
+def fit_fold(model, params, fold, n_splits, fraction, data_hash, seed, X, y, train_idx, test_idx):
+    """
+    Fits one config on one fold's (sub-sampled) training part and scores the held-out part.
+    X / y and the index arrays are excluded from the cache key; data_hash,
+    seed and (fold, n_splits) stand in for them.
+    """
+    if fraction < 1.0:
+        train_idx, _ = train_test_split(
+            train_idx, train_size=fraction, stratify=y[train_idx], random_state=seed + fold
+        )
+
+    est = make_estimator(model, params, random_state=seed)
+    t0 = time.perf_counter()
+    est.fit(X[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    proba = est.predict_proba(X[test_idx])[:, 1]
+    predict_s = time.perf_counter() - t0
+
+    y_test = y[test_idx]
+    return {
+        "accuracy": accuracy_score(y_test, (proba >= 0.5).astype(int)),
+        "roc_auc": roc_auc_score(y_test, proba),
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+    }
+
+# ------------------------------
+# Successive halving
+# ------------------------------
+def rung_fractions(n_configs: int, eta: int, min_fraction: float) -> list:
+    """Training fractions per rung, ending at 1.0, e.g. [0.11, 0.33, 1.0] for eta=3."""
+    n_rungs = 1
+    while eta ** n_rungs < n_configs and min_fraction * eta ** n_rungs < 1.0:
+        n_rungs += 1
+    return [min(1.0, eta ** (r - n_rungs + 1)) for r in range(n_rungs)]
+
+def select_model(X, y, configs=None, folds: int = 5, eta: int = 3, min_fraction: float = 0.1,
+                 n_jobs: int = -1, seed: int = 42, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Runs successive halving over the configs with stratified k-fold CV.
+    Returns one row per (config, rung) with mean/std metrics and timings.
+    `cached_folds` counts the folds answered from the disk cache: their
+    timings were measured by the run that computed them.
+    """
+    configs = configs or expand_grid()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    data_hash = joblib.hash((X, y))
+
+    memory = Memory(cache_dir, verbose=0)
+    cached_fit = memory.cache(fit_fold, ignore=["X", "y", "train_idx", "test_idx"])
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y))
+
+    fractions = rung_fractions(len(configs), eta, min_fraction)
+    alive = list(range(len(configs)))
+    rows = []
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung, fraction in enumerate(fractions):
+            print(f"  Rung {rung}: {len(alive)} configs x {folds} folds on {fraction:.0%} of training data")
+            jobs = [(c, f) for c in alive for f in range(folds)]
+            args = {
+                (c, f): (configs[c][0], configs[c][1], f, folds, fraction, data_hash, seed,
+                         X, y, splits[f][0], splits[f][1])
+                for c, f in jobs
+            }
+            hits = {job: cached_fit.check_call_in_cache(*args[job]) for job in jobs}
+            results = parallel(delayed(cached_fit)(*args[job]) for job in jobs)
+
+            per_config = {}
+            for (c, f), res in zip(jobs, results):
+                per_config.setdefault(c, []).append({**res, "cached": hits[(c, f)]})
+
+            rung_rows = []
+            for c in alive:
+                m = pd.DataFrame(per_config[c])
+                model, params = configs[c]
+                rung_rows.append({
+                    "config": config_label(model, params),
+                    "model": model,
+                    "params": json.dumps(params, sort_keys=True),
+                    "rung": rung,
+                    "train_fraction": fraction,
+                    "accuracy_mean": m["accuracy"].mean(),
+                    "accuracy_std": m["accuracy"].std(ddof=0),
+                    "roc_auc_mean": m["roc_auc"].mean(),
+                    "fit_s_mean": m["fit_s"].mean(),
+                    "predict_s_mean": m["predict_s"].mean(),
+                    "cached_folds": int(m["cached"].sum()),
+                    "_idx": c,
+                })
+            rows.extend(rung_rows)
+
+            # Keep the best 1/eta (by accuracy, then AUC, then faster fit)
+            keep = max(1, len(alive) // eta)
+            ranked = sorted(rung_rows, key=lambda r: (-r["accuracy_mean"], -r["roc_auc_mean"], r["fit_s_mean"]))
+            alive = [r["_idx"] for r in ranked[:keep]]
+
+    return pd.DataFrame(rows).drop(columns="_idx")
+
+def final_rung_table(results: pd.DataFrame) -> pd.DataFrame:
+    """Each config at the last rung it reached, with a time/accuracy Pareto flag."""
+    last = results.sort_values("rung").groupby("config", sort=False).tail(1).copy()
+    last = last.sort_values(["rung", "accuracy_mean", "fit_s_mean"], ascending=[False, False, True])
+
+    # Pareto front among full-data configs: nothing else is both faster and more accurate
+    full = last[last["train_fraction"] >= 1.0]
+    acc = full["accuracy_mean"].to_numpy()
+    fit = full["fit_s_mean"].to_numpy()
+    dominated = ((acc[None, :] >= acc[:, None]) & (fit[None, :] <= fit[:, None]) &
+                 ((acc[None, :] > acc[:, None]) | (fit[None, :] < fit[:, None]))).any(axis=1)
+    last["pareto"] = False
+    last.loc[full.index[~dominated], "pareto"] = True
+    return last
+
+def write_report(results: pd.DataFrame, best: pd.Series, elapsed: float, folds: int):
+    table = final_rung_table(results)
+    results.to_csv(SELECTION_CSV, index=False)
+
+    cols = ["config", "rung", "train_fraction", "accuracy_mean", "accuracy_std",
+            "roc_auc_mean", "fit_s_mean", "cached_folds", "pareto"]
+    n_cached = int(results["cached_folds"].sum())
+    with open(SELECTION_TXT, "w", encoding="utf-8") as f:
+        f.write(f"BBB model selection: {results['config'].nunique()} configs, {folds}-fold stratified CV, "
+                f"successive halving ({results['rung'].max() + 1} rungs)\n")
+        f.write(f"Wall time: {elapsed:.1f} s, fold fits: {len(results) * folds} ({n_cached} from cache)\n")
+        if n_cached:
+            f.write("Cached folds (cached_folds column) report the fit/predict times of the run that computed them.\n")
+        f.write("\n")
+        f.write(f"Selected: {best['config']}\n")
+        f.write(f"  accuracy {best['accuracy_mean']:.4f} +/- {best['accuracy_std']:.4f}, "
+                f"AUC {best['roc_auc_mean']:.4f}, fit {best['fit_s_mean']:.2f} s/fold\n\n")
+        f.write("Time vs accuracy (pareto = no config is both faster and more accurate):\n")
+        f.write(table[cols].to_string(index=False))
+        f.write("\n")
+    return table
+
+# ------------------------------
+# Main
+# ------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated model selection for the BBB classifier.")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--eta", type=int, default=3, help="Halving factor (keep 1/eta per rung).")
+    parser.add_argument("--min-fraction", type=float, default=0.1,
+                        help="Smallest training fraction used by the first rung.")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fold fits (-1 = all cores).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from phase1_predict_bbb_drugs import load_training_data
+
+    args = parse_args(argv)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    print(" Phase 1 model selection: Loading B3DB Dataset...")
+    _, X, y = load_training_data()
+    print(f"   - {len(y)} compounds, {X.shape[1]} descriptors")
+
+    t0 = time.perf_counter()
+    results = select_model(X, y, folds=args.folds, eta=args.eta, min_fraction=args.min_fraction,
+                           n_jobs=args.jobs, seed=args.seed, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - t0
+
+    final = results[results["rung"] == results["rung"].max()]
+    best = final.sort_values(["accuracy_mean", "roc_auc_mean", "fit_s_mean"],
+                             ascending=[False, False, True]).iloc[0]
+    table = write_report(results, best, elapsed, args.folds)
+
+    with open(BEST_PARAMS_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "model": best["model"],
+            "params": json.loads(best["params"]),
+            "cv_accuracy": float(best["accuracy_mean"]),
+            "cv_roc_auc": float(best["roc_auc_mean"]),
+            "folds": args.folds,
+            "seed": args.seed,
+        }, f, indent=2)
+
+    print(table[["config", "rung", "accuracy_mean", "roc_auc_mean", "fit_s_mean", "pareto"]].head(10).to_string(index=False))
+    print(f"\n Selected: {best['config']} (accuracy {best['accuracy_mean']:.2%})")
+    print(f" Saved {SELECTION_CSV}")
+    print(f" Saved {SELECTION_TXT}")
+    print(f" Saved {BEST_PARAMS_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 # phase1/predict_BBB_drugs.py
 import os
+import sys
+import json
+import argparse
+import numpy as np
 import pandas as pd
 import joblib
 from B3DB import B3DB_DATA_DICT
@@ -7,6 +11,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
 
+# Project root on the path for the shared `common` helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.sharding import parse_shard, shard_mask, partition_path, read_partitions
+
 # -----------------------------------------
 # Configuration
 # -----------------------------------------
@@ -14,36 +22,137 @@ from sklearn.metrics import classification_report, accuracy_score
 OUTPUT_DIR = "phase1/outputs" 
 MODEL_PATH = os.path.join(OUTPUT_DIR, "phase1_model.pkl")
 CSV_PATH = os.path.join(OUTPUT_DIR, "bbb_positive_drugs.csv")
+# Written by phase1_model_selection.py; used for the production model when present
+BEST_PARAMS_PATH = os.path.join(OUTPUT_DIR, "phase1_best_model.json")
+# Descriptor columns the model was trained on, in order (read back by --score)
+FEATURES_PATH = os.path.join(OUTPUT_DIR, "phase1_features.json")
+# BBB probabilities for an external library (--score)
+SCORES_PATH = os.path.join(OUTPUT_DIR, "bbb_scores.csv")
+SCORE_CHUNK_ROWS = 50000
+
+# Metadata columns; everything else in B3DB is a numerical descriptor
+META_COLS = [
+    "compound_name", "IUPAC_name", "SMILES", "BBB+/BBB-",
+    "Inchi", "reference", "group", "comments"
+]
 
 # Ensure the output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def main():
-    print(" Phase 1: Loading B3DB Dataset...")
-    
-    # 1. Load the extended classification dataset
+def load_training_data():
+    """B3DB extended classification set -> (df, X, y) with BBB+ = 1, BBB- = 0."""
     df_ext = B3DB_DATA_DICT["B3DB_classification_extended"]
-    
-    print(f"   - Total compounds loaded: {len(df_ext)}")
 
-    # 2. Prepare features (X) and target (y)
     # removing metadata columns to leave only numerical features
-    X_ext = df_ext.drop(columns=[
-        "compound_name", "IUPAC_name", "SMILES", "BBB+/BBB-",
-        "Inchi", "reference", "group", "comments"
-    ]).values
-
-    # Map target: BBB+ = 1, BBB- = 0
+    X_ext = df_ext.drop(columns=META_COLS).values
     y_ext = df_ext["BBB+/BBB-"].map({"BBB+": 1, "BBB-": 0}).values
+    return df_ext, X_ext, y_ext
+
+def build_model():
+    """Production model: the selected configuration if one was saved, else the default forest."""
+    if os.path.exists(BEST_PARAMS_PATH):
+        from phase1_model_selection import make_estimator
+        with open(BEST_PARAMS_PATH, "r", encoding="utf-8") as f:
+            best = json.load(f)
+        print(f"  Using selected model: {best['model']} {best['params']}")
+        return make_estimator(best["model"], best["params"], random_state=42)
+    return RandomForestClassifier(n_estimators=200, random_state=42)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Phase 1: BBB model and candidate list")
+    parser.add_argument(
+        "--score", metavar="LIBRARY_CSV", default=None,
+        help="score a library (B3DB descriptor columns) with the saved model instead of training"
+    )
+    parser.add_argument("--name-col", default=None, help="library name column (default: first column)")
+    parser.add_argument(
+        "--shard", type=parse_shard, default=None, metavar="I/N",
+        help="with --score: score only shard I of N (0-based, by name hash) into a partition"
+    )
+    parser.add_argument(
+        "--merge-shards", type=int, default=None, metavar="N",
+        help="combine the partitions of an N-shard --score run into bbb_scores.csv"
+    )
+    return parser.parse_args(argv)
+
+def score_library(library_path: str, name_col: str = None, shard: tuple = None,
+                  chunk_rows: int = SCORE_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    BBB+ probability per library row, in library order, read in chunks.
+    With a shard, only rows whose name hashes to it are scored and a `row`
+    column (library position) is kept for merge_scores().
+    """
+    model = joblib.load(MODEL_PATH)
+    with open(FEATURES_PATH, "r", encoding="utf-8") as f:
+        features = json.load(f)
+    positive = list(model.classes_).index(1)
+
+    parts = []
+    for chunk in pd.read_csv(library_path, chunksize=chunk_rows):
+        name_col = name_col or chunk.columns[0]
+        missing = [c for c in features if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"{library_path} lacks {len(missing)} model descriptors, e.g. {missing[:5]}")
+        if shard is not None:
+            chunk = chunk[shard_mask(chunk[name_col].astype(str), shard)]
+        if chunk.empty:
+            continue
+
+        proba = model.predict_proba(chunk[features].values)
+        out = pd.DataFrame({"compound_name": chunk[name_col].to_numpy()}, index=chunk.index)
+        if "SMILES" in chunk.columns:
+            out["SMILES"] = chunk["SMILES"].to_numpy()
+        out["bbb_prob"] = proba[:, positive]
+        out["bbb_label"] = np.where(proba.argmax(axis=1) == positive, "BBB+", "BBB-")
+        parts.append(out)
+
+    scores = pd.concat(parts) if parts else pd.DataFrame(columns=["compound_name", "bbb_prob", "bbb_label"])
+    if shard is not None:
+        scores.insert(0, "row", scores.index)
+    return scores.reset_index(drop=True)
+
+def merge_scores(n: int) -> pd.DataFrame:
+    """Partitions of an n-shard --score run, back in library order (fields unchanged)."""
+    scores = read_partitions(SCORES_PATH, n)
+    if scores.empty:
+        return scores
+    order = np.argsort(scores["row"].astype(np.int64).to_numpy(), kind="stable")
+    return scores.iloc[order].drop(columns="row")
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.merge_shards:
+        scores = merge_scores(args.merge_shards)
+        scores.to_csv(SCORES_PATH, index=False)
+        print(f" Merged {args.merge_shards} shards into {SCORES_PATH} ({len(scores)} compounds)")
+        return
+
+    if args.score:
+        print(f" Phase 1: Scoring {args.score} with {MODEL_PATH}...")
+        scores = score_library(args.score, args.name_col, args.shard)
+        out_path = partition_path(SCORES_PATH, args.shard)
+        scores.to_csv(out_path, index=False)
+        print(f" Scores saved to: {out_path} ({len(scores)} compounds)")
+        if args.shard is not None:
+            print(f"   - run --merge-shards {args.shard[1]} once every shard has finished")
+        return
+
+    print(" Phase 1: Loading B3DB Dataset...")
+    
+    # 1-2. Load the extended classification dataset, features (X) and target (y)
+    df_ext, X_ext, y_ext = load_training_data()
+    
+    print(f"   - Total compounds loaded: {len(df_ext)}")
 
     # 3. Train/Test Split
-    print("  Training Random Forest Model...")
+    print("  Training BBB Model...")
     X_train, X_test, y_train, y_test = train_test_split(
         X_ext, y_ext, test_size=0.2, random_state=42, stratify=y_ext
     )
 
     # 4. Train Model
-    model = RandomForestClassifier(n_estimators=200, random_state=42)
+    model = build_model()
     model.fit(X_train, y_train)
 
     # 5. Evaluate
@@ -55,6 +164,8 @@ def main():
 
     # 6. Save the Model (Local File)
     joblib.dump(model, MODEL_PATH)
+    with open(FEATURES_PATH, "w", encoding="utf-8") as f:
+        json.dump(list(df_ext.columns.drop(META_COLS)), f)
     print(f" Model saved to: {MODEL_PATH}")
 
     # 7. Extract BBB+ Candidates for Phase 2
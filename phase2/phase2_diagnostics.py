@@ -0,0 +1,145 @@
+# Phase 2 diagnostics (quality check + evaluation in one pass)
+#
+# Runs on the in-memory scoring result at the end of phase2_scoring.py:
+#   run_diagnostics(out, "outputs")
+# Standalone, against the saved CSV:
+#   python phase2/phase2_diagnostics.py
+#
+# Outputs:
+#   phase2_diagnostics.json
+#   phase2_diagnostics.txt
+
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.ranking import top_k_positions
+
+PHASE2_DIR = os.path.dirname(os.path.abspath(__file__))
+SCORED_CSV = os.path.join(PHASE2_DIR, "outputs", "phase2_scored_drugs.csv")
+
+JUNK_PREFIXES = ("chembl", "unii", "nsc")
+MAX_TARGETS_FOR_SHORTLIST = 50
+VIEW_COLS = ["drug_name_out", "num_targets_moa", "num_core_hits", "ad_hit_targets", "phase2_score"]
+
+def junk_name_mask(names: pd.Series) -> np.ndarray:
+    """Likely non-drugs: missing, placeholder, registry IDs, or very short names."""
+    n = names.where(names.notna(), "").astype(str).str.strip().str.lower()
+    return (
+        names.isna() |
+        n.isin({"-", ""}) |
+        n.str.startswith(JUNK_PREFIXES) |
+        (n.str.len() < 4)
+    ).to_numpy()
+
+def has_target_mask(targets: pd.Series, gene: str) -> np.ndarray:
+    """Exact gene match inside ';'-joined target lists (no regex)."""
+    t = ";" + targets.fillna("").astype(str) + ";"
+    return t.str.contains(f";{gene};", regex=False).to_numpy()
+
+def _records(df: pd.DataFrame, positions) -> list:
+    view = df.iloc[positions][VIEW_COLS]
+    return view.astype(object).where(view.notna(), None).to_dict("records")
+
+def compute_diagnostics(df: pd.DataFrame) -> dict:
+    """
+    Every Phase 2 QA statistic from one set of column arrays.
+    Rankings use a single top-100 selection plus masked top-K selections;
+    the frame is never fully sorted.
+    """
+    score = df["phase2_score"].fillna(0.0).to_numpy(dtype=float)
+    core_hits = df["num_core_hits"].fillna(0).to_numpy()
+    n_targets = df["num_targets_moa"].fillna(0).to_numpy()
+
+    nonzero = score > 0
+    core = core_hits > 0
+    junk = junk_name_mask(df["drug_name_out"])
+    has_ache = has_target_mask(df["ad_hit_targets"], "ACHE")
+    shortlist = ~junk & (n_targets > 0) & (n_targets <= MAX_TARGETS_FOR_SHORTLIST)
+
+    total = len(df)
+    q25, q50, q75 = np.percentile(score, [25, 50, 75]) if total else (0.0, 0.0, 0.0)
+
+    # One ranking pass for the global head; nonzero drugs are a prefix of it
+    top100 = top_k_positions(score, 100)
+    top_nonzero = top100[nonzero[top100]][:25]
+    top_core = np.flatnonzero(core)[top_k_positions(score[core], 25)]
+    top_shortlist = np.flatnonzero(shortlist)[top_k_positions(score[shortlist], 30)]
+
+    return {
+        "total": total,
+        "columns": df.columns.tolist(),
+        "score_stats": {
+            "count": total,
+            "mean": float(score.mean()) if total else 0.0,
+            "std": float(score.std(ddof=1)) if total > 1 else 0.0,
+            "min": float(score.min()) if total else 0.0,
+            "25%": float(q25),
+            "50%": float(q50),
+            "75%": float(q75),
+            "max": float(score.max()) if total else 0.0,
+        },
+        "nonzero": int(nonzero.sum()),
+        "nonzero_pct": 100.0 * nonzero.mean() if total else 0.0,
+        "core_hit": int(core.sum()),
+        "core_hit_pct": 100.0 * core.mean() if total else 0.0,
+        "ache_fraction_of_nonzero": float(has_ache[nonzero].mean()) if nonzero.any() else 0.0,
+        "junk_fraction_top100": float(junk[top100].mean()) if len(top100) else 0.0,
+        "top30": _records(df, top100[:30]),
+        "top25_nonzero": _records(df, top_nonzero),
+        "top25_core_hit": _records(df, top_core),
+        "shortlist_top30": _records(df, top_shortlist),
+    }
+
+def format_report(d: dict) -> str:
+    def table(records):
+        return pd.DataFrame(records, columns=VIEW_COLS).to_string(index=False)
+
+    s = d["score_stats"]
+    lines = [
+        f"Total drugs: {d['total']}",
+        f"Non-zero: {d['nonzero']} ({d['nonzero_pct']:.2f}%)",
+        f"Core-hit drugs (num_core_hits>0): {d['core_hit']} ({d['core_hit_pct']:.2f}%)",
+        "",
+        "Score stats:",
+        "  " + "  ".join(f"{k}={v:.4g}" for k, v in s.items()),
+        "",
+        f"Has ACHE among non-zero drugs: {d['ache_fraction_of_nonzero']:.3f} (fraction)",
+        f"Junk-name drugs in top 100: {d['junk_fraction_top100']:.3f} (fraction)",
+        "",
+        "Top 30 (current scoring):",
+        table(d["top30"]),
+        "",
+        "Top 25 non-zero:",
+        table(d["top25_nonzero"]),
+        "",
+        "Top 25 CORE-HIT ONLY (this is your true shortlist):",
+        table(d["top25_core_hit"]),
+        "",
+        f"Filtered top 30 (no junk names, 1-{MAX_TARGETS_FOR_SHORTLIST} MOA targets):",
+        table(d["shortlist_top30"]),
+        "",
+    ]
+    return "\n".join(lines)
+
+def run_diagnostics(df: pd.DataFrame, out_dir: str) -> dict:
+    """Computes diagnostics on an in-memory scored frame and writes JSON + text."""
+    diag = compute_diagnostics(df)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "phase2_diagnostics.json"), "w", encoding="utf-8") as f:
+        json.dump(diag, f, indent=2)
+    with open(os.path.join(out_dir, "phase2_diagnostics.txt"), "w", encoding="utf-8") as f:
+        f.write(format_report(diag))
+    return diag
+
+def main():
+    df = pd.read_csv(SCORED_CSV)
+    diag = run_diagnostics(df, os.path.dirname(SCORED_CSV))
+    print(format_report(diag))
+    print(" Saved phase2_diagnostics.json / phase2_diagnostics.txt")
+
+if __name__ == "__main__":
+    main()
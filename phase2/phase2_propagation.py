@@ -0,0 +1,97 @@
+# Phase 2 network propagation
+#
+# Random walk with restart (RWR) over a protein-protein interaction graph,
+# seeded from the weighted AD gene modules, so targets one or two hops away
+# from e.g. GSK3B receive partial credit.
+#
+# Input (optional, enables the mode in phase2_scoring.py):
+#   ../database/ppi_edges.csv   columns: gene_a, gene_b[, weight]
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+RESTART_PROB = 0.5
+RWR_TOL = 1e-8
+RWR_MAX_ITER = 200
+
+def load_ppi(path: str):
+    """
+    Reads an edge list into a symmetric, column-normalized CSR matrix.
+    Returns (genes, W) where genes[i] is the upper-case symbol of node i.
+    """
+    edges = pd.read_csv(path, usecols=lambda c: c in {"gene_a", "gene_b", "weight"})
+    a = edges["gene_a"].astype(str).str.strip().str.upper().to_numpy()
+    b = edges["gene_b"].astype(str).str.strip().str.upper().to_numpy()
+    w = edges["weight"].fillna(1.0).to_numpy(dtype=float) if "weight" in edges.columns else np.ones(len(edges))
+
+    codes, genes = pd.factorize(np.concatenate([a, b]))
+    n, m = len(genes), len(a)
+    src, dst = codes[:m], codes[m:]
+    keep = src != dst  # self-loops carry no propagation signal
+
+    rows = np.concatenate([src[keep], dst[keep]])
+    cols = np.concatenate([dst[keep], src[keep]])
+    vals = np.concatenate([w[keep], w[keep]])
+    A = sp.csr_matrix((vals, (rows, cols)), shape=(n, n))  # duplicates are summed
+
+    # Column-normalize: W[:, j] sums to 1 for every node with neighbours
+    deg = np.asarray(A.sum(axis=0)).ravel()
+    inv = np.divide(1.0, deg, out=np.zeros_like(deg), where=deg > 0)
+    W = (A @ sp.diags(inv)).tocsr()
+    return np.asarray(genes, dtype=object), W
+
+def random_walk_with_restart(W, p0, restart: float = RESTART_PROB,
+                             tol: float = RWR_TOL, max_iter: int = RWR_MAX_ITER) -> np.ndarray:
+    """Iterates p = (1 - r) W p + r p0 until the L1 change drops below tol."""
+    p0 = np.asarray(p0, dtype=float)
+    total = p0.sum()
+    if total <= 0:
+        return np.zeros_like(p0)
+    p0 = p0 / total
+    p = p0.copy()
+    for _ in range(max_iter):
+        p_next = (1.0 - restart) * (W @ p) + restart * p0
+        if np.abs(p_next - p).sum() < tol:
+            return p_next
+        p = p_next
+    return p
+
+def drug_target_matrix(drug_keys: pd.Series, targets: pd.Series, genes):
+    """
+    Sparse drug x gene incidence (1 per distinct drug-target pair in the graph).
+    Returns (drug_index, D).
+    """
+    gene_pos = pd.Index(genes)
+    pairs = pd.DataFrame({"drug": drug_keys.to_numpy(), "t": targets.to_numpy()}).drop_duplicates()
+    g = gene_pos.get_indexer(pairs["t"])
+    pairs = pairs[g >= 0]
+    g = g[g >= 0]
+
+    d_codes, drug_index = pd.factorize(pairs["drug"])
+    D = sp.csr_matrix(
+        (np.ones(len(g)), (d_codes, g)),
+        shape=(len(drug_index), len(gene_pos)),
+    )
+    return drug_index, D
+
+def propagation_scores(moa: pd.DataFrame, ppi_path: str, weight_fn, exclude_fn,
+                       restart: float = RESTART_PROB) -> pd.Series:
+    """
+    Network score per drug_norm in [0, 1]:
+      affinity = RWR from seeds weighted by weight_fn(gene),
+      score    = summed affinity of the drug's non-excluded targets / its MOA target count,
+    scaled by the best drug.
+    """
+    genes, W = load_ppi(ppi_path)
+    seed = np.fromiter((weight_fn(g) for g in genes), dtype=float, count=len(genes))
+    affinity = random_walk_with_restart(W, seed, restart=restart)
+
+    usable = moa[~moa["t_upper"].map(exclude_fn)]
+    drug_index, D = drug_target_matrix(usable["drug_norm"], usable["t_upper"], genes)
+
+    n_targets = moa.groupby("drug_norm")["t_upper"].nunique().reindex(drug_index).to_numpy()
+    raw = D @ affinity / np.clip(n_targets, 1, None)
+    best = raw.max() if len(raw) else 0.0
+    scores = raw / best if best > 0 else raw
+    return pd.Series(scores, index=drug_index, name="network_score")
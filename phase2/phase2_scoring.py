@@ -1,15 +1,29 @@
 # Inputs:
 #   bbb_positive_drugs.csv
 #   chembl_drug_mechanism_curated.csv
-#   ad_genes_disgenet.csv
+#   ad_genes_disgenet.csv (or the ad_genes.pkl frozenset written next to it)
+#   ppi_edges.csv (optional: network propagation scoring with --network)
 #
 # Outputs:
 #   phase2_scored_drugs.csv
 #   phase2_report.txt
+#
+# --indication PD|ALS scores against another profile's modules and gene set
+# (common.indications) and writes suffixed outputs (phase2_scored_drugs_pd.csv);
+# column names keep their ad_ prefix so downstream readers stay unchanged.
 
+import os
+import sys
+import argparse
 import pandas as pd
 import re
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.ranking import top_k, sort_ranked
+from phase2_diagnostics import run_diagnostics
+from database.gene_sources import load_gene_set
+from common.indications import get_profile, indication_path, DEFAULT_INDICATION
+
 def norm_name(x: str) -> str:
     if pd.isna(x):
         return ""
@@ -19,14 +33,26 @@ def norm_name(x: str) -> str:
     x = re.sub(r"\s+", " ", x).strip()
     return x
 
+parser = argparse.ArgumentParser(description="Phase 2: target-module scoring")
+parser.add_argument("--indication", default=DEFAULT_INDICATION, help="indication profile (AD, PD, ALS)")
+parser.add_argument("--network", action="store_true",
+                    help="blend a PPI network-propagation score into phase2_score (needs ../database/ppi_edges.csv)")
+args = parser.parse_args()
+profile = get_profile(args.indication)
+INDICATION = args.indication.strip().upper()
+
+SCORED_PATH = indication_path("outputs/phase2_scored_drugs.csv", INDICATION)
+REPORT_PATH = indication_path("outputs/phase2_report.txt", INDICATION)
+
 print(" Phase 2 v3 scoring started (pathology-focused)")
+if INDICATION != DEFAULT_INDICATION:
+    print(f" Indication profile: {INDICATION} ({profile['name']})")
 
 # --------------------------
 # 1) Load inputs
 # --------------------------
 bbb = pd.read_csv("../phase1/outputs/bbb_positive_drugs.csv")
 moa = pd.read_csv("../database/chembl_drug_mechanism_curated.csv")
-ad  = pd.read_csv("../database/ad_genes_disgenet.csv")
 
 # --------------------------
 # 2) Detect BBB drug column
@@ -56,25 +82,22 @@ moa.loc[mask_empty, "target_best"] = moa.loc[mask_empty, "target_name"]
 
 moa["t_upper"] = moa["target_best"].astype(str).str.upper()
 
-# AD gene set (broad)
-ad_genes_upper = set(ad["gene_symbol"].astype(str).str.strip().str.upper().tolist())
+# Disease gene set (broad): precomputed frozenset, CSV fallback
+genes_csv, genes_pickle = (os.path.join("../database", f) for f in profile["gene_set"])
+if os.path.exists(genes_csv) or os.path.exists(genes_pickle):
+    ad_genes_upper = load_gene_set(genes_csv, genes_pickle)
+else:
+    print(f" No broad gene set for {INDICATION} ({genes_csv}); scoring on its modules only")
+    ad_genes_upper = frozenset()
 
 # --------------------------
 # 3) Define pathology-focused modules
 # --------------------------
-# Core disease-modifying modules
-AMYLOID  = {"APP","BACE1","PSEN1","PSEN2","ADAM10"}
-TAU      = {"MAPT","GSK3B","CDK5","MARK4","CSNK1D","CSNK1E"}  # add casein kinases (tau-related)
-MICROGLIA= {"TREM2","CSF1R","TYROBP","SPI1"}                  # microglia/immune genetics
-LIPID    = {"APOE","CLU","ABCA7","SORL1"}
-
-CORE = AMYLOID | TAU | MICROGLIA | LIPID
-
-# Secondary supportive modules (still relevant, lower weight)
-INFLAM = {"TNF","IL1B","IL6","NFKB1","PTGS2"}
-MITO_OX= {"NFE2L2","SOD1","SOD2","PPARGC1A","PINK1","PARK7"}
-
-SECONDARY = INFLAM | MITO_OX
+# Core disease-modifying modules, then secondary supportive ones (still
+# relevant, lower weight), as defined by the indication profile
+MODULES = profile["modules"]
+CORE = set().union(*MODULES["core"].values())
+SECONDARY = set().union(*MODULES["secondary"].values())
 
 # Symptomatic / nonspecific CNS targets that we DO NOT want to dominate Phase 2
 # (These are not "wrong", but they aren't disease-modifying signals.)
@@ -93,8 +116,8 @@ EXCLUDE_EXACT = {
     "CNR1",   # cannabinoid receptor 1
 }
 
-# Symptomatic Alzheimer target (keep, but low weight)
-LOW_SYMP = {"ACHE"}
+# Symptomatic targets of the indication, e.g. ACHE for AD (keep, but low weight)
+LOW_SYMP = profile["symptomatic"]
 
 def is_excluded_target(t: str) -> bool:
     t = str(t).upper().strip()
@@ -117,7 +140,7 @@ def target_weight(t: str) -> float:
     if t in LOW_SYMP:
         return 0.25
 
-    # Broad AD genes from DisGeNET: very low weight (prevents NR3C1/DRD-like dominance)
+    # Broad disease genes from DisGeNET: very low weight (prevents NR3C1/DRD-like dominance)
     if t in ad_genes_upper:
         return 0.5
 
@@ -197,26 +220,69 @@ if "bbb_score" in out.columns:
 else:
     out["phase2_score"] = out["ad_score_gated"]
 
-out = out.sort_values("phase2_score", ascending=False)
+# --------------------------
+# 6b) Optional network propagation (PPI random walk with restart)
+# --------------------------
+PPI_EDGES_PATH = "../database/ppi_edges.csv"
+NETWORK_WEIGHT = 0.3   # share of phase2_score taken by the network score
+
+# network_score is in [0, 1]; it is put on the module-score scale (x best
+# module score) before blending, and only drugs with a target in the graph
+# are blended, so the others keep their module score and the range holds.
+n_blended = None
+if args.network:
+    if not os.path.exists(PPI_EDGES_PATH):
+        parser.error(f"--network needs {PPI_EDGES_PATH}")
+    from phase2_propagation import propagation_scores
+
+    network = propagation_scores(moa, PPI_EDGES_PATH, target_weight, is_excluded_target)
+    out["network_score"] = out["drug_norm"].map(network)
+    in_graph = out["network_score"].notna()
+    module_max = out["phase2_score"].max()
+    out.loc[in_graph, "phase2_score"] = (
+        (1 - NETWORK_WEIGHT) * out.loc[in_graph, "phase2_score"]
+        + NETWORK_WEIGHT * module_max * out.loc[in_graph, "network_score"]
+    )
+    out["network_score"] = out["network_score"].fillna(0.0)
+    n_blended = int(in_graph.sum())
+    print(f" Network propagation: {int((out['network_score'] > 0).sum())} drugs reached from {INDICATION} seeds, "
+          f"{n_blended} blended")
 
 # --------------------------
 # 7) Save outputs
 # --------------------------
-out.to_csv("outputs/phase2_scored_drugs.csv", index=False)
+top = top_k(out, "phase2_score", 30)[["drug_name_out", "num_targets_moa", "num_core_hits", "ad_hit_targets", "phase2_score"]]
 
-top = out.head(30)[["drug_name_out", "num_targets_moa", "num_core_hits", "ad_hit_targets", "phase2_score"]]
+# Persisted table carries the full ranking (the one full sort of the run)
+out = sort_ranked(out, "phase2_score")
+out.to_csv(SCORED_PATH, index=False)
 
-with open("outputs/phase2_report.txt", "w", encoding="utf-8") as f:
+with open(REPORT_PATH, "w", encoding="utf-8") as f:
     f.write(f"Total BBB+ drugs: {len(out)}\n")
     nonzero = (out["phase2_score"] > 0).sum()
     f.write(f"Non-zero Phase2 v3 score: {nonzero} ({100*nonzero/len(out):.2f}%)\n")
-    f.write(f"Core-hit drugs (num_core_hits>0): {(out['num_core_hits']>0).sum()} ({100*(out['num_core_hits']>0).mean():.2f}%)\n\n")
+    f.write(f"Core-hit drugs (num_core_hits>0): {(out['num_core_hits']>0).sum()} ({100*(out['num_core_hits']>0).mean():.2f}%)\n")
+    f.write(f"phase2_score range: {out['phase2_score'].min():.4f} .. {out['phase2_score'].max():.4f} "
+            f"(module score: summed target weights / MOA targets, core target = 5)\n")
+    if n_blended is not None:
+        f.write(f"Network blend: {n_blended} drugs with a target in the PPI graph get "
+                f"{1 - NETWORK_WEIGHT:.0%} module score + {NETWORK_WEIGHT:.0%} network score "
+                f"(scaled to the best module score); the rest keep the module score\n")
+    f.write("\n")
     f.write("Top 30 candidates:\n")
     f.write(top.to_string(index=False))
     f.write("\n")
 
-print(" Saved phase2_scored_drugs.csv")
-print(" Saved phase2_report.txt")
+print(f" Saved {os.path.basename(SCORED_PATH)}")
+print(f" Saved {os.path.basename(REPORT_PATH)}")
+
+# QA on the in-memory result (no reload, no extra sorts); its checks are
+# tuned to the AD modules (ACHE dominance)
+if INDICATION == DEFAULT_INDICATION:
+    diagnostics = run_diagnostics(out, "outputs")
+    print(" Saved phase2_diagnostics.json / phase2_diagnostics.txt")
+    print(f" ACHE share of non-zero drugs: {diagnostics['ache_fraction_of_nonzero']:.3f}, "
+          f"junk names in top 100: {diagnostics['junk_fraction_top100']:.3f}")
 print("\nTop 30 candidates:")
 print(top)
 
@@ -2,6 +2,17 @@
 
 import os
 
+from common.indications import (
+    INDICATION_PROFILES, DEFAULT_INDICATION, MODEL_WEIGHTS, disease_clause, indication_path
+)
+
+# -------- Indication profiles (common.indications) --------
+# Papers are fetched once with the union of these profiles' queries and gated
+# against each of them in the same extraction pass; every profile gets its
+# own papers / evidence / report outputs. ["AD"] is the original pipeline.
+INDICATIONS = ["AD"]
+SEARCH_SCOPE = "-".join(INDICATIONS)   # cache keys, checkpoint and journal per scope
+
 # -------- Paths --------
 # Resolve paths relative to this config file's location
 CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,29 +23,77 @@ BBB_CSV_PATH = os.path.join(PROJECT_ROOT, "phase2", "outputs", "phase2_scored_dr
 
 # -------- Literature mining limits --------
 MAX_PAPERS_PER_DRUG = 50   # safe default (increase later if needed)
+MAX_PAPERS_PER_SEARCH = MAX_PAPERS_PER_DRUG * len(INDICATIONS)   # union queries share one page
 
 # ---- Output/cache dirs ----
 OUT_DIR = os.path.join(PROJECT_ROOT, "phase3", "outputs")
 CACHE_DIR = os.path.join(PROJECT_ROOT, "phase3", "cache")
 
+# ---- Extracted paper store (indexed by drug, read lazily by the UI) ----
+PAPERS_CSV_PATH = os.path.join(OUT_DIR, "phase3_papers.csv")
+PAPER_STORE_PATH = os.path.join(OUT_DIR, "phase3_papers.sqlite")
+
+# ---- Drug-level evidence (final_merge input; partial snapshots during a run) ----
+LIT_EVIDENCE_PATH = os.path.join(OUT_DIR, "phase3_lit_evidence.csv")
+
+# ---- Streaming pipeline (fetch -> extract -> aggregate, see phase3_pipeline) ----
+PIPELINE_QUEUE_SIZE = 64          # drugs buffered between stages (backpressure)
+PIPELINE_EXTRACT_BATCH = 32       # drugs per extraction / classifier micro-batch
+PIPELINE_SNAPSHOT_SECONDS = 60    # partial phase3_lit_evidence.csv interval
+
+# ---- Anytime mining schedule (highest phase2_score first, see phase3_scheduler) ----
+SCHEDULE_PATH = indication_path(os.path.join(OUT_DIR, "phase3_schedule.json"), SEARCH_SCOPE)
+SCHEDULE_PRIORITY_COL = "phase2_score"
+MAX_NEW_DRUGS_PER_RUN = 500       # drugs not mined before; raise once stable
+
+# ---- Run journal (per-drug fetch outcomes, appended as they happen) ----
+JOURNAL_PATH = indication_path(os.path.join(OUT_DIR, "phase3_journal.jsonl"), SEARCH_SCOPE)
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024   # rewritten as one line per drug beyond this
+
+# ---- Paper cache entries (status-tagged: ok / empty / error) ----
+CACHE_EMPTY_TTL_DAYS = 30   # "no papers" is re-checked after this; errors are always retried
+
+# ---- Candidate dedup (alias -> representative mined in its place) ----
+ALIASES_PATH = os.path.join(OUT_DIR, "phase3_drug_aliases.csv")
+
+# ---- Offline full-text index over cached Europe PMC records ----
+LIT_INDEX_PATH = os.path.join(CACHE_DIR, "literature_index.sqlite")
+
 # ---- Europe PMC API ----
 EUROPE_PMC_SEARCH_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
 
-# ---- Alzheimer query building ----
-# (used indirectly by search)
-AD_QUERY_TERMS = [
-    "Alzheimer", "amyloid", "Aβ", "Abeta", "tau", "microglia",
-    "mitochondria", "synapse", "neuroinflammation", "cognition", "memory"
-]
+# ---- Query planning (many drugs per Europe PMC request) ----
+DISEASE_QUERY = disease_clause(INDICATIONS)
+DISEASE_QUERIES = [INDICATION_PROFILES[c]["query"] for c in INDICATIONS]
+MAX_QUERY_CHARS = 1500      # keeps GET URLs well inside server limits
+PLANNER_PAGE_SIZE = 1000    # Europe PMC max pageSize; larger batches get split
+
+# ---- Hit-count probes (cheap idlist requests before core retrieval) ----
+PROBE_CACHE_DIR = os.path.join(CACHE_DIR, "probes")
+PROBE_TTL_DAYS = 30         # hit counts drift as papers are published
+PROBE_SLEEP_SECONDS = 0.25  # probes return one id, not core records
 
-# ---- Evidence weights ----
-MODEL_WEIGHTS = {
-    "cell": 1.0,
-    "animal": 2.0,
-    "human_observational": 2.5,
-    "clinical": 3.5,
-    "unknown": 0.2
+# ---- Optional model-based direction classifier ----
+# None keeps the transparent keyword-count direction. Set to a local model
+# directory / Hugging Face id of a sequence classifier whose labels are
+# listed in DIRECTION_LABELS to classify direction + relevance on CPU.
+# Needs `transformers` plus `onnxruntime` (backend "onnx", expects
+# model.onnx in the model dir) or `torch` (backend "torch", int8-quantized).
+DIRECTION_MODEL = None
+DIRECTION_MODEL_VERSION = "1"        # bump to invalidate cached predictions
+DIRECTION_BACKEND = "onnx"
+DIRECTION_MAX_LENGTH = 512
+DIRECTION_BATCH_TOKENS = 16384       # padded tokens per dynamic batch
+DIRECTION_THREADS = os.cpu_count() or 1
+# model label -> direction (None = not AD evidence; its probability is 1 - relevance)
+DIRECTION_LABELS = {
+    "positive": "positive",
+    "negative": "negative",
+    "neutral": "neutral",
+    "irrelevant": None,
 }
+DIRECTION_MIN_RELEVANCE = 0.5
+DIRECTION_INDICATION = "AD"          # profile the model was trained on; others keep keyword direction
 
 # ---- Extraction keywords (transparent + thesis-friendly) ----
 POSITIVE_KEYWORDS = [
@@ -47,11 +106,4 @@ NEGATIVE_KEYWORDS = [
     "toxicity", "neurotoxic", "aggravated"
 ]
 
-OUTCOME_KEYWORDS = {
-    "amyloid": ["amyloid", "aβ", "abeta", "plaque", "app", "bace1", "secretase"],
-    "tau": ["tau", "phospho-tau", "hyperphosphorylation", "tangle", "mapt", "gsk3b", "cdk5"],
-    "microglia": ["microglia", "neuroinflammation", "trem2", "csf1r", "tyrobp"],
-    "mitochondria": ["mitochondria", "atp", "oxidative", "ros", "respiration", "membrane potential"],
-    "synapse": ["synapse", "synaptic", "psd95", "spine", "synaptophysin"],
-    "cognition": ["memory", "cognitive", "learning", "morris water maze", "y-maze", "novel object recognition"]
-}
+OUTCOME_KEYWORDS = INDICATION_PROFILES[DEFAULT_INDICATION]["outcomes"]
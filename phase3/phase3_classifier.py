@@ -0,0 +1,215 @@
+# phase3/phase3_classifier.py
+#
+# Optional transformer classifier for evidence direction + AD relevance.
+# Replaces the POSITIVE/NEGATIVE keyword count when DIRECTION_MODEL is set.
+# CPU only: length-sorted dynamic batches, ONNX Runtime or int8-quantized
+# torch, a thread pool across batches, and a per-(paper, model version)
+# prediction cache so every abstract is inferred at most once.
+
+import os
+import sqlite3
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+try:
+    from .config import (
+        CACHE_DIR, DIRECTION_MODEL, DIRECTION_MODEL_VERSION, DIRECTION_BACKEND,
+        DIRECTION_MAX_LENGTH, DIRECTION_BATCH_TOKENS, DIRECTION_THREADS, DIRECTION_LABELS
+    )
+    from .phase3_extract import paper_key
+except ImportError:
+    from config import (
+        CACHE_DIR, DIRECTION_MODEL, DIRECTION_MODEL_VERSION, DIRECTION_BACKEND,
+        DIRECTION_MAX_LENGTH, DIRECTION_BATCH_TOKENS, DIRECTION_THREADS, DIRECTION_LABELS
+    )
+    from phase3_extract import paper_key
+
+PREDICTION_CACHE_PATH = os.path.join(CACHE_DIR, "direction_predictions.sqlite")
+
+def length_batches(lengths, token_budget: int = DIRECTION_BATCH_TOKENS):
+    """
+    Dynamic batching: sorts items by token length and cuts batches so that
+    (longest item x batch size) stays within the padded-token budget.
+    Returns lists of item positions.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches, current, longest = [], [], 0
+    for i in order:
+        n = max(int(lengths[i]), 1)
+        if current and max(longest, n) * (len(current) + 1) > token_budget:
+            batches.append(current)
+            current, longest = [], 0
+        current.append(int(i))
+        longest = max(longest, n)
+    if current:
+        batches.append(current)
+    return batches
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+class PredictionCache:
+    """SQLite cache of predictions keyed by (paper key, model, model version)."""
+
+    def __init__(self, model_id: str, version: str, path: str = PREDICTION_CACHE_PATH):
+        self.model_tag = f"{model_id}@{version}"
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT, model TEXT, direction TEXT, relevance REAL, "
+                "PRIMARY KEY (key, model))"
+            )
+        conn.close()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        conn = sqlite3.connect(self.path)
+        try:
+            keys = list(keys)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, direction, relevance in conn.execute(
+                    f"SELECT key, direction, relevance FROM predictions WHERE model = ? AND key IN ({marks})",
+                    (self.model_tag, *chunk)
+                ):
+                    found[key] = {"direction": direction, "relevance": relevance}
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, preds: dict):
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, model, direction, relevance) VALUES (?, ?, ?, ?)",
+                [(k, self.model_tag, v["direction"], v["relevance"]) for k, v in preds.items()]
+            )
+        conn.close()
+
+class DirectionClassifier:
+    """
+    Batched CPU inference over paper titles + abstracts.
+    predict(papers) -> {paper_key: {"direction": ..., "relevance": ...}}
+    """
+
+    def __init__(self, model: str = DIRECTION_MODEL, version: str = DIRECTION_MODEL_VERSION,
+                 backend: str = DIRECTION_BACKEND, threads: int = DIRECTION_THREADS,
+                 cache_path: str = PREDICTION_CACHE_PATH):
+        if not model:
+            raise ValueError("DIRECTION_MODEL is not set in phase3/config.py")
+        self.model_id = model
+        self.backend = backend
+        self.threads = max(1, int(threads))
+        self.cache = PredictionCache(model, version, cache_path)
+        self._loaded = False
+
+    def _load(self):
+        """Imports the optional dependencies and loads the model once."""
+        if self._loaded:
+            return
+        try:
+            from transformers import AutoTokenizer, AutoConfig
+        except ImportError as e:
+            raise ImportError("Model-based direction needs `pip install transformers`") from e
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+        id2label = AutoConfig.from_pretrained(self.model_id).id2label
+        self.labels = [str(id2label[i]).lower() for i in range(len(id2label))]
+
+        if self.backend == "onnx":
+            try:
+                import onnxruntime as ort
+            except ImportError as e:
+                raise ImportError("Backend 'onnx' needs `pip install onnxruntime`") from e
+            opts = ort.SessionOptions()
+            # Parallelism comes from the batch thread pool, not inside each run
+            opts.intra_op_num_threads = 1
+            self.session = ort.InferenceSession(
+                os.path.join(self.model_id, "model.onnx"), opts, providers=["CPUExecutionProvider"]
+            )
+            self.input_names = {i.name for i in self.session.get_inputs()}
+        elif self.backend == "torch":
+            try:
+                import torch
+                from transformers import AutoModelForSequenceClassification
+            except ImportError as e:
+                raise ImportError("Backend 'torch' needs `pip install torch`") from e
+            torch.set_num_threads(1)
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_id).eval()
+            self.torch = torch
+            self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            raise ValueError(f"Unknown DIRECTION_BACKEND: {self.backend}")
+
+        self._loaded = True
+
+    def _run_batch(self, encoded) -> np.ndarray:
+        """Pads one length-homogeneous batch and returns class probabilities."""
+        width = max(len(ids) for ids in encoded)
+        pad = self.tokenizer.pad_token_id or 0
+        input_ids = np.full((len(encoded), width), pad, dtype=np.int64)
+        attention = np.zeros((len(encoded), width), dtype=np.int64)
+        for row, ids in enumerate(encoded):
+            input_ids[row, :len(ids)] = ids
+            attention[row, :len(ids)] = 1
+
+        if self.backend == "onnx":
+            feeds = {"input_ids": input_ids, "attention_mask": attention}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            logits = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        else:
+            with self.torch.inference_mode():
+                logits = self.model(
+                    input_ids=self.torch.from_numpy(input_ids),
+                    attention_mask=self.torch.from_numpy(attention)
+                ).logits.numpy()
+        return softmax(logits)
+
+    def _to_prediction(self, probs: np.ndarray) -> dict:
+        direction_probs = {}
+        irrelevant = 0.0
+        for label, p in zip(self.labels, probs):
+            mapped = DIRECTION_LABELS.get(label, label)
+            if mapped is None:
+                irrelevant += float(p)
+            else:
+                direction_probs[mapped] = direction_probs.get(mapped, 0.0) + float(p)
+        direction = max(direction_probs, key=direction_probs.get) if direction_probs else "neutral"
+        return {"direction": direction, "relevance": 1.0 - irrelevant}
+
+    def predict(self, papers) -> dict:
+        """Predictions for every keyed paper; only cache misses are inferred."""
+        by_key = {}
+        for p in papers:
+            key = paper_key(p)
+            if key is not None:
+                by_key.setdefault(str(key), p)
+
+        preds = self.cache.get_many(by_key)
+        todo = [k for k in by_key if k not in preds]
+        if not todo:
+            return preds
+
+        self._load()
+        texts = [
+            f"{by_key[k].get('title') or ''}\n{by_key[k].get('abstractText') or ''}" for k in todo
+        ]
+        encoded = self.tokenizer(texts, truncation=True, max_length=DIRECTION_MAX_LENGTH)["input_ids"]
+        batches = length_batches([len(ids) for ids in encoded])
+
+        new_preds = {}
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            futures = [(b, pool.submit(self._run_batch, [encoded[i] for i in b])) for b in batches]
+            for batch, fut in tqdm(futures, desc="Classifying evidence direction"):
+                for i, probs in zip(batch, fut.result()):
+                    new_preds[todo[i]] = self._to_prediction(probs)
+
+        self.cache.put_many(new_preds)
+        preds.update(new_preds)
+        return preds
@@ -0,0 +1,138 @@
+# phase3/phase3_dedup.py
+#
+# Candidate deduplication before literature mining.
+# The BBB+ list holds one molecule under several names (brand names, salts,
+# separate B3DB entries). Names are grouped when they share a structure key
+# (InChIKey via RDKit, else the parent SMILES string) or the same generic
+# search term; each group is mined once under a representative name with the
+# union of its aliases' search terms, and final_merge fans the result back out.
+
+import re
+import pandas as pd
+
+try:
+    from .config import ALIASES_PATH
+    from .phase3_planner import drug_terms
+except ImportError:
+    from config import ALIASES_PATH
+    from phase3_planner import drug_terms
+
+# Registry-style identifiers make poor display names for a group
+ID_NAME = re.compile(r"^(chembl|zinc|nsc|unii|cid|cas|sid)[\s_-]?\d", re.IGNORECASE)
+GENERIC_TERM = re.compile(r"^[a-z][a-z0-9-]*[a-z]$")
+
+def _parent_smiles(smiles: str) -> str:
+    """Largest dot-separated component: strips counter-ions and solvents from salt SMILES."""
+    return max(smiles.split("."), key=len)
+
+def structure_key(smiles) -> str:
+    """InChIKey of the parent molecule when RDKit is available, else the parent SMILES."""
+    if not isinstance(smiles, str) or not smiles.strip():
+        return ""
+    smiles = smiles.strip()
+    try:
+        from rdkit import Chem, RDLogger
+        RDLogger.DisableLog("rdApp.*")
+        mol = Chem.MolFromSmiles(_parent_smiles(smiles))
+        if mol is not None:
+            return "inchikey:" + Chem.MolToInchiKey(mol)
+    except ImportError:
+        pass
+    return "smiles:" + _parent_smiles(smiles)
+
+def name_key(name: str, strict: bool = True) -> str:
+    """
+    Generic search term: identical terms mean identical queries anyway.
+    strict=True only trusts single-token generics ("nicotine", "(+)-nicotine");
+    systematic names lose their parenthesised parts and may collide.
+    """
+    term = drug_terms(name)[0]
+    if strict and not GENERIC_TERM.match(term):
+        return ""
+    return "name:" + term
+
+def _representative(names) -> str:
+    """Prefer real drug names over registry IDs, then the shortest name."""
+    return min(names, key=lambda n: (bool(ID_NAME.match(n)), len(n), n))
+
+def group_candidates(names, smiles=None) -> pd.DataFrame:
+    """
+    Groups candidate names (union-find over structure and name keys).
+    Returns one row per unique name: drug, representative, structure_key.
+    """
+    df = pd.DataFrame({
+        "drug": pd.Series(names, dtype=object).to_numpy(),
+        "smiles": pd.Series(smiles, dtype=object).to_numpy() if smiles is not None else None,
+    })
+    df = df[df["drug"].notna()]
+    df["drug"] = df["drug"].astype(str).str.strip()
+    df = df[df["drug"].ne("")].drop_duplicates("drug").reset_index(drop=True)
+
+    parent = list(range(len(df)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_with_key = {}
+    s_keys = []   # one RDKit parse + InChIKey per candidate, reused for the output column
+    for i, (drug, smi) in enumerate(zip(df["drug"], df["smiles"])):
+        s_key = structure_key(smi)
+        s_keys.append(s_key)
+        # Names without a structure fall back to the (non-strict) name key
+        for key in (s_key, name_key(drug, strict=bool(s_key))):
+            if not key:
+                continue
+            j = first_with_key.setdefault(key, i)
+            if j != i:
+                parent[find(i)] = find(j)
+
+    roots = [find(i) for i in range(len(df))]
+    df["group"] = roots
+    reps = df.groupby("group")["drug"].agg(_representative)
+    df["representative"] = df["group"].map(reps)
+    df["structure_key"] = [k or name_key(d, strict=False) for d, k in zip(df["drug"], s_keys)]
+    return df[["drug", "representative", "structure_key"]]
+
+def group_terms(aliases: pd.DataFrame) -> dict:
+    """representative -> search terms of every alias (representative's own terms first)."""
+    terms = {}
+    for rep, grp in aliases.groupby("representative", sort=True):
+        merged = list(drug_terms(rep))
+        for alias in grp["drug"]:
+            merged += [t for t in drug_terms(alias) if t not in merged]
+        terms[rep] = merged
+    return terms
+
+def write_aliases(aliases: pd.DataFrame, path: str = ALIASES_PATH):
+    aliases.to_csv(path, index=False, encoding="utf-8")
+
+def load_aliases(path: str = ALIASES_PATH) -> pd.DataFrame:
+    """Alias table, or an empty one when no dedup run has happened yet."""
+    try:
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    except FileNotFoundError:
+        return pd.DataFrame(columns=["drug", "representative", "structure_key"])
+
+def alias_map(aliases: pd.DataFrame) -> dict:
+    """Lower-cased alias -> representative name (for store/UI lookups)."""
+    return dict(zip(aliases["drug"].str.strip().str.lower(), aliases["representative"]))
+
+def resolve_alias(name: str, aliases: dict) -> str:
+    return aliases.get(str(name).strip().lower(), name)
+
+def fan_out(df: pd.DataFrame, aliases: pd.DataFrame, col: str = "drug") -> pd.DataFrame:
+    """
+    One row per alias for every representative row of `df`.
+    Rows whose name is not a known representative pass through unchanged.
+    """
+    if aliases.empty:
+        return df
+    # Aliases that already have their own row (older runs) keep it
+    own = set(df[col]) - set(aliases["representative"])
+    pairs = aliases[~aliases["drug"].isin(own)][["representative", "drug"]].rename(columns={"drug": "_alias"})
+    out = df.merge(pairs, left_on=col, right_on="representative", how="left")
+    out[col] = out["_alias"].where(out["_alias"].notna(), out[col].astype(object))
+    return out.drop(columns=["representative", "_alias"])
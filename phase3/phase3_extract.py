@@ -1,46 +1,46 @@
 # phase3/phase3_extract.py
+import os
+import json
+import sqlite3
+import hashlib
+
+from common.sharding import partition_path
 
 try:
-    from .config import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, OUTCOME_KEYWORDS
+    from .config import (
+        POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, OUTCOME_KEYWORDS, CACHE_DIR, DIRECTION_MIN_RELEVANCE,
+        INDICATIONS, INDICATION_PROFILES, DEFAULT_INDICATION
+    )
 except ImportError:
-    from config import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, OUTCOME_KEYWORDS
-
-# Strict Alzheimer pathology terms
-AD_TERMS = [
-    "alzheimer", "alzheimer's disease",
-    "amyloid plaque", "aβ plaque",
-    "phospho-tau", "tau tangle", "tauopathy"
-]
-
-# Strong preclinical AD model markers
-AD_MODEL_MARKERS = [
-    "app/ps1", "5xfad", "3xtg", "tg2576", "p301s",
-    "transgenic mouse", "morris water maze",
-    "y-maze", "novel object recognition"
-]
+    from config import (
+        POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, OUTCOME_KEYWORDS, CACHE_DIR, DIRECTION_MIN_RELEVANCE,
+        INDICATIONS, INDICATION_PROFILES, DEFAULT_INDICATION
+    )
+
+# Default (AD) profile under its original names; every profile's terms
+# live in common.indications
+_AD = INDICATION_PROFILES[DEFAULT_INDICATION]
+AD_TERMS = _AD["disease_terms"]
+AD_MODEL_MARKERS = _AD["model_markers"]
+MODEL_MARKERS = _AD["study_models"]
 
 def contains_any(text: str, terms) -> bool:
     t = (text or "").lower()
     return any(term in t for term in terms)
 
-def has_any_outcome(text: str) -> bool:
+def has_any_outcome(text: str, outcomes: dict = OUTCOME_KEYWORDS) -> bool:
     t = (text or "").lower()
-    for kws in OUTCOME_KEYWORDS.values():
+    for kws in outcomes.values():
         if any(k.lower() in t for k in kws):
             return True
     return False
 
-def detect_model(text: str) -> str:
+def detect_model(text: str, model_markers=MODEL_MARKERS) -> str:
     t = (text or "").lower()
 
-    if any(k in t for k in ["phase ii", "phase iii", "double-blind", "placebo"]):
-        return "clinical"
-    if any(k in t for k in ["cohort", "case-control", "observational"]):
-        return "human_observational"
-    if any(k in t for k in ["mouse", "mice", "rat", "transgenic", "5xfad", "3xtg", "app/ps1"]):
-        return "animal"
-    if any(k in t for k in ["cell", "in vitro", "neuronal culture", "primary neurons"]):
-        return "cell"
+    for model, markers in model_markers:
+        if any(k in t for k in markers):
+            return model
 
     return "unknown"
 
@@ -48,62 +48,178 @@ def keyword_hits(text: str, keywords) -> int:
     t = (text or "").lower()
     return sum(1 for k in keywords if k.lower() in t)
 
-def outcome_tags(text: str):
+def outcome_tags(text: str, outcomes: dict = OUTCOME_KEYWORDS):
     tags = []
     t = (text or "").lower()
-    for outcome, kws in OUTCOME_KEYWORDS.items():
+    for outcome, kws in outcomes.items():
         if any(k.lower() in t for k in kws):
             tags.append(outcome)
     return tags
 
-def extract_evidence(drug: str, paper: dict):
+def passes_gates(text: str, profile: dict = _AD) -> bool:
+    """Strict disease + model + outcome gates of one indication profile."""
+    return (
+        contains_any(text, profile["disease_terms"])
+        and contains_any(text, profile["model_markers"])
+        and has_any_outcome(text, profile["outcomes"])
+    )
+
+def paper_features(paper: dict, indications=None):
     """
-    Extracts AD-relevant evidence from a single paper.
-    Returns None if paper fails strict AD + model + outcome gates.
+    Drug-independent evidence features of one paper.
+    Returns None if the paper fails strict AD + model + outcome gates.
+    With `indications` (profile codes, see common.indications), returns
+    {code: features or None} from one pass: the direction keywords are
+    counted once and each profile adds its own gates, study model and outcomes.
     """
-
     title = paper.get("title", "") or ""
     abstract = paper.get("abstractText", "") or ""
     text = f"{title}\n{abstract}"
 
+    codes = [DEFAULT_INDICATION] if indications is None else list(indications)
+    features = dict.fromkeys(codes)
+
     # -------------------------------
     # HARD SCIENTIFIC GATES
     # -------------------------------
-    if not contains_any(text, AD_TERMS):
-        return None
-
-    if not contains_any(text, AD_MODEL_MARKERS):
-        return None
-
-    if not has_any_outcome(text):
-        return None
+    passed = [c for c in codes if passes_gates(text, INDICATION_PROFILES[c])]
 
     # -------------------------------
     # Scoring features
     # -------------------------------
-    pos = keyword_hits(text, POSITIVE_KEYWORDS)
-    neg = keyword_hits(text, NEGATIVE_KEYWORDS)
+    if passed:
+        pos = keyword_hits(text, POSITIVE_KEYWORDS)
+        neg = keyword_hits(text, NEGATIVE_KEYWORDS)
+
+        direction = "neutral"
+        if pos > neg and pos > 0:
+            direction = "positive"
+        elif neg > pos and neg > 0:
+            direction = "negative"
+
+        for c in passed:
+            profile = INDICATION_PROFILES[c]
+            features[c] = {
+                "model": detect_model(text, profile["study_models"]),
+                "direction": direction,
+                "pos_hits": pos,
+                "neg_hits": neg,
+                "outcomes": ";".join(outcome_tags(text, profile["outcomes"])),
+            }
+
+    return features[DEFAULT_INDICATION] if indications is None else features
+
+def paper_key(paper: dict):
+    """Stable paper identity (same rule the search de-duplication uses)."""
+    return paper.get("pmid") or paper.get("doi")
+
+def keyword_config_hash(indications=INDICATIONS) -> str:
+    """Hash of every term list that feeds paper_features() for these profiles."""
+    payload = json.dumps([POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS] + [
+        [code] + [INDICATION_PROFILES[code][k] for k in ("disease_terms", "model_markers", "study_models", "outcomes")]
+        for code in indications
+    ], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+FEATURE_CACHE_PATH = os.path.join(CACHE_DIR, "paper_features.sqlite")
+
+class FeatureCache:
+    """
+    Per-paper feature cache keyed by (PMID/DOI, keyword-config hash), in SQLite.
+    A paper returned for several drugs is lowercased, gated and scanned once,
+    for every active indication profile at a time ({code: features});
+    gate failures are cached too (as None). Lookups are point queries and new
+    rows are written in batches of `flush_every`, so neither the table nor a
+    save is ever held in memory whole. A sharded run (common.sharding) keeps
+    one database per shard.
+    """
+
+    def __init__(self, path: str = FEATURE_CACHE_PATH, shard: tuple = None, indications=INDICATIONS,
+                 flush_every: int = 1000):
+        self.indications = list(indications)
+        self.config_hash = keyword_config_hash(self.indications)
+        self.path = partition_path(path, shard)
+        self.flush_every = flush_every
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Built on the run's main thread, used by the extraction thread (one at a time)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT, config TEXT, features TEXT, PRIMARY KEY (key, config))"
+            )
+
+    def get(self, paper: dict) -> dict:
+        key = paper_key(paper)
+        if key is None:
+            return paper_features(paper, self.indications)
+
+        key = str(key)
+        feats = self.pending.get(key)
+        if feats is None:
+            row = self.conn.execute(
+                "SELECT features FROM features WHERE key = ? AND config = ?", (key, self.config_hash)
+            ).fetchone()
+            if row is not None:
+                feats = json.loads(row[0])
+        if feats is not None:
+            self.hits += 1
+            return feats
+
+        self.misses += 1
+        feats = paper_features(paper, self.indications)
+        self.pending[key] = feats
+        if len(self.pending) >= self.flush_every:
+            self.save()
+        return feats
+
+    def save(self):
+        """Writes the features computed since the last save."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO features (key, config, features) VALUES (?, ?, ?)",
+                [(k, self.config_hash, json.dumps(v)) for k, v in self.pending.items()]
+            )
+        self.pending = {}
+
+def extract_evidence(drug: str, paper: dict, cache: FeatureCache = None, predictions: dict = None,
+                     indication: str = DEFAULT_INDICATION):
+    """
+    Extracts evidence for one indication profile (default AD) from a single paper.
+    Returns None if paper fails the profile's strict disease + model + outcome gates.
+    With a FeatureCache, the text features are computed once per paper.
+    With classifier predictions (phase3_classifier), direction comes from the
+    model and papers below DIRECTION_MIN_RELEVANCE are dropped.
+    """
+    feats = (cache.get(paper) if cache is not None else paper_features(paper, [indication])).get(indication)
+    if feats is None:
+        return None
 
-    model = detect_model(text)
-    outcomes = outcome_tags(text)
+    direction = feats["direction"]
+    if predictions is not None:
+        pred = predictions.get(str(paper_key(paper)))
+        if pred is not None:
+            if pred["relevance"] < DIRECTION_MIN_RELEVANCE:
+                return None
+            direction = pred["direction"]
 
-    direction = "neutral"
-    if pos > neg and pos > 0:
-        direction = "positive"
-    elif neg > pos and neg > 0:
-        direction = "negative"
+    abstract = paper.get("abstractText", "") or ""
 
     return {
         "drug": drug,
-        "title": title,
+        "title": paper.get("title", "") or "",
         "pmid": paper.get("pmid"),
         "doi": paper.get("doi"),
         "journal": paper.get("journalTitle"),
         "pub_year": paper.get("pubYear"),
-        "model": model,
+        "model": feats["model"],
         "direction": direction,
-        "pos_hits": pos,
-        "neg_hits": neg,
-        "outcomes": ";".join(outcomes),
+        "pos_hits": feats["pos_hits"],
+        "neg_hits": feats["neg_hits"],
+        "outcomes": feats["outcomes"],
         "abstract": abstract[:8000],
     }
@@ -0,0 +1,140 @@
+# phase3/phase3_index.py
+import os
+import glob
+import json
+import sqlite3
+
+try:
+    from .config import CACHE_DIR, LIT_INDEX_PATH, DISEASE_QUERIES, MAX_PAPERS_PER_SEARCH
+    from .phase3_planner import drug_terms
+except ImportError:
+    from config import CACHE_DIR, LIT_INDEX_PATH, DISEASE_QUERIES, MAX_PAPERS_PER_SEARCH
+    from phase3_planner import drug_terms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    key      TEXT PRIMARY KEY,   -- PMID, else DOI
+    pmid     TEXT,
+    doi      TEXT,
+    title    TEXT,
+    abstract TEXT,
+    terms    TEXT,               -- keywords + chemical names
+    pub_year TEXT,
+    record   TEXT                -- original Europe PMC JSON record
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, terms, content='papers', content_rowid='rowid'
+);
+CREATE TABLE IF NOT EXISTS sources (
+    name  TEXT PRIMARY KEY,      -- indexed cache file (or dump) name
+    mtime REAL
+);
+"""
+
+# bm25 column weights: title, abstract, terms
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+def connect(path: str = LIT_INDEX_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def _record_terms(paper: dict) -> str:
+    kws = (paper.get("keywordList") or {}).get("keyword", []) or []
+    chems = [c.get("name", "") for c in (paper.get("chemicalList") or {}).get("chemical", []) or []]
+    return "\n".join(str(x) for x in kws + chems)
+
+def add_papers(conn, papers) -> int:
+    """Inserts records not yet indexed (keyed by PMID/DOI). Returns count added."""
+    added = 0
+    for p in papers:
+        key = p.get("pmid") or p.get("doi")
+        if not key:
+            continue
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO papers (key, pmid, doi, title, abstract, terms, pub_year, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(key), p.get("pmid"), p.get("doi"),
+                p.get("title") or "", p.get("abstractText") or "", _record_terms(p),
+                str(p.get("pubYear") or ""), json.dumps(p)
+            )
+        )
+        if cur.rowcount:
+            conn.execute(
+                "INSERT INTO papers_fts (rowid, title, abstract, terms) "
+                "SELECT rowid, title, abstract, terms FROM papers WHERE rowid = ?",
+                (cur.lastrowid,)
+            )
+            added += 1
+    return added
+
+def update_index(cache_dir: str = CACHE_DIR, path: str = LIT_INDEX_PATH) -> int:
+    """
+    Incrementally indexes Phase 3 cache files (epmc_*.json).
+    Only files new or modified since the last update are read.
+    """
+    conn = connect(path)
+    seen = dict(conn.execute("SELECT name, mtime FROM sources").fetchall())
+    added = 0
+    try:
+        for fp in sorted(glob.glob(os.path.join(cache_dir, "epmc_*.json"))):
+            name = os.path.basename(fp)
+            mtime = os.path.getmtime(fp)
+            if seen.get(name) == mtime:
+                continue
+
+            with open(fp, "r", encoding="utf-8") as f:
+                papers = json.load(f)
+            if isinstance(papers, dict):
+                # Status-tagged entry (see phase3_search); error entries carry no papers
+                papers = papers.get("papers", [])
+            added += add_papers(conn, papers if isinstance(papers, list) else [])
+            conn.execute("INSERT OR REPLACE INTO sources (name, mtime) VALUES (?, ?)", (name, mtime))
+        conn.commit()
+    finally:
+        conn.close()
+    return added
+
+def build_fts_query(terms, diseases=DISEASE_QUERIES) -> str:
+    """FTS5 twin of phase3_planner.build_query (one disease phrase, or the OR of several)."""
+    clean = [t.replace('"', " ") for t in terms]
+    disease = " OR ".join(f'"{d.lower()}"' for d in diseases)
+    if len(diseases) > 1:
+        disease = f"({disease})"
+    return "(" + " OR ".join(f'"{t}"' for t in clean) + f") AND {disease}"
+
+def search_papers(terms, limit: int = MAX_PAPERS_PER_SEARCH, offset: int = 0,
+                  path: str = LIT_INDEX_PATH):
+    """Ranked (bm25) page of indexed records matching any term AND the disease clause."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT p.record FROM papers_fts "
+            "JOIN papers p ON p.rowid = papers_fts.rowid "
+            "WHERE papers_fts MATCH ? "
+            "ORDER BY bm25(papers_fts, ?, ?, ?) LIMIT ? OFFSET ?",
+            (build_fts_query(terms), *BM25_WEIGHTS, limit, offset)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [json.loads(r[0]) for r in rows]
+
+def count_papers(terms, path: str = LIT_INDEX_PATH) -> int:
+    if not os.path.exists(path):
+        return 0
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM papers_fts WHERE papers_fts MATCH ?", (build_fts_query(terms),)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+def search_drug_papers(drug: str, limit: int = MAX_PAPERS_PER_SEARCH, offset: int = 0,
+                       path: str = LIT_INDEX_PATH):
+    """Offline equivalent of phase3_search.fetch_drug_papers for one drug."""
+    return search_papers(drug_terms(drug), limit=limit, offset=offset, path=path)
@@ -0,0 +1,161 @@
+# phase3/phase3_ingest.py
+#
+# Bulk-loads local literature dumps into the offline index, so Phase 3 can
+# run with --offline against a local corpus instead of per-drug API calls.
+#
+#   python -m phase3.phase3_ingest pubmed25n0001.xml.gz epmc_export.jsonl
+#
+# Supported inputs (optionally .gz):
+#   *.xml    PubMed / MEDLINE baseline or update files (PubmedArticle records)
+#   *.jsonl  one Europe PMC-style JSON record per line
+#            (title, abstractText, pmid, doi, journalTitle, pubYear, ...)
+
+import os
+import sys
+import gzip
+import json
+import argparse
+from lxml import etree
+from tqdm import tqdm
+
+try:
+    from .config import LIT_INDEX_PATH, INDICATIONS, INDICATION_PROFILES
+    from .phase3_extract import contains_any
+    from .phase3_index import connect, add_papers
+except ImportError:
+    from config import LIT_INDEX_PATH, INDICATIONS, INDICATION_PROFILES
+    from phase3_extract import contains_any
+    from phase3_index import connect, add_papers
+
+BATCH_SIZE = 1000
+
+def open_dump(path: str):
+    """Binary handle, transparently un-gzipping *.gz files."""
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def _text(elem) -> str:
+    return "".join(elem.itertext()).strip() if elem is not None else ""
+
+def pubmed_record(article) -> dict:
+    """One <PubmedArticle> element -> Europe PMC-shaped record."""
+    citation = article.find("MedlineCitation")
+    art = citation.find("Article") if citation is not None else None
+
+    pmid = citation.findtext("PMID") if citation is not None else None
+    title = _text(art.find("ArticleTitle")) if art is not None else ""
+    abstract = " ".join(
+        _text(a) for a in article.iterfind(".//Abstract/AbstractText")
+    ).strip()
+
+    year = article.findtext(".//JournalIssue/PubDate/Year")
+    if not year:
+        year = (article.findtext(".//JournalIssue/PubDate/MedlineDate") or "")[:4]
+
+    doi = article.findtext(".//ArticleIdList/ArticleId[@IdType='doi']")
+    if not doi:
+        doi = article.findtext(".//ELocationID[@EIdType='doi']")
+
+    return {
+        "source": "MED",
+        "pmid": pmid,
+        "doi": doi,
+        "title": title,
+        "abstractText": abstract,
+        "journalTitle": article.findtext(".//Journal/Title"),
+        "pubYear": year or None,
+        "keywordList": {"keyword": [_text(k) for k in article.iterfind(".//KeywordList/Keyword")]},
+        "chemicalList": {"chemical": [
+            {"name": _text(c)} for c in article.iterfind(".//ChemicalList/Chemical/NameOfSubstance")
+        ]},
+    }
+
+def iter_pubmed_xml(fh):
+    """
+    Streams records from a PubMed XML file object with lxml.iterparse.
+    Each processed element (and its already-seen siblings) is freed, so
+    memory stays constant for any file size.
+    """
+    for _, elem in etree.iterparse(fh, events=("end",), tag="PubmedArticle"):
+        yield pubmed_record(elem)
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+def iter_jsonl(fh):
+    """Streams Europe PMC-style records from a JSON-lines file object."""
+    for line in fh:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def iter_dump(path: str):
+    name = path[:-3] if path.endswith(".gz") else path
+    with open_dump(path) as fh:
+        if name.endswith(".xml"):
+            yield from iter_pubmed_xml(fh)
+        elif name.endswith(".jsonl") or name.endswith(".json"):
+            yield from iter_jsonl(fh)
+        else:
+            raise ValueError(f"Unsupported dump format: {path}")
+
+# Disease terms of every active indication profile (AD_TERMS by default)
+DISEASE_TERMS = [t for code in INDICATIONS for t in INDICATION_PROFILES[code]["disease_terms"]]
+
+def is_ad_relevant(record: dict) -> bool:
+    """Same disease-term gate extraction applies first; drops the bulk early."""
+    text = f"{record.get('title') or ''}\n{record.get('abstractText') or ''}"
+    return contains_any(text, DISEASE_TERMS)
+
+def ingest_dump(path: str, index_path: str = LIT_INDEX_PATH, force: bool = False) -> dict:
+    """
+    Loads disease-relevant records of one dump into the literature index.
+    Dumps already ingested (same path + mtime) are skipped unless force=True.
+    """
+    source = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    stats = {"records": 0, "kept": 0, "added": 0, "skipped": False}
+
+    conn = connect(index_path)
+    try:
+        row = conn.execute("SELECT mtime FROM sources WHERE name = ?", (source,)).fetchone()
+        if row and row[0] == mtime and not force:
+            stats["skipped"] = True
+            return stats
+
+        batch = []
+        for record in tqdm(iter_dump(path), desc=os.path.basename(path), unit=" rec"):
+            stats["records"] += 1
+            if not is_ad_relevant(record):
+                continue
+            stats["kept"] += 1
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                stats["added"] += add_papers(conn, batch)
+                conn.commit()
+                batch = []
+
+        stats["added"] += add_papers(conn, batch)
+        conn.execute("INSERT OR REPLACE INTO sources (name, mtime) VALUES (?, ?)", (source, mtime))
+        conn.commit()
+    finally:
+        conn.close()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest PubMed XML / Europe PMC JSONL dumps for offline Phase 3")
+    parser.add_argument("dumps", nargs="+", help="dump files (*.xml, *.jsonl, optionally .gz)")
+    parser.add_argument("--index", default=LIT_INDEX_PATH, help="literature index path")
+    parser.add_argument("--force", action="store_true", help="re-read dumps already ingested")
+    args = parser.parse_args(argv)
+
+    for path in args.dumps:
+        stats = ingest_dump(path, args.index, force=args.force)
+        if stats["skipped"]:
+            print(f" {path}: already ingested, skipped")
+        else:
+            print(f" {path}: {stats['records']} records, {stats['kept']} AD-relevant, {stats['added']} new")
+
+    print(" Run `python -m phase3.phase3_run_all --offline` to mine the local corpus")
+
+if __name__ == "__main__":
+    sys.exit(main())
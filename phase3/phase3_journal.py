@@ -0,0 +1,133 @@
+# phase3/phase3_journal.py
+#
+# Append-only run journal (JSON lines) of per-drug fetch outcomes.
+# The fetch stage appends one line per drug as soon as its search settles
+# (ok / empty / error, see phase3_search), so after a crash, Ctrl-C or a
+# partial outage the journal still says exactly which drugs were fetched and
+# which failed. MiningSchedule rebuilds its state from it: the next run
+# replays fetched drugs from the cache and retries only the failed ones.
+
+import os
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+try:
+    from .config import JOURNAL_PATH, JOURNAL_COMPACT_BYTES
+except ImportError:
+    from config import JOURNAL_PATH, JOURNAL_COMPACT_BYTES
+
+# Seconds between fsyncs (every line is flushed to the OS immediately)
+FSYNC_EVERY = 1.0
+
+class RunJournal:
+    """
+    start() opens a run, record() logs each drug, finish() closes the run.
+    A run without its "end" line, or ended with completed=False, was
+    interrupted (see interrupted()).
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self.run_id = None
+        self.counts = Counter()
+        self._f = None
+        self._last_sync = 0.0
+
+    # ------------------------------
+    # Reading
+    # ------------------------------
+    def read(self) -> list:
+        """Records in write order; a torn last line (crash mid-write) is skipped."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def latest(self) -> dict:
+        """{drug: status of its most recent fetch}."""
+        return {r["drug"]: r["status"] for r in self.read() if r.get("event") == "drug"}
+
+    def interrupted(self):
+        """(run id, drugs fetched) of the last run if it stopped early, else None."""
+        run, n = None, 0
+        for r in self.read():
+            event = r.get("event")
+            if event == "start":
+                run, n = r["run"], 0
+            elif event == "drug" and r.get("run") == run:
+                n += 1
+            elif event == "end" and r.get("run") == run and r.get("completed", True):
+                run = None
+        return None if run is None else (run, n)
+
+    # ------------------------------
+    # Writing
+    # ------------------------------
+    def _append(self, record: dict):
+        self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
+        if time.monotonic() - self._last_sync >= FSYNC_EVERY:
+            os.fsync(self._f.fileno())
+            self._last_sync = time.monotonic()
+
+    def start(self, n_drugs: int):
+        self.compact()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.counts = Counter()
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._append({"event": "start", "run": self.run_id, "ts": round(time.time(), 1), "drugs": n_drugs})
+
+    def record(self, drug: str, status: str, n_papers: int):
+        self.counts[status] += 1
+        self._append({
+            "event": "drug", "run": self.run_id, "drug": drug,
+            "status": status, "papers": n_papers, "ts": round(time.time(), 1)
+        })
+
+    def finish(self, completed: bool = True):
+        """Closes the run; completed=False marks it as stopped by an error."""
+        if self._f is None:
+            return
+        self._last_sync = 0.0
+        self._append({
+            "event": "end", "run": self.run_id, "ts": round(time.time(), 1),
+            "completed": completed, "counts": dict(self.counts)
+        })
+        self._f.close()
+        self._f = None
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def compact(self, max_bytes: int = JOURNAL_COMPACT_BYTES):
+        """Rewrites an oversized journal as one line per drug (its latest outcome)."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= max_bytes:
+            return
+        latest = {}
+        for r in self.read():
+            if r.get("event") == "drug":
+                latest.pop(r["drug"], None)
+                latest[r["drug"]] = r
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in latest.values():
+                f.write(json.dumps(r) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def summary(self) -> str:
+        failed = self.counts.get("error", 0)
+        tail = f", {failed} failed (retried next run)" if failed else ""
+        return (
+            f" Fetch outcomes: {self.counts.get('ok', 0)} with papers, "
+            f"{self.counts.get('empty', 0)} without{tail}"
+        )
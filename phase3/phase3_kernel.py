@@ -0,0 +1,258 @@
+# phase3/phase3_kernel.py
+import numpy as np
+import pandas as pd
+
+from common.schema import compact_papers, outcome_count, DIRECTIONS
+
+try:
+    from .config import MODEL_WEIGHTS
+    from .phase3_score import (
+        SIGNAL_CAP, OUTCOME_BONUS, EVIDENCE_CAP, NET_POSITIVE_FACTOR,
+        NON_POSITIVE_FACTOR, TOOL_PENALTY,
+        is_research_tool, paper_scores, signed_scores
+    )
+except ImportError:
+    from config import MODEL_WEIGHTS
+    from phase3_score import (
+        SIGNAL_CAP, OUTCOME_BONUS, EVIDENCE_CAP, NET_POSITIVE_FACTOR,
+        NON_POSITIVE_FACTOR, TOOL_PENALTY,
+        is_research_tool, paper_scores, signed_scores
+    )
+
+# Default kernel parameters (same values the batch pipeline uses)
+DEFAULT_PARAMS = {
+    "model_weights": dict(MODEL_WEIGHTS),
+    "signal_cap": SIGNAL_CAP,
+    "outcome_bonus": OUTCOME_BONUS,
+    "evidence_cap": EVIDENCE_CAP,
+    "net_positive_factor": NET_POSITIVE_FACTOR,
+    "non_positive_factor": NON_POSITIVE_FACTOR,
+    "tool_penalty": TOOL_PENALTY,
+}
+
+def minmax(x: np.ndarray) -> np.ndarray:
+    """NumPy twin of final_merge.minmax, along the last axis."""
+    lo = x.min(axis=-1, keepdims=True)
+    span = x.max(axis=-1, keepdims=True) - lo
+    return np.where(span > 0, (x - lo) / np.where(span > 0, span, 1.0), 0.0)
+
+def drug_key(names) -> np.ndarray:
+    """Same join key final_merge.py uses (stripped, lowercased)."""
+    return pd.Series(names, dtype=object).astype(str).str.strip().str.lower().to_numpy()
+
+# Attributes that make up an extracted kernel (see to_arrays / from_arrays)
+KERNEL_ARRAYS = ("phase2_norm", "conf_norm", "base_signed")
+PAPER_ARRAYS = (
+    "paper_row", "paper_drug", "model_code", "signal", "n_outcomes", "paper_sign",
+    "net_positive", "is_tool", "row_drug",
+)
+
+# Resampled papers per bootstrap block (resamples x papers), bounds temporary memory
+BOOTSTRAP_BLOCK_ELEMS = 1 << 21
+
+class ScoringKernel:
+    """
+    Vectorized re-scoring of the final ranking.
+    Per-paper and per-drug feature arrays are extracted once; score() is pure
+    NumPy and never touches disk, so it can run on every UI interaction.
+    """
+
+    def __init__(self, df_final: pd.DataFrame, df_papers: pd.DataFrame = None,
+                 name_col: str = "drug_name", aliases: dict = None):
+        # ---- per-candidate arrays (final table order) ----
+        self.phase2_norm = minmax(df_final["phase2_score"].fillna(0.0).to_numpy(dtype=float))
+        self.conf_norm = minmax(df_final["confidence"].fillna(0.0).to_numpy(dtype=float))
+        self.base_signed = df_final["signed_score"].fillna(0.0).to_numpy(dtype=float)
+
+        self.has_papers = df_papers is not None and not df_papers.empty
+        if not self.has_papers:
+            return
+
+        # ---- per-paper arrays (categorical codes, see common.schema) ----
+        df_papers = compact_papers(df_papers)
+        has_drug = df_papers["drug"].notna().to_numpy()
+        # Row position of every kept paper in df_papers (store rowid - 1)
+        self.paper_row = np.flatnonzero(has_drug)
+        df_papers = df_papers[has_drug]
+        # Join keys are computed per category, not per paper
+        keys, cat_slot = np.unique(drug_key(df_papers["drug"].cat.categories), return_inverse=True)
+        self.paper_drug = cat_slot[df_papers["drug"].cat.codes.to_numpy()]
+        self.n_drugs = len(keys)
+
+        self.model_names = sorted(set(MODEL_WEIGHTS) | set(df_papers["model"].cat.categories))
+        codes = df_papers["model"].cat.set_categories(self.model_names).cat.codes.to_numpy()
+        # Missing model -> extra slot holding the fallback weight
+        self.model_code = np.where(codes < 0, len(self.model_names), codes)
+
+        self.signal = (
+            df_papers["pos_hits"].astype(float) - df_papers["neg_hits"].astype(float)
+        ).to_numpy()
+        self.n_outcomes = outcome_count(df_papers["outcome_mask"]).astype(float)
+
+        # ---- per-drug arrays (weight independent) ----
+        direction = df_papers["direction"].cat.codes.to_numpy()
+        # +1 positive / -1 negative / 0 otherwise, so net_positive is a segment sum
+        self.paper_sign = (
+            (direction == DIRECTIONS.index("positive")).astype(np.int8) -
+            (direction == DIRECTIONS.index("negative")).astype(np.int8)
+        )
+        self.net_positive = np.bincount(self.paper_drug, weights=self.paper_sign, minlength=self.n_drugs)
+        self.is_tool = is_research_tool(keys)
+
+        # final row -> drug slot (-1 when the candidate has no papers);
+        # aliases (lower-cased name -> representative) share their representative's papers
+        names = df_final[name_col]
+        if aliases:
+            names = [aliases.get(k, n) for k, n in zip(drug_key(names), names)]
+        self.row_drug = pd.Index(keys).get_indexer(drug_key(names))
+
+    def to_arrays(self) -> dict:
+        """Every extracted array by attribute name (for common.snapshot)."""
+        names = KERNEL_ARRAYS + (PAPER_ARRAYS if self.has_papers else ())
+        return {name: np.asarray(getattr(self, name)) for name in names}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, model_names=None):
+        """
+        Rebuilds a kernel from to_arrays() output (arrays may be memory-mapped).
+        Paper arrays are optional; without them only merge weights re-score.
+        """
+        kernel = cls.__new__(cls)
+        for name in KERNEL_ARRAYS:
+            setattr(kernel, name, arrays[name])
+        kernel.has_papers = all(name in arrays for name in PAPER_ARRAYS)
+        if kernel.has_papers:
+            for name in PAPER_ARRAYS:
+                setattr(kernel, name, arrays[name])
+            kernel.model_names = list(model_names)
+            kernel.n_drugs = len(kernel.is_tool)
+        return kernel
+
+    def model_weight_vector(self, model_weights) -> np.ndarray:
+        fallback = model_weights.get("unknown", 0.2)
+        return np.array([model_weights.get(m, fallback) for m in self.model_names] + [fallback])
+
+    def paper_score_vector(self, params: dict) -> np.ndarray:
+        """Per-paper scores for one parameter set."""
+        p = {**DEFAULT_PARAMS, **params}
+        base = self.model_weight_vector(p["model_weights"])[self.model_code]
+        return paper_scores(base, self.signal, self.n_outcomes, p["signal_cap"], p["outcome_bonus"])
+
+    def _signed(self, evidence, net_positive, params: dict) -> np.ndarray:
+        p = {**DEFAULT_PARAMS, **params}
+        _, signed = signed_scores(
+            evidence, net_positive, self.is_tool,
+            p["evidence_cap"], p["net_positive_factor"], p["non_positive_factor"], p["tool_penalty"]
+        )
+        return signed
+
+    def drug_signed_scores(self, params: dict) -> np.ndarray:
+        """signed_score per drug slot for one parameter set."""
+        scores = self.paper_score_vector(params)
+        evidence = np.bincount(self.paper_drug, weights=scores, minlength=self.n_drugs)
+        return self._signed(evidence, self.net_positive, params)
+
+    def score(self, merge_weights: dict, params: dict = None):
+        """
+        Returns (signed_score, final_score) arrays in final-table row order.
+        Without paper features only the merge weights can change.
+        """
+        if self.has_papers:
+            drug_signed = self.drug_signed_scores(params or {})
+            signed = np.where(self.row_drug >= 0, drug_signed[self.row_drug], 0.0)
+        else:
+            signed = self.base_signed
+
+        final = (
+            merge_weights["phase2"] * self.phase2_norm +
+            merge_weights["phase3"] * minmax(signed) +
+            merge_weights["confidence"] * self.conf_norm
+        )
+        return signed, final
+
+    # ------------------------------
+    # Bootstrap
+    # ------------------------------
+    def resampled_signed_scores(self, n_resamples: int, rng: np.random.Generator, params: dict = None):
+        """
+        Yields (b, n_rows) blocks of signed_score (final-table order), one row
+        per bootstrap resample: every drug's papers are drawn with replacement,
+        as many as it has. Draws and drug sums are flat index arithmetic plus
+        one bincount per block (segment sums over the paper -> drug index).
+        """
+        params = params or {}
+        n_rows = len(self.base_signed)
+        if not self.has_papers or len(self.paper_drug) == 0:
+            for start in range(0, n_resamples, 1024):
+                b = min(1024, n_resamples - start)
+                yield np.broadcast_to(self.base_signed, (b, n_rows))
+            return
+
+        scores = self.paper_score_vector(params)
+        sign = np.asarray(self.paper_sign, dtype=float)
+
+        # Papers grouped by drug: sorted position j belongs to owner[j], and a
+        # draw for it picks uniformly within [starts[owner], starts[owner] + counts[owner])
+        order = np.argsort(self.paper_drug, kind="stable")
+        owner = np.asarray(self.paper_drug)[order]
+        counts = np.bincount(owner, minlength=self.n_drugs)
+        starts = np.cumsum(counts) - counts
+        lo, width = starts[owner], counts[owner]
+
+        n_papers = len(order)
+        block = max(1, BOOTSTRAP_BLOCK_ELEMS // n_papers)
+        has_drug = self.row_drug >= 0
+        for start in range(0, n_resamples, block):
+            b = min(block, n_resamples - start)
+            draws = order[lo + (rng.random((b, n_papers)) * width).astype(np.int64)]
+            seg = (np.arange(b)[:, None] * self.n_drugs + owner).ravel()
+            evidence = np.bincount(seg, weights=scores[draws].ravel(), minlength=b * self.n_drugs)
+            net = np.bincount(seg, weights=sign[draws].ravel(), minlength=b * self.n_drugs)
+            signed = self._signed(
+                evidence.reshape(b, self.n_drugs), net.reshape(b, self.n_drugs), params
+            )
+            yield np.where(has_drug, signed[:, self.row_drug], 0.0)
+
+    def rank_uncertainty(self, merge_weights: dict, n_resamples: int = 1000, top_k=(10, 25, 50),
+                         interval: float = 0.9, weight_concentration: float = None,
+                         seed: int = 0, params: dict = None) -> pd.DataFrame:
+        """
+        Bootstrap rank stability, one row per final-table row (same order):
+        median rank and central `interval` rank range (1-based) plus the
+        probability of landing in each top-K. With `weight_concentration`,
+        every resample also draws its merge weights from a Dirichlet centred
+        on `merge_weights` (larger = tighter). Ties keep table order.
+        """
+        rng = np.random.default_rng(seed)
+        keys = ("phase2", "phase3", "confidence")
+        w0 = np.array([merge_weights[k] for k in keys], dtype=float)
+
+        n_rows = len(self.base_signed)
+        ranks = np.empty((n_resamples, n_rows), dtype=np.int32)
+        pos = np.arange(n_rows, dtype=np.int32)
+        done = 0
+        for signed in self.resampled_signed_scores(n_resamples, rng, params):
+            b = len(signed)
+            if weight_concentration:
+                w = rng.dirichlet(w0 / w0.sum() * weight_concentration, size=b) * w0.sum()
+            else:
+                w = np.broadcast_to(w0, (b, 3))
+            final = (
+                w[:, :1] * self.phase2_norm +
+                w[:, 1:2] * minmax(signed) +
+                w[:, 2:] * self.conf_norm
+            )
+            order = np.argsort(-final, axis=1, kind="stable")
+            np.put_along_axis(ranks[done:done + b], order, np.broadcast_to(pos, (b, n_rows)), axis=1)
+            done += b
+
+        tail = (1.0 - interval) / 2.0
+        lo, med, hi = np.quantile(ranks, [tail, 0.5, 1.0 - tail], axis=0, method="nearest")
+        out = pd.DataFrame({
+            "rank_median": med + 1,
+            "rank_lo": lo + 1,
+            "rank_hi": hi + 1,
+        })
+        for k in top_k:
+            out[f"p_top{k}"] = (ranks < k).mean(axis=0)
+        return out
@@ -0,0 +1,266 @@
+# phase3/phase3_pipeline.py
+#
+# Streaming Phase 3: search -> extraction -> aggregation as overlapping stages.
+#  - a fetcher thread walks phase3_search.iter_fetch (network bound)
+#  - an extractor thread gates and scans papers in per-drug micro-batches
+#    (and classifies direction when DIRECTION_MODEL is set)
+#  - the calling thread aggregates drug scores incrementally and writes a
+#    partial phase3_lit_evidence.csv every PIPELINE_SNAPSHOT_SECONDS
+# Every paper is gated against all active indication profiles in the same
+# extraction pass; each profile keeps its own rows, aggregates and snapshot.
+# Stages are joined by bounded queues, so a slow stage throttles the one before
+# it instead of the whole run being buffered in memory. A drug's scores only
+# depend on its own papers, so aggregating in chunks gives the same table as a
+# single aggregate_drug_scores() call over every paper.
+
+import os
+import time
+import queue
+import threading
+import pandas as pd
+from tqdm import tqdm
+
+from common.ranking import sort_ranked
+from common.indications import indication_path
+
+try:
+    from .config import (
+        DIRECTION_MODEL, DIRECTION_INDICATION, LIT_EVIDENCE_PATH, INDICATION_PROFILES,
+        PIPELINE_QUEUE_SIZE, PIPELINE_EXTRACT_BATCH, PIPELINE_SNAPSHOT_SECONDS
+    )
+    from .phase3_search import iter_fetch, fetch_status
+    from .phase3_extract import extract_evidence, FeatureCache
+    from .phase3_score import aggregate_drug_scores
+except ImportError:
+    from config import (
+        DIRECTION_MODEL, DIRECTION_INDICATION, LIT_EVIDENCE_PATH, INDICATION_PROFILES,
+        PIPELINE_QUEUE_SIZE, PIPELINE_EXTRACT_BATCH, PIPELINE_SNAPSHOT_SECONDS
+    )
+    from phase3_search import iter_fetch, fetch_status
+    from phase3_extract import extract_evidence, FeatureCache
+    from phase3_score import aggregate_drug_scores
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+def write_csv_atomic(df: pd.DataFrame, path: str):
+    """Writes next to `path` and swaps it in, so readers never see a half-written file."""
+    tmp_path = path + ".tmp"
+    df.to_csv(tmp_path, index=False, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+def rank_drugs(chunks) -> pd.DataFrame:
+    """
+    Concatenated per-chunk aggregates, ranked by signed_score.
+    Ties break by drug name, the order one aggregate_drug_scores() call gives.
+    """
+    chunks = [c for c in chunks if not c.empty]
+    if not chunks:
+        return aggregate_drug_scores(None)
+    return sort_ranked(pd.concat(chunks, ignore_index=True), "signed_score", tie_col="drug")
+
+def _aggregate_pending(pending: dict, chunks: dict, code: str):
+    """Moves one profile's pending rows into a drug-level chunk (with its model weights)."""
+    if pending[code]:
+        weights = INDICATION_PROFILES[code]["model_weights"]
+        chunks[code].append(aggregate_drug_scores(pd.DataFrame(pending[code]), sort=False, model_weights=weights))
+        pending[code] = []
+
+# ------------------------------
+# Stages
+# ------------------------------
+class _Stage(threading.Thread):
+    """
+    Daemon stage thread; always ends its output with _DONE and keeps any error
+    for the caller to re-raise. `stop` is set by the caller when it stops reading.
+    """
+
+    def __init__(self, name, work, outbox: queue.Queue, stop: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.outbox = outbox
+        self.stop = stop
+        self.error = None
+
+    def put(self, item):
+        # Blocks while the next stage is behind; gives up once the run is stopped
+        while not self.stop.is_set():
+            try:
+                self.outbox.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        try:
+            self.work(self)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.put(_DONE)
+
+def _take_batch(inbox: queue.Queue, max_items: int, stop: threading.Event):
+    """Waits for one item, then drains whatever else is ready (up to max_items)."""
+    while True:
+        try:
+            items = [inbox.get(timeout=0.5)]
+            break
+        except queue.Empty:
+            if stop.is_set():
+                return [_DONE]
+    while len(items) < max_items and items[-1] is not _DONE:
+        try:
+            items.append(inbox.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+def _fetch_work(drugs, terms, offline, schedule, journal):
+    def work(stage):
+        fetched = iter_fetch(drugs, offline=offline, terms=terms)
+        try:
+            for drug, papers in fetched:
+                if stage.stop.is_set():
+                    return
+                stage.put((drug, papers))
+                status = None if offline else fetch_status(drug, (terms or {}).get(drug))
+                if journal is not None:
+                    journal.record(drug, status, len(papers))
+                if schedule is not None:
+                    if status == "error":
+                        schedule.mark_failed(drug)
+                    else:
+                        schedule.mark_done(drug)
+                    if schedule.exhausted():
+                        print(" Mining budget reached; no further searches this run")
+                        return
+        finally:
+            fetched.close()
+    return work
+
+def _extract_work(inbox: queue.Queue, feature_cache: FeatureCache, classifier):
+    def work(stage):
+        while True:
+            items = _take_batch(inbox, PIPELINE_EXTRACT_BATCH, stage.stop)
+            done = items[-1] is _DONE
+            items = [it for it in items if it is not _DONE]
+
+            # Optional model-based direction: one pass per micro-batch of papers
+            # gated for the profile the model was trained on
+            predictions = None
+            if classifier is not None and items:
+                gated = [
+                    p for _, papers in items for p in papers
+                    if feature_cache.get(p).get(DIRECTION_INDICATION) is not None
+                ]
+                predictions = classifier.predict(gated)
+                stage.n_classified += len(predictions)
+
+            for drug, papers in items:
+                rows = {code: [] for code in feature_cache.indications}
+                for paper in papers:
+                    for code in feature_cache.indications:
+                        ev = extract_evidence(
+                            drug, paper, cache=feature_cache, indication=code,
+                            predictions=predictions if code == DIRECTION_INDICATION else None
+                        )
+                        if ev is not None:
+                            rows[code].append(ev)
+                stage.put((drug, rows))
+
+            if done or stage.stop.is_set():
+                return
+    return work
+
+# ------------------------------
+# Runner
+# ------------------------------
+def run_pipeline(drugs, terms: dict = None, offline: bool = False, schedule=None, journal=None,
+                 feature_cache: FeatureCache = None, evidence_paths: dict = None,
+                 snapshot_seconds: float = PIPELINE_SNAPSHOT_SECONDS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE):
+    """
+    Mines `drugs` with search, extraction and aggregation running concurrently.
+    Writes partial drug-level evidence to `evidence_paths` ({indication: path},
+    default LIT_EVIDENCE_PATH per common.indications.indication_path) while it runs.
+    Returns ({indication: df_papers}, {indication: df_drugs}) for the feature
+    cache's indication profiles: papers in `drugs` order and the ranked drug
+    table, identical to the staged batch_fetch -> extract -> aggregate run.
+    With a MiningSchedule (phase3_scheduler), fetched drugs are marked done and
+    fetching stops once its budget is spent; unfetched drugs are left out.
+    A RunJournal (phase3_journal) gets each drug's fetch outcome as it settles.
+    `feature_cache` defaults to the shared FeatureCache().
+    """
+    if feature_cache is None:
+        feature_cache = FeatureCache()
+    classifier = None
+    if DIRECTION_MODEL:
+        try:
+            from .phase3_classifier import DirectionClassifier
+        except ImportError:
+            from phase3_classifier import DirectionClassifier
+        classifier = DirectionClassifier()
+
+    stop = threading.Event()
+    fetched = queue.Queue(maxsize=queue_size)
+    extracted = queue.Queue(maxsize=queue_size)
+
+    fetcher = _Stage("phase3-fetch", _fetch_work(drugs, terms, offline, schedule, journal), fetched, stop)
+    extractor = _Stage("phase3-extract", _extract_work(fetched, feature_cache, classifier), extracted, stop)
+    extractor.n_classified = 0
+
+    codes = feature_cache.indications
+    if evidence_paths is None:
+        evidence_paths = {code: indication_path(LIT_EVIDENCE_PATH, code) for code in codes}
+    rows_by_drug = {}
+    pending = {code: [] for code in codes}   # extracted rows not yet aggregated
+    chunks = {code: [] for code in codes}    # per-chunk drug aggregates
+    n_snapshots = 0
+    last_snapshot = time.monotonic()
+
+    fetcher.start()
+    extractor.start()
+    try:
+        with tqdm(total=len(drugs), desc="Extracting evidence (streaming)") as pbar:
+            while True:
+                item = extracted.get()
+                if item is _DONE:
+                    break
+                drug, rows = item
+                rows_by_drug[drug] = rows
+                for code in codes:
+                    pending[code].extend(rows[code])
+                pbar.update(1)
+
+                if time.monotonic() - last_snapshot >= snapshot_seconds:
+                    for code in codes:
+                        _aggregate_pending(pending, chunks, code)
+                    if any(chunks.values()):
+                        for code in codes:
+                            write_csv_atomic(rank_drugs(chunks[code]), evidence_paths[code])
+                        n_snapshots += 1
+                    last_snapshot = time.monotonic()
+    finally:
+        stop.set()
+        fetcher.join()
+        extractor.join()
+
+    for stage in (fetcher, extractor):
+        if stage.error is not None:
+            raise stage.error
+
+    feature_cache.save()
+    print(f" Paper features: {feature_cache.misses} computed, {feature_cache.hits} reused")
+    if classifier is not None:
+        print(f" Direction model: {extractor.n_classified} papers classified")
+    if n_snapshots:
+        names = ", ".join(os.path.basename(evidence_paths[code]) for code in codes)
+        print(f" Wrote {n_snapshots} partial snapshots of {names}")
+
+    papers, ranked = {}, {}
+    for code in codes:
+        _aggregate_pending(pending, chunks, code)
+        rows = [ev for drug in drugs for ev in rows_by_drug.get(drug, {}).get(code, [])]
+        papers[code] = pd.DataFrame(rows)
+        ranked[code] = rank_drugs(chunks[code])
+    return papers, ranked
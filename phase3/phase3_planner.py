@@ -0,0 +1,99 @@
+# phase3/phase3_planner.py
+import re
+
+try:
+    from .config import DISEASE_QUERY, MAX_QUERY_CHARS
+except ImportError:
+    from config import DISEASE_QUERY, MAX_QUERY_CHARS
+
+# Leading stereo descriptors such as "(+)-", "(?)-", "(R)-", "(1S,2R)-"
+STEREO_PREFIX = re.compile(r"^\(([^()\s]{1,12})\)-")
+PARENTHESES = re.compile(r"\(([^()]*)\)")
+MIN_TERM_LEN = 3
+
+def drug_terms(name: str) -> list:
+    """
+    Splits a candidate name into search terms: the generic name first,
+    then synonyms, e.g. "fexofenadine (allegra)" -> ["fexofenadine", "allegra"].
+    """
+    raw = str(name or "").strip()
+    generic = raw
+    while STEREO_PREFIX.match(generic):
+        generic = STEREO_PREFIX.sub("", generic, count=1)
+
+    synonyms = PARENTHESES.findall(generic)
+    generic = PARENTHESES.sub(" ", generic)
+
+    candidates = [generic] + [s for syn in synonyms for s in re.split(r"[,;/]", syn)]
+
+    terms = []
+    for t in candidates:
+        t = re.sub(r"\s+", " ", t.replace('"', " ")).strip(" -").lower()
+        if len(t) >= MIN_TERM_LEN and t not in terms:
+            terms.append(t)
+
+    return terms or [raw.replace('"', "").lower()]
+
+def build_query(terms) -> str:
+    """("a" OR "b" OR ...) AND <disease clause>"""
+    return "(" + " OR ".join(f'"{t}"' for t in terms) + f") AND {DISEASE_QUERY}"
+
+def plan_queries(terms_by_drug: dict, max_chars: int = MAX_QUERY_CHARS) -> list:
+    """
+    Greedily packs drugs into batches whose OR-query stays under max_chars.
+    All terms of one drug stay in the same batch. Returns a list of drug lists.
+    """
+    batches = []
+    current, current_terms = [], []
+
+    for drug, terms in terms_by_drug.items():
+        trial = current_terms + [t for t in terms if t not in current_terms]
+        if current and len(build_query(trial)) > max_chars:
+            batches.append(current)
+            current = []
+            trial = list(terms)
+        current.append(drug)
+        current_terms = trial
+
+    if current:
+        batches.append(current)
+    return batches
+
+def _term_pattern(term: str):
+    return re.compile(r"(?<![a-z0-9])" + re.escape(term) + r"(?![a-z0-9])")
+
+def paper_search_text(paper: dict) -> str:
+    """Lowercased title, abstract, keywords and chemical names of a core record."""
+    parts = [paper.get("title") or "", paper.get("abstractText") or ""]
+    parts += (paper.get("keywordList") or {}).get("keyword", []) or []
+    parts += [c.get("name", "") for c in (paper.get("chemicalList") or {}).get("chemical", []) or []]
+    return "\n".join(str(p) for p in parts).lower()
+
+def attribute_papers(papers, terms_by_drug: dict) -> dict:
+    """
+    Assigns each paper of a query to every drug whose terms appear in it
+    (word-boundary match). Papers that matched only in the full text are
+    dropped, whether the query held one drug or a whole batch.
+    """
+    patterns = {d: [_term_pattern(t) for t in terms] for d, terms in terms_by_drug.items()}
+    by_drug = {d: [] for d in terms_by_drug}
+
+    for paper in papers:
+        text = paper_search_text(paper)
+        for drug, pats in patterns.items():
+            if any(p.search(text) for p in pats):
+                by_drug[drug].append(paper)
+    return by_drug
+
+def _paper_order(paper: dict) -> tuple:
+    date = str(paper.get("firstPublicationDate") or paper.get("pubYear") or "")
+    pmid = str(paper.get("pmid") or "")
+    return (date, pmid.zfill(12), str(paper.get("doi") or ""))
+
+def select_papers(papers, limit: int) -> list:
+    """
+    The `limit` newest of a drug's attributed papers (publication date, then
+    PMID). API relevance order depends on what else was in the OR-query, so a
+    fixed order keeps the selection the same however the drugs were batched.
+    """
+    return sorted(papers, key=_paper_order, reverse=True)[:limit]
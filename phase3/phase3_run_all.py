@@ -1,27 +1,165 @@
 # phase3/phase3_run_all.py
 import os
 import sys
+import argparse
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
+
+# Project root on the path for the shared `common` helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.ranking import top_k, rank_order
+from common.sharding import parse_shard, shard_of, partition_path, read_partitions
+from common.indications import indication_path
 
 # Handle both direct script execution and package imports
 try:
-    from .config import BBB_CSV_PATH, OUT_DIR
-    from .phase3_search import batch_fetch
-    from .phase3_extract import extract_evidence
-    from .phase3_score import aggregate_drug_scores
+    from .config import (
+        BBB_CSV_PATH, OUT_DIR, PAPERS_CSV_PATH, PAPER_STORE_PATH, LIT_EVIDENCE_PATH,
+        SCHEDULE_PATH, SCHEDULE_PRIORITY_COL, MAX_NEW_DRUGS_PER_RUN, JOURNAL_PATH,
+        INDICATIONS, DISEASE_QUERY
+    )
+    from .phase3_search import REQUEST_STATS
+    from .phase3_pipeline import run_pipeline, write_csv_atomic
+    from .phase3_scheduler import MiningSchedule, priority_order
+    from .phase3_journal import RunJournal
+    from .phase3_extract import FeatureCache
+    from .phase3_store import write_paper_store, build_store_from_csv
+    from .phase3_index import update_index
+    from .phase3_dedup import group_candidates, group_terms, write_aliases
 except ImportError:
     # Running as a direct script
-    from config import BBB_CSV_PATH, OUT_DIR
-    from phase3_search import batch_fetch
-    from phase3_extract import extract_evidence
-    from phase3_score import aggregate_drug_scores
+    from config import (
+        BBB_CSV_PATH, OUT_DIR, PAPERS_CSV_PATH, PAPER_STORE_PATH, LIT_EVIDENCE_PATH,
+        SCHEDULE_PATH, SCHEDULE_PRIORITY_COL, MAX_NEW_DRUGS_PER_RUN, JOURNAL_PATH,
+        INDICATIONS, DISEASE_QUERY
+    )
+    from phase3_search import REQUEST_STATS
+    from phase3_pipeline import run_pipeline, write_csv_atomic
+    from phase3_scheduler import MiningSchedule, priority_order
+    from phase3_journal import RunJournal
+    from phase3_extract import FeatureCache
+    from phase3_store import write_paper_store, build_store_from_csv
+    from phase3_index import update_index
+    from phase3_dedup import group_candidates, group_terms, write_aliases
 
 # Ensure output directory exists
 os.makedirs(OUT_DIR, exist_ok=True)
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Phase 3 literature mining")
+    parser.add_argument(
+        "--offline", action="store_true",
+        help="answer queries from the local literature index (no API calls)"
+    )
+    parser.add_argument(
+        "--max-drugs", type=int, default=MAX_NEW_DRUGS_PER_RUN,
+        help="new (not yet mined) drugs per run, highest priority first"
+    )
+    parser.add_argument(
+        "--time-budget", type=float, default=None,
+        help="stop starting new searches after this many seconds"
+    )
+    parser.add_argument(
+        "--request-budget", type=int, default=None,
+        help="stop starting new searches after this many Europe PMC requests"
+    )
+    parser.add_argument(
+        "--reset-schedule", action="store_true",
+        help="forget the mining checkpoint and run journal and start again from the top of the ranking"
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, default=None, metavar="I/N",
+        help="mine only shard I of N (0-based, by drug-name hash) and write per-shard partitions"
+    )
+    parser.add_argument(
+        "--merge-shards", type=int, default=None, metavar="N",
+        help="combine the partitions of a finished N-shard run into the usual outputs"
+    )
+    return parser.parse_args(argv)
+
+def merge_shards(order, n: int, code: str = INDICATIONS[0]):
+    """
+    Combines the phase3_papers / phase3_lit_evidence partitions of an n-shard
+    run (for one indication profile) exactly as one process would have written
+    them: papers in priority (`order`) order of their drug, drugs ranked by
+    signed_score, ties by name.
+    Partitions are read as text, so every field is carried over unchanged.
+    Shards batch their drugs differently, which changes nothing: a drug's
+    papers do not depend on its batch (attribute_papers, select_papers).
+    """
+    rank = pd.Series(np.arange(len(order), dtype=float), index=order)
+
+    df_papers = read_partitions(indication_path(PAPERS_CSV_PATH, code), n)
+    if not df_papers.empty:
+        df_papers = df_papers.iloc[rank_order(df_papers["drug"].map(rank).to_numpy(), descending=False)]
+
+    df_drugs = read_partitions(indication_path(LIT_EVIDENCE_PATH, code), n)
+    if not df_drugs.empty:
+        # astype(float) parses exactly (round trip), unlike the fast CSV float parser
+        scores = df_drugs["signed_score"].replace("", "nan").astype(float).to_numpy()
+        df_drugs = df_drugs.iloc[rank_order(scores, ties=df_drugs["drug"])]
+    return df_papers, df_drugs
+
+def write_report(df_drugs: pd.DataFrame, code: str = INDICATIONS[0]):
+    """Top-25 text report (phase3_report.txt, per indication); returns the top drugs."""
+    top_drugs = top_k(df_drugs, "signed_score", 25)
+    report_path = indication_path(os.path.join(OUT_DIR, "phase3_report.txt"), code)
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("Top 25 drugs by SIGNED Phase-3 evidence score\n")
+        f.write("=" * 60 + "\n\n")
+        f.write(top_drugs.to_string(index=False))
+        f.write("\n\n")
+        f.write("Columns explanation:\n")
+        f.write(f"- signed_score: net-positive {code} evidence (final rank)\n")
+        f.write("- evidence_score: raw summed paper scores\n")
+        f.write("- net_positive: positive  negative papers\n")
+        f.write("- confidence: robustness proxy (papers + model diversity)\n")
+    return top_drugs
+
+def print_summary(top_drugs: pd.DataFrame, code: str = INDICATIONS[0]):
+    def name(path):
+        return os.path.basename(indication_path(path, code))
+
+    print(f" Saved {name(PAPERS_CSV_PATH)}")
+    print(f" Saved {name(PAPER_STORE_PATH)}")
+    if code == INDICATIONS[0]:
+        print(" Saved phase3_drug_aliases.csv")
+    print(f" Saved {name(LIT_EVIDENCE_PATH)}")
+    print(f" Saved {name('phase3_report.txt')}")
+
+    print(f"\n Top 10 Phase-3 candidates{'' if len(INDICATIONS) == 1 else f' ({code})'}:")
+    print(
+        top_drugs.head(10)[
+            ["drug", "signed_score", "net_positive", "n_papers", "models"]
+        ]
+    )
+
+def write_outputs(code: str, df_papers: pd.DataFrame, df_drugs: pd.DataFrame):
+    """Papers CSV, paper store, drug-level evidence and report of one indication profile."""
+    if df_papers.empty:
+        print(f" No {code}-relevant evidence extracted. Check gates.")
+        return
+
+    papers_path = indication_path(PAPERS_CSV_PATH, code)
+    df_papers.to_csv(papers_path, index=False, encoding="utf-8")
+
+    # Indexed copy for per-drug lookups (dashboard evidence stream)
+    write_paper_store(df_papers, path=indication_path(PAPER_STORE_PATH, code))
+
+    print(f" Saved {len(df_papers)} extracted papers")
+
+    write_csv_atomic(df_drugs, indication_path(LIT_EVIDENCE_PATH, code))
+
+    # -------------------------------
+    # 5. Human-readable report
+    # -------------------------------
+    print_summary(write_report(df_drugs, code), code)
+
+def main(argv=None):
+    args = parse_args(argv)
     print(" Phase 3 literature mining started")
+    if len(INDICATIONS) > 1:
+        print(f" Indication profiles: {', '.join(INDICATIONS)} (one search per drug, ... AND {DISEASE_QUERY})")
 
     # -------------------------------
     # 1. Load Phase 2 / BBB drug list
@@ -38,88 +176,131 @@ def main():
     else:
         name_col = bbb.columns[0]
 
-    drugs = (
-        bbb[name_col]
-        .astype(str)
-        .str.strip()
-        .replace("", pd.NA)
-        .dropna()
-        .unique()
-        .tolist()
-    )
-
-    drugs = sorted(drugs)
-
-    #  DEBUG / SAFE MODE
-    # Increase to 300500 once stable
-    drugs = drugs[:500]
-
-    print(f" Running Phase 3 on {len(drugs)} drugs")
+    # One literature search per structure: aliases (brand names, salts,
+    # stereo/duplicate entries) are mined under a representative name with
+    # the union of their search terms; final_merge fans results back out.
+    aliases = group_candidates(bbb[name_col], bbb["SMILES"] if "SMILES" in bbb.columns else None)
+    terms = group_terms(aliases)
+    print(f" Deduplicated {len(aliases)} candidate names into {len(terms)} structures")
 
-    # -------------------------------
-    # 2. Literature search (API)
-    # -------------------------------
-    papers_by_drug = batch_fetch(drugs)
+    # Highest Phase 2 score first; each run extends coverage from the checkpoint
+    # (with several indication profiles, a drug counts with its best Phase 2 score
+    # among the profiles' phase2_scored_drugs files found)
+    priority = None
+    for code in INDICATIONS:
+        path = indication_path(BBB_CSV_PATH, code)
+        scored = bbb if path == BBB_CSV_PATH else (pd.read_csv(path) if os.path.exists(path) else None)
+        if scored is None or SCHEDULE_PRIORITY_COL not in scored.columns or name_col not in scored.columns:
+            continue
+        scores = pd.Series(scored[SCHEDULE_PRIORITY_COL].to_numpy(), index=scored[name_col].astype(str).str.strip())
+        priority = scores if priority is None else pd.concat([priority, scores])
+    order = priority_order(aliases, priority)
 
     # -------------------------------
-    # 3. Evidence extraction
+    # Merge step of a sharded run: partitions -> the usual outputs
     # -------------------------------
-    rows = []
-    for drug, papers in tqdm(papers_by_drug.items(), desc="Extracting evidence"):
-        for paper in papers:
-            ev = extract_evidence(drug, paper)
-            if ev is not None:
-                rows.append(ev)
-
-    if not rows:
-        print(" No AD-relevant evidence extracted. Check gates.")
+    if args.merge_shards:
+        write_aliases(aliases)
+        for code in INDICATIONS:
+            df_papers, df_drugs = merge_shards(order, args.merge_shards, code)
+            if df_papers.empty:
+                print(f" No {code}-relevant evidence extracted. Check gates.")
+                continue
+            papers_path = indication_path(PAPERS_CSV_PATH, code)
+            evidence_path = indication_path(LIT_EVIDENCE_PATH, code)
+            write_csv_atomic(df_papers, papers_path)
+            write_csv_atomic(df_drugs, evidence_path)
+            build_store_from_csv(papers_path, indication_path(PAPER_STORE_PATH, code))
+            print(f" Merged {args.merge_shards} shards: {len(df_papers)} extracted papers, {len(df_drugs)} drugs")
+            print_summary(write_report(pd.read_csv(evidence_path, float_precision="round_trip"), code), code)
+        print(f" Indexed {update_index()} new papers for offline search")
+        print("\n Phase 3 complete")
         return
 
-    df_papers = pd.DataFrame(rows)
-    df_papers.to_csv(
-        os.path.join(OUT_DIR, "phase3_papers.csv"),
-        index=False,
-        encoding="utf-8"
-    )
-
-    print(f" Saved {len(df_papers)} extracted papers")
+    # Shards split the representatives by name hash; each keeps its own
+    # checkpoint, journal and feature cache, and writes output partitions.
+    # Aliases, the paper store and the offline index are left to the merge step.
+    shard = args.shard
+    if shard is not None:
+        order = [d for d in order if shard_of(d, shard[1]) == shard[0]]
+        print(f" Shard {shard[0]}/{shard[1]}: {len(order)} structures")
+    else:
+        write_aliases(aliases)
 
-    # -------------------------------
-    # 4. Drug-level aggregation
-    # -------------------------------
-    df_drugs = aggregate_drug_scores(df_papers)
+    journal = RunJournal(partition_path(JOURNAL_PATH, shard))
+    if args.reset_schedule:
+        journal.clear()
+    interrupted = journal.interrupted()
+    if interrupted is not None:
+        print(f" Resuming interrupted run {interrupted[0]} ({interrupted[1]} drugs fetched before it stopped)")
+    schedule = MiningSchedule(
+        order,
+        path=partition_path(SCHEDULE_PATH, shard),
+        max_drugs=args.max_drugs,
+        time_budget=args.time_budget,
+        request_budget=args.request_budget,
+        journal=journal,
+    )
+    if args.reset_schedule:
+        schedule.reset()
+    drugs = schedule.plan()
 
-    df_drugs.to_csv(
-        os.path.join(OUT_DIR, "phase3_lit_evidence.csv"),
-        index=False,
-        encoding="utf-8"
+    print(
+        f" Running Phase 3 on {len(drugs)} drugs "
+        f"({schedule.n_done} mined before, {len(schedule.failed)} failed before, "
+        f"up to {len(drugs) - schedule.n_done - len(schedule.failed)} new)"
     )
 
     # -------------------------------
-    # 5. Human-readable report
+    # 2-4. Search -> evidence extraction -> drug-level aggregation
     # -------------------------------
-    report_path = os.path.join(OUT_DIR, "phase3_report.txt")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write("Top 25 drugs by SIGNED Phase-3 evidence score\n")
-        f.write("=" * 60 + "\n\n")
-        f.write(df_drugs.head(25).to_string(index=False))
-        f.write("\n\n")
-        f.write("Columns explanation:\n")
-        f.write("- signed_score: net-positive AD evidence (final rank)\n")
-        f.write("- evidence_score: raw summed paper scores\n")
-        f.write("- net_positive: positive  negative papers\n")
-        f.write("- confidence: robustness proxy (papers + model diversity)\n")
+    # Streamed (see phase3_pipeline): papers are extracted and scored while
+    # later drugs are still being fetched; phase3_lit_evidence.csv is
+    # refreshed with partial results along the way.
 
-    print(" Saved phase3_papers.csv")
-    print(" Saved phase3_lit_evidence.csv")
-    print(" Saved phase3_report.txt")
+    # The checkpoint and journal track the API cache, so offline runs leave them alone
+    feature_cache = FeatureCache(shard=shard)
+    evidence_paths = {code: partition_path(indication_path(LIT_EVIDENCE_PATH, code), shard) for code in INDICATIONS}
+    if args.offline:
+        papers, drugs_ranked = run_pipeline(
+            drugs, terms, offline=True, feature_cache=feature_cache, evidence_paths=evidence_paths
+        )
+    else:
+        schedule.start()
+        journal.start(len(drugs))
+        try:
+            papers, drugs_ranked = run_pipeline(
+                drugs, terms, schedule=schedule, journal=journal,
+                feature_cache=feature_cache, evidence_paths=evidence_paths
+            )
+        except BaseException:
+            journal.finish(completed=False)
+            raise
+        journal.finish()
+        schedule.save()
+        print(journal.summary())
+        print(schedule.summary())
+        print(
+            f" Europe PMC requests this run: {REQUEST_STATS['requests']} "
+            f"({REQUEST_STATS['probes']} hit-count probes)"
+        )
+        # Keep the offline index in step with the cache
+        if shard is None:
+            print(f" Indexed {update_index()} new papers for offline search")
 
-    print("\n Top 10 Phase-3 candidates:")
-    print(
-        df_drugs.head(10)[
-            ["drug", "signed_score", "net_positive", "n_papers", "models"]
-        ]
-    )
+    if shard is not None:
+        # Written even when empty, so the merge step can tell the shard finished
+        for code in INDICATIONS:
+            write_csv_atomic(papers[code], partition_path(indication_path(PAPERS_CSV_PATH, code), shard))
+            write_csv_atomic(drugs_ranked[code], evidence_paths[code])
+        print(
+            f" Saved shard {shard[0]}/{shard[1]} partitions ({len(papers[INDICATIONS[0]])} papers); "
+            f"run --merge-shards {shard[1]} once every shard has finished"
+        )
+        return
+
+    for code in INDICATIONS:
+        write_outputs(code, papers[code], drugs_ranked[code])
 
     print("\n Phase 3 complete")
 
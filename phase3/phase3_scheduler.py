@@ -0,0 +1,181 @@
+# phase3/phase3_scheduler.py
+#
+# Priority-ordered, budgeted ("anytime") literature mining.
+# Drugs are mined in descending Phase 2 score rather than alphabetically, so a
+# run cut short by its drug, time or request budget still covers the most
+# promising candidates. Progress is checkpointed in SCHEDULE_PATH and, per
+# drug, in the run journal (phase3_journal): the next run replays mined drugs
+# from the cache (no requests), retries drugs whose search failed and extends
+# coverage further down the ranking.
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from common.ranking import rank_order
+
+try:
+    from .config import SCHEDULE_PATH, MAX_NEW_DRUGS_PER_RUN
+    from .phase3_search import REQUEST_STATS
+except ImportError:
+    from config import SCHEDULE_PATH, MAX_NEW_DRUGS_PER_RUN
+    from phase3_search import REQUEST_STATS
+
+# Run history kept in the checkpoint
+MAX_RUN_HISTORY = 50
+# New drugs between mid-run checkpoint writes
+CHECKPOINT_EVERY = 100
+
+def priority_order(aliases: pd.DataFrame, priority: pd.Series = None) -> list:
+    """
+    Representatives (see phase3_dedup) by descending priority, where a group
+    counts with its best alias. `priority` is indexed by candidate name; None
+    keeps the order of first appearance in `aliases`. Ties break by name.
+    """
+    if priority is None:
+        priority = pd.Series(-np.arange(len(aliases), dtype=float), index=aliases["drug"].to_numpy())
+    priority = pd.to_numeric(priority, errors="coerce").groupby(level=0).max()
+
+    best = (
+        aliases.assign(priority=aliases["drug"].map(priority))
+        .groupby("representative", sort=True)["priority"].max()
+    )
+    # NaN (no score) sorts last
+    return list(best.index[rank_order(best.to_numpy(), ties=best.index)])
+
+class MiningSchedule:
+    """
+    Checkpointed cursor over a priority order.
+    plan() lists what a run mines: every drug mined before (cache hits), the
+    ones whose search failed (retried) and the next `max_drugs` new ones. The
+    fetch stage calls mark_done() / mark_failed() per drug (checkpointing every
+    CHECKPOINT_EVERY new drugs) and stops once exhausted() reports the time or
+    request budget spent; save() closes the run. With a RunJournal, the latest
+    outcome per drug overrides the checkpoint, so an interrupted run resumes
+    at the exact drug it stopped at.
+    """
+
+    def __init__(self, order, path: str = SCHEDULE_PATH, max_drugs: int = MAX_NEW_DRUGS_PER_RUN,
+                 time_budget: float = None, request_budget: int = None, journal=None):
+        self.order = list(order)
+        self.path = path
+        self.max_drugs = max_drugs
+        self.time_budget = time_budget
+        self.request_budget = request_budget
+        self.runs = []
+        self.done = set()
+        self.failed = set()
+        self.new_done = 0
+        self.started = None
+        self.requests_at_start = 0
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.done = set(data.get("done", [])) & set(self.order)
+            self.failed = set(data.get("failed", [])) & set(self.order)
+            self.runs = data.get("runs", [])
+
+        if journal is not None:
+            known = set(self.order)
+            for drug, status in journal.latest().items():
+                if drug not in known:
+                    continue
+                if status == "error":
+                    self.done.discard(drug)
+                    self.failed.add(drug)
+                else:
+                    self.done.add(drug)
+                    self.failed.discard(drug)
+
+    def reset(self):
+        self.done = set()
+        self.failed = set()
+
+    @property
+    def n_done(self) -> int:
+        return len(self.done)
+
+    def plan(self) -> list:
+        """Drugs for this run, in priority order: mined and failed ones + the next max_drugs new ones."""
+        pending = [d for d in self.order if d not in self.done and d not in self.failed]
+        if self.max_drugs is not None:
+            pending = pending[:self.max_drugs]
+        todo = self.done | self.failed | set(pending)
+        return [d for d in self.order if d in todo]
+
+    def start(self):
+        self.started = time.monotonic()
+        self.requests_at_start = REQUEST_STATS["requests"]
+
+    def elapsed(self) -> float:
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def requests(self) -> int:
+        return REQUEST_STATS["requests"] - self.requests_at_start
+
+    def exhausted(self) -> bool:
+        """True once the time or request budget is spent (checked between drugs)."""
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            return True
+        if self.request_budget is not None and self.requests() >= self.request_budget:
+            return True
+        return False
+
+    def mark_failed(self, drug: str):
+        """A drug whose search failed: left pending, so the next run retries it."""
+        self.done.discard(drug)
+        self.failed.add(drug)
+
+    def mark_done(self, drug: str):
+        self.failed.discard(drug)
+        if drug not in self.done:
+            self.done.add(drug)
+            self.new_done += 1
+            if self.new_done % CHECKPOINT_EVERY == 0:
+                self.write()
+
+    def save(self):
+        """Records this run in the history and writes the final checkpoint."""
+        self.runs = (self.runs + [{
+            "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "new_drugs": self.new_done,
+            "failed": len(self.failed),
+            "requests": self.requests(),
+            "seconds": round(self.elapsed(), 1),
+        }])[-MAX_RUN_HISTORY:]
+        self.write()
+
+    def write(self):
+        """Atomically writes the checkpoint (done drugs in priority order + run history)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "done": [d for d in self.order if d in self.done],
+                "failed": [d for d in self.order if d in self.failed],
+                "n_total": len(self.order),
+                "runs": self.runs,
+            }, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def next_rank(self) -> int:
+        """1-based priority rank of the first drug not tried yet (0 when complete)."""
+        for i, d in enumerate(self.order, 1):
+            if d not in self.done and d not in self.failed:
+                return i
+        return 0
+
+    def summary(self) -> str:
+        nxt = self.next_rank()
+        tail = f"next run starts at priority rank {nxt}" if nxt else "all drugs mined"
+        if self.failed:
+            tail += f", retrying {len(self.failed)} failed drugs"
+        return (
+            f" Coverage: {self.n_done}/{len(self.order)} drugs mined "
+            f"(+{self.new_done} this run, {self.requests()} requests, {self.elapsed():.0f}s); {tail}"
+        )
@@ -1,4 +1,6 @@
 # phase3/phase3_score.py
+import re
+import numpy as np
 import pandas as pd
 
 try:
@@ -6,6 +8,11 @@ try:
 except ImportError:
     from config import MODEL_WEIGHTS
 
+from common.ranking import sort_ranked
+from common.schema import compact_papers, outcome_count, DIRECTIONS
+
+FEATURE_COLUMNS = ["drug", "model", "direction", "pos_hits", "neg_hits", "outcomes"]
+
 # ----------------------------------
 # Research-tool / anesthetic penalties
 # ----------------------------------
@@ -16,7 +23,17 @@ TOOL_PENALTY_TERMS = [
     "thiopental", "ketamine", "propofol"
 ]
 
-def apply_tool_penalty(drug_name: str, score: float) -> float:
+# ----------------------------------
+# Scoring constants (defaults reproduce the published ranking)
+# ----------------------------------
+SIGNAL_CAP = 6.0            # per-paper cap on (pos_hits - neg_hits)
+OUTCOME_BONUS = 0.3         # per distinct outcome tag
+EVIDENCE_CAP = 50.0         # drug-level cap on summed paper scores
+NET_POSITIVE_FACTOR = 0.15  # signed boost per net-positive paper
+NON_POSITIVE_FACTOR = 0.05  # kept fraction when evidence is neutral/negative
+TOOL_PENALTY = 0.2          # multiplier for research tools / anesthetics
+
+def apply_tool_penalty(drug_name: str, score: float, penalty: float = TOOL_PENALTY) -> float:
     """
     Penalize compounds that are likely research tools or anesthetics
     rather than disease-modifying therapies.
@@ -25,43 +42,68 @@ def apply_tool_penalty(drug_name: str, score: float) -> float:
         return score
     d = (drug_name or "").lower()
     if any(term in d for term in TOOL_PENALTY_TERMS):
-        return score * 0.2
+        return score * penalty
     return score
 
+def is_research_tool(names) -> np.ndarray:
+    """Vectorized TOOL_PENALTY_TERMS match over drug names."""
+    pattern = "|".join(re.escape(t) for t in TOOL_PENALTY_TERMS)
+    s = pd.Series(names, dtype=object).fillna("").astype(str).str.lower()
+    return s.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+
+def model_base_weights(models, model_weights=MODEL_WEIGHTS) -> np.ndarray:
+    fallback = model_weights.get("unknown", 0.2)
+    return pd.Series(models, dtype=object).map(model_weights).fillna(fallback).to_numpy(dtype=float)
 
-def paper_score(row):
+def paper_scores(base, signal, n_outcomes,
+                 signal_cap: float = SIGNAL_CAP, outcome_bonus: float = OUTCOME_BONUS) -> np.ndarray:
     """
     Per-paper score:
     - rewards positive net signal (pos_hits - neg_hits)
     - caps signal so long abstracts don't dominate
     - adds outcome diversity bonus
+    Array inputs broadcast, so a leading resample/weight axis is allowed.
     """
-    base = MODEL_WEIGHTS.get(row.get("model", "unknown"), 0.2)
-
-    pos = float(row.get("pos_hits", 0) or 0)
-    neg = float(row.get("neg_hits", 0) or 0)
-
-    signal = pos - neg
-    if signal <= 0:
-        return 0.0
+    return np.where(
+        signal > 0,
+        base * np.minimum(signal, signal_cap) + outcome_bonus * n_outcomes,
+        0.0
+    )
 
-    capped = min(signal, 6.0)
+def signed_scores(evidence, net_positive, is_tool,
+                  evidence_cap: float = EVIDENCE_CAP,
+                  net_positive_factor: float = NET_POSITIVE_FACTOR,
+                  non_positive_factor: float = NON_POSITIVE_FACTOR,
+                  tool_penalty: float = TOOL_PENALTY):
+    """
+    Drug-level signed score from summed paper scores.
+    Returns (capped evidence_score, signed_score); inputs broadcast.
+    """
+    # Prevent "volume-only" domination
+    evidence = np.minimum(evidence, evidence_cap)
 
-    outcomes = str(row.get("outcomes", "") or "")
-    outcome_count = len([x for x in outcomes.split(";") if x.strip()])
-    outcome_bonus = 0.3 * outcome_count
+    # Heavy penalty if evidence is neutral or negative
+    signed = np.where(
+        net_positive > 0,
+        evidence * (1 + net_positive_factor * net_positive),
+        evidence * non_positive_factor
+    )
 
-    return base * capped + outcome_bonus
+    # Research-tool penalty (only on positive scores)
+    signed = np.where(is_tool & (signed > 0), signed * tool_penalty, signed)
+    return evidence, signed
 
 
-def aggregate_drug_scores(df_papers: pd.DataFrame):
+def aggregate_drug_scores(df_papers: pd.DataFrame, sort: bool = True, model_weights: dict = MODEL_WEIGHTS):
     """
     Drug-level aggregation:
     - sums paper_score
     - computes net positivity (n_positive - n_negative)
     - computes signed_score (direction-aware)
     - applies research-tool penalties
-    - returns sorted dataframe
+    - weighs study models by `model_weights` (the indication profile's)
+    - returns dataframe ranked by signed_score (sort=False keeps drug order;
+      use common.ranking.top_k when only the head is needed)
     """
 
     if df_papers is None or df_papers.empty:
@@ -71,19 +113,43 @@ def aggregate_drug_scores(df_papers: pd.DataFrame):
             "models", "confidence"
         ])
 
-    df = df_papers.copy()
-    df["paper_score"] = df.apply(paper_score, axis=1)
-
-    agg = df.groupby("drug").agg(
-        evidence_score=("paper_score", "sum"),
-        n_papers=("paper_score", "count"),
-        n_positive=("direction", lambda s: (s == "positive").sum()),
-        n_negative=("direction", lambda s: (s == "negative").sum()),
-        models=("model", lambda s: ";".join(sorted(set(s))))
-    ).reset_index()
-
-    # Prevent "volume-only" domination
-    agg["evidence_score"] = agg["evidence_score"].clip(upper=50)
+    # Codes, not strings: categoricals + outcome bitmask (common.schema)
+    df = compact_papers(df_papers[[c for c in FEATURE_COLUMNS if c in df_papers.columns]])
+    df = df[df["drug"].notna()]
+    drug_codes = df["drug"].cat.codes.to_numpy()
+    drug_names = df["drug"].cat.categories
+    n_slots = len(drug_names)
+
+    model_codes = df["model"].cat.codes.to_numpy()
+    model_names = df["model"].cat.categories
+    fallback = model_weights.get("unknown", 0.2)
+    weight_table = np.array([model_weights.get(m, fallback) for m in model_names] + [fallback])
+    base = weight_table[np.where(model_codes < 0, len(model_names), model_codes)]
+
+    signal = (df["pos_hits"].astype(float) - df["neg_hits"].astype(float)).to_numpy()
+    scores = paper_scores(base, signal, outcome_count(df["outcome_mask"]))
+
+    direction = df["direction"].cat.codes.to_numpy()
+    is_pos = (direction == DIRECTIONS.index("positive")).astype(float)
+    is_neg = (direction == DIRECTIONS.index("negative")).astype(float)
+
+    n_papers = np.bincount(drug_codes, minlength=n_slots)
+    present = n_papers > 0  # categories can outlive filtered rows
+
+    # Distinct models per drug: unique (drug, model) code pairs, names in sorted order
+    pairs = pd.DataFrame({"drug": drug_codes, "model": model_codes}).drop_duplicates()
+    pairs = pairs[pairs["model"] >= 0]
+    pairs["name"] = np.asarray(model_names, dtype=object)[pairs["model"].to_numpy()]
+    models = pairs.sort_values(["drug", "name"]).groupby("drug")["name"].agg(";".join)
+
+    agg = pd.DataFrame({
+        "drug": np.asarray(drug_names, dtype=object),
+        "evidence_score": np.bincount(drug_codes, weights=scores, minlength=n_slots),
+        "n_papers": n_papers,
+        "n_positive": np.bincount(drug_codes, weights=is_pos, minlength=n_slots).astype(int),
+        "n_negative": np.bincount(drug_codes, weights=is_neg, minlength=n_slots).astype(int),
+        "models": models.reindex(np.arange(n_slots), fill_value="").to_numpy(),
+    })[present].reset_index(drop=True)
 
     # Net positivity
     agg["net_positive"] = agg["n_positive"] - agg["n_negative"]
@@ -91,19 +157,10 @@ def aggregate_drug_scores(df_papers: pd.DataFrame):
     # ----------------------------
     # Signed score (core ranking)
     # ----------------------------
-    agg["signed_score"] = agg["evidence_score"] * (1 + 0.15 * agg["net_positive"])
-
-    # Heavy penalty if evidence is neutral or negative
-    agg.loc[agg["net_positive"] <= 0, "signed_score"] = (
-        agg.loc[agg["net_positive"] <= 0, "evidence_score"] * 0.05
-    )
-
-    # ----------------------------
-    # Apply research-tool penalty
-    # ----------------------------
-    agg["signed_score"] = agg.apply(
-        lambda r: apply_tool_penalty(r["drug"], r["signed_score"]),
-        axis=1
+    agg["evidence_score"], agg["signed_score"] = signed_scores(
+        agg["evidence_score"].to_numpy(),
+        agg["net_positive"].to_numpy(),
+        is_research_tool(agg["drug"])
     )
 
     # ----------------------------
@@ -115,6 +172,7 @@ def aggregate_drug_scores(df_papers: pd.DataFrame):
     ) / 2.0
 
     # Final sort
-    agg = agg.sort_values("signed_score", ascending=False)
+    if sort:
+        agg = sort_ranked(agg, "signed_score")
 
     return agg
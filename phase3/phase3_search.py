@@ -7,12 +7,25 @@ import requests
 from tqdm import tqdm
 
 try:
-    from .config import CACHE_DIR, MAX_PAPERS_PER_DRUG
+    from .config import (
+        CACHE_DIR, CACHE_EMPTY_TTL_DAYS, MAX_PAPERS_PER_SEARCH, PLANNER_PAGE_SIZE,
+        PROBE_CACHE_DIR, PROBE_TTL_DAYS, PROBE_SLEEP_SECONDS, SEARCH_SCOPE, DEFAULT_INDICATION
+    )
+    from .phase3_planner import drug_terms, build_query, plan_queries, attribute_papers, select_papers
+    from .phase3_index import search_papers
 except ImportError:
-    from config import CACHE_DIR, MAX_PAPERS_PER_DRUG
+    from config import (
+        CACHE_DIR, CACHE_EMPTY_TTL_DAYS, MAX_PAPERS_PER_SEARCH, PLANNER_PAGE_SIZE,
+        PROBE_CACHE_DIR, PROBE_TTL_DAYS, PROBE_SLEEP_SECONDS, SEARCH_SCOPE, DEFAULT_INDICATION
+    )
+    from phase3_planner import drug_terms, build_query, plan_queries, attribute_papers, select_papers
+    from phase3_index import search_papers
 
 EPMC_API = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
 
+# Running totals for the current process (reported by the run controller)
+REQUEST_STATS = {"requests": 0, "probes": 0}
+
 def safe_cache_name(drug: str) -> str:
     """
     Generate a filesystem-safe cache filename using hash.
@@ -20,31 +33,88 @@ def safe_cache_name(drug: str) -> str:
     h = hashlib.sha1(drug.encode("utf-8")).hexdigest()[:16]
     return f"epmc_{h}.json"
 
-def fetch_drug_papers(drug: str):
-    cache_name = safe_cache_name(drug)
-    cache_path = os.path.join(CACHE_DIR, cache_name)
+def cache_key(drug: str, terms=None) -> str:
+    """
+    Cache identity of a search. A drug searched with extra alias terms
+    (see phase3_dedup) gets its own entry, separate from the name-only search.
+    Searches for other indication profiles than AD alone (config.INDICATIONS)
+    carry their scope, so their union-query results never mix with AD's.
+    """
+    key = drug if terms is None or list(terms) == drug_terms(drug) else drug + "|" + "|".join(terms)
+    return key if SEARCH_SCOPE == DEFAULT_INDICATION else key + "||" + SEARCH_SCOPE
+
+# ------------------------------
+# Paper cache
+# ------------------------------
+# One JSON entry per search: {"key", "status", "ts", "papers"[, "error"]}
+#  ok     papers found; kept until the cache is cleared
+#  empty  the search found nothing; re-checked after CACHE_EMPTY_TTL_DAYS
+#  error  the request failed; never served, so the next run retries it
+# Entries written before status tags are a bare paper list (read as ok /
+# empty, dated by the file's mtime).
+_LAST_STATUS = {}
 
-    if os.path.exists(cache_path):
+def read_entry(drug: str):
+    """Status-tagged cache entry of a search, or None if it was never fetched."""
+    cache_path = os.path.join(CACHE_DIR, safe_cache_name(drug))
+    try:
         with open(cache_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return None  # torn write from before entries were written atomically
+    if isinstance(entry, list):
+        entry = {
+            "key": drug, "status": "ok" if entry else "empty",
+            "ts": os.path.getmtime(cache_path), "papers": entry
+        }
+    return entry
 
-    params = {
-        "query": f'"{drug}" AND Alzheimer',
-        "format": "json",
-        "pageSize": MAX_PAPERS_PER_DRUG,
-        "resultType": "core"
-    }
+def entry_fresh(entry: dict, ttl_days: float = CACHE_EMPTY_TTL_DAYS) -> bool:
+    """Whether an entry can be served instead of searching again."""
+    if entry["status"] == "ok":
+        return True
+    if entry["status"] == "empty":
+        return time.time() - entry.get("ts", 0) <= ttl_days * 86400
+    return False
 
-    try:
-        r = requests.get(EPMC_API, params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-        papers = data.get("resultList", {}).get("result", [])
-    except Exception as e:
-        print(f" API error for {drug}: {e}")
-        papers = []
+def read_cache(drug: str):
+    """Cached paper list for a search, or None if it must be fetched (again)."""
+    entry = read_entry(drug)
+    if entry is None or not entry_fresh(entry):
+        return None
+    _LAST_STATUS[drug] = entry["status"]
+    return entry.get("papers", [])
+
+def write_cache(drug: str, papers, error=None):
+    """
+    Writes a cache entry: "error" when `error` is given, else "ok" / "empty".
+    Written next to the entry and renamed over it, so a crash never leaves a torn file.
+    """
+    status = "error" if error is not None else ("ok" if papers else "empty")
+    entry = {"key": drug, "status": status, "ts": time.time(), "papers": [] if error is not None else papers}
+    if error is not None:
+        entry["error"] = str(error)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(CACHE_DIR, safe_cache_name(drug))
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, cache_path)
+    _LAST_STATUS[drug] = status
 
-    # De-duplicate by PMID/DOI
+def fetch_status(drug: str, terms=None):
+    """Status ("ok", "empty", "error") behind the papers last returned for a drug."""
+    key = cache_key(drug, terms)
+    if key not in _LAST_STATUS:
+        entry = read_entry(key)
+        return None if entry is None else entry["status"]
+    return _LAST_STATUS[key]
+
+def dedup_papers(papers):
+    """De-duplicate by PMID/DOI, keeping API order."""
     seen = set()
     dedup = []
     for p in papers:
@@ -52,17 +122,244 @@ def fetch_drug_papers(drug: str):
         if key and key not in seen:
             seen.add(key)
             dedup.append(p)
+    return dedup
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    with open(cache_path, "w", encoding="utf-8") as f:
-        json.dump(dedup, f, indent=2)
+def epmc_search(params: dict) -> dict:
+    """One Europe PMC search request (raises on HTTP errors)."""
+    REQUEST_STATS["requests"] += 1
+    r = requests.get(EPMC_API, params={"format": "json", **params}, timeout=30)
+    r.raise_for_status()
+    return r.json()
+
+# ------------------------------
+# Hit-count probes
+# ------------------------------
+def _probe_path(query: str) -> str:
+    h = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(PROBE_CACHE_DIR, f"probe_{h}.json")
+
+def read_probe(query: str, ttl_days: float = PROBE_TTL_DAYS):
+    """Cached hit count of a query, or None if never probed / older than the TTL."""
+    path = _probe_path(query)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    if time.time() - entry.get("ts", 0) > ttl_days * 86400:
+        return None
+    return int(entry["hits"])
+
+def write_probe(query: str, hits: int):
+    os.makedirs(PROBE_CACHE_DIR, exist_ok=True)
+    path = _probe_path(query)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"query": query, "hits": int(hits), "ts": time.time()}, f)
+    os.replace(tmp_path, path)
+
+def probe_hits(query: str) -> int:
+    """
+    Hit count of a query without its records: an idlist request for one id,
+    cached separately from paper lists (PROBE_TTL_DAYS). Raises on HTTP errors.
+    """
+    hits = read_probe(query)
+    if hits is not None:
+        return hits
+
+    REQUEST_STATS["probes"] += 1
+    try:
+        data = epmc_search({"query": query, "pageSize": 1, "resultType": "idlist"})
+    finally:
+        time.sleep(PROBE_SLEEP_SECONDS)
+    hits = int(data.get("hitCount", 0) or 0)
+    write_probe(query, hits)
+    return hits
+
+def _try_probe(batch, terms: dict):
+    try:
+        return probe_hits(build_query([t for d in batch for t in terms[d]]))
+    except Exception as e:
+        print(f" Probe error for batch of {len(batch)} drugs: {e}")
+        return None
+
+def _split_probe(batch, hits, terms: dict, counts: dict):
+    """Halves a batch with hits; a zero-hit left half means the right half holds them all."""
+    if hits == 0 or len(batch) == 1:
+        counts.update({d: hits for d in batch})
+        return
+    mid = len(batch) // 2
+    left, right = batch[:mid], batch[mid:]
+    left_hits = _try_probe(left, terms)
+    right_hits = hits if left_hits == 0 and hits is not None else _try_probe(right, terms)
+    _split_probe(left, left_hits, terms, counts)
+    _split_probe(right, right_hits, terms, counts)
+
+def probe_drugs(drugs, terms: dict) -> dict:
+    """
+    Adaptive group testing over OR-queries: a batch with zero hits clears all
+    of its drugs in one probe; batches with hits are halved down to single
+    drugs. Returns {drug: hit count}; a drug whose probe failed maps to None.
+    """
+    counts = {}
+    for batch in plan_queries({d: terms[d] for d in drugs}):
+        _split_probe(batch, _try_probe(batch, terms), terms, counts)
+    return counts
+
+# ------------------------------
+# Core retrieval
+# ------------------------------
+def fetch_drug_papers(drug: str, terms=None, hits: int = None):
+    """
+    Core records for one drug (cached). `hits` is a known hit count from a
+    probe: 0 skips the request, otherwise pageSize is sized to it.
+    Papers go through the same attribution and selection as a batch
+    (attribute_papers, select_papers).
+    A failed request returns no papers and is cached as an error (see fetch_status).
+    """
+    key = cache_key(drug, terms)
+    cached = read_cache(key)
+    if cached is not None:
+        return cached
+
+    if hits == 0:
+        write_cache(key, [])
+        return []
+
+    terms = terms or drug_terms(drug)
+    params = {
+        "query": build_query(terms),
+        "pageSize": min(hits, PLANNER_PAGE_SIZE) if hits else PLANNER_PAGE_SIZE,
+        "resultType": "core"
+    }
+
+    try:
+        data = epmc_search(params)
+    except Exception as e:
+        # Not a "no papers" answer: tagged as an error so the next run retries it
+        print(f" API error for {drug}: {e}")
+        write_cache(key, [], error=e)
+        time.sleep(1.0)
+        return []
+
+    papers = dedup_papers(data.get("resultList", {}).get("result", []))
+    papers = select_papers(attribute_papers(papers, {drug: terms})[drug], MAX_PAPERS_PER_SEARCH)
+    write_cache(key, papers)
 
     time.sleep(1.0)  # be polite to API
-    return dedup
+    return papers
+
+def iter_planned(drugs, terms=None):
+    """
+    Batched search: packs many drugs into one OR-query (see phase3_planner),
+    then attributes returned papers back to drugs by name matching.
+    Each batch is probed first (probe_hits): a zero-hit batch needs no core
+    request at all, a batch with more hits than one page holds is split in
+    half and probed again (so no drug is crowded out), and the rest is
+    fetched with pageSize sized to the hit count. A batch whose request
+    fails is split in half the same way; a single drug that fails is cached
+    as an error. Single-drug batches are attributed and selected like any
+    other (select_papers), so a drug gets the same papers whatever it was
+    batched with. Results land in the per-drug cache. `terms` optionally
+    overrides the search terms of some drugs.
+    Yields (drug, papers) as soon as each batch is attributed.
+    """
+    terms = {d: (terms or {}).get(d) or drug_terms(d) for d in drugs}
+    stack = list(reversed(plan_queries(terms)))
+
+    with tqdm(total=len(terms), desc="Searching Europe PMC (batched)") as pbar:
+        while stack:
+            batch = stack.pop()
+            single = len(batch) == 1
+            query = build_query([t for d in batch for t in terms[d]])
+
+            try:
+                hits = probe_hits(query)
+                data = None
+                if hits > 0 and (hits <= PLANNER_PAGE_SIZE or single):
+                    try:
+                        data = epmc_search({
+                            "query": query,
+                            "pageSize": min(hits, PLANNER_PAGE_SIZE),
+                            "resultType": "core"
+                        })
+                    finally:
+                        time.sleep(1.0)  # be polite to API
+            except Exception as e:
+                if single:
+                    # Tagged as an error so the next run retries it
+                    print(f" API error for {batch[0]}: {e}")
+                    write_cache(cache_key(batch[0], terms[batch[0]]), [], error=e)
+                    yield batch[0], []
+                    pbar.update(1)
+                else:
+                    print(f" API error for batch of {len(batch)} drugs: {e}")
+                    mid = len(batch) // 2
+                    stack.append(batch[mid:])
+                    stack.append(batch[:mid])
+                continue
+
+            if hits == 0:
+                # Nothing for any drug in the batch: no core request needed
+                for drug in batch:
+                    write_cache(cache_key(drug, terms[drug]), [])
+                    yield drug, []
+                    pbar.update(1)
+                continue
+
+            if data is None or (not single and int(data.get("hitCount", 0) or 0) > PLANNER_PAGE_SIZE):
+                # More hits than one page holds (possibly grown since the
+                # cached probe): split and probe the halves
+                mid = len(batch) // 2
+                stack.append(batch[mid:])
+                stack.append(batch[:mid])
+                continue
+
+            papers = dedup_papers(data.get("resultList", {}).get("result", []))
+            by_drug = attribute_papers(papers, {d: terms[d] for d in batch})
+
+            for drug in batch:
+                drug_papers = select_papers(by_drug[drug], MAX_PAPERS_PER_SEARCH)
+                write_cache(cache_key(drug, terms[drug]), drug_papers)
+                yield drug, drug_papers
+                pbar.update(1)
+
+def fetch_planned(drugs, terms=None):
+    """Dict form of iter_planned: {drug: papers} once every batch is done."""
+    return dict(iter_planned(drugs, terms))
+
+def iter_fetch(drugs, planned: bool = True, offline: bool = False, terms: dict = None):
+    """
+    Yields (drug, papers) for every drug as soon as its papers are available:
+    cache hits first, then either batched (planned) queries or one request
+    per drug with hits (after probe_drugs) for the rest. Consumers can start work while fetching continues
+    (see phase3_pipeline).
+    offline=True answers every drug from the local literature index instead.
+    `terms` maps a drug to its search terms (default: drug_terms(drug)).
+    """
+    terms = {d: (terms or {}).get(d) or drug_terms(d) for d in drugs}
+
+    if offline:
+        for drug in tqdm(drugs, desc="Searching local index"):
+            yield drug, search_papers(terms[drug])
+        return
+
+    todo = []
+    for drug in drugs:
+        cached = read_cache(cache_key(drug, terms[drug]))
+        if cached is not None:
+            yield drug, cached
+        else:
+            todo.append(drug)
 
-def batch_fetch(drugs):
-    all_papers = {}
-    for drug in tqdm(drugs, desc="Searching Europe PMC"):
-        all_papers[drug] = fetch_drug_papers(drug)
-    return all_papers
+    if planned and todo:
+        yield from iter_planned(todo, terms)
+    elif todo:
+        # Probe first: core requests only for drugs that have hits
+        hits = probe_drugs(todo, terms)
+        for drug in tqdm(todo, desc="Searching Europe PMC"):
+            yield drug, fetch_drug_papers(drug, terms[drug], hits=hits.get(drug))
 
+def batch_fetch(drugs, planned: bool = True, offline: bool = False, terms: dict = None):
+    """Papers for every drug, in `drugs` order (collects iter_fetch)."""
+    all_papers = dict(iter_fetch(drugs, planned, offline, terms))
+    return {drug: all_papers[drug] for drug in drugs}
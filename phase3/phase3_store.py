@@ -0,0 +1,128 @@
+# phase3/phase3_store.py
+import os
+import sqlite3
+import pandas as pd
+
+from common.schema import compact_papers
+
+try:
+    from .config import PAPERS_CSV_PATH, PAPER_STORE_PATH
+except ImportError:
+    from config import PAPERS_CSV_PATH, PAPER_STORE_PATH
+
+# Columns needed to render an evidence card (no abstract)
+CARD_COLUMNS = ["pmid", "doi", "title", "journal", "pub_year", "model", "direction", "outcomes"]
+
+# Columns the scoring kernel needs per paper
+FEATURE_COLUMNS = ["drug", "model", "direction", "pos_hits", "neg_hits", "outcomes"]
+
+def _connect_ro(path: str):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+def _finish_store(tmp_path: str, path: str):
+    with sqlite3.connect(tmp_path) as conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_drug ON papers(drug)")
+    conn.close()
+    os.replace(tmp_path, path)
+
+def write_paper_store(df_papers: pd.DataFrame, path: str = PAPER_STORE_PATH):
+    """
+    Writes extracted papers to a SQLite store indexed by drug.
+    Built next to phase3_papers.csv so readers can fetch one drug at a time.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with sqlite3.connect(tmp_path) as conn:
+        df_papers.to_sql("papers", conn, index=False)
+    conn.close()
+    _finish_store(tmp_path, path)
+
+def build_store_from_csv(csv_path: str = PAPERS_CSV_PATH, path: str = PAPER_STORE_PATH,
+                         chunksize: int = 5000):
+    """
+    Builds the store from an existing phase3_papers.csv in fixed-size chunks,
+    so memory stays flat regardless of corpus size.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with sqlite3.connect(tmp_path) as conn:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype={"pmid": str}):
+            chunk.to_sql("papers", conn, index=False, if_exists="append")
+    conn.close()
+    _finish_store(tmp_path, path)
+
+def ensure_paper_store(csv_path: str = PAPERS_CSV_PATH, path: str = PAPER_STORE_PATH):
+    """
+    Returns the store path, (re)building it from the CSV if missing or stale.
+    Returns None if neither exists.
+    """
+    if not os.path.exists(csv_path):
+        return path if os.path.exists(path) else None
+
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        build_store_from_csv(csv_path, path)
+    return path
+
+def load_drug_papers(drug: str, limit: int = 5, path: str = PAPER_STORE_PATH) -> pd.DataFrame:
+    """
+    Evidence-card rows for one drug, in extraction order.
+    `paper_id` can be passed to load_abstract() when a card is expanded.
+    """
+    cols = ", ".join(CARD_COLUMNS)
+    conn = _connect_ro(path)
+    try:
+        return pd.read_sql(
+            f"SELECT rowid AS paper_id, {cols} FROM papers WHERE drug = ? ORDER BY rowid LIMIT ?",
+            conn,
+            params=(drug, limit)
+        )
+    finally:
+        conn.close()
+
+def load_papers_by_id(paper_ids, path: str = PAPER_STORE_PATH) -> pd.DataFrame:
+    """Evidence-card rows for known store rowids (e.g. from the dashboard snapshot), in rowid order."""
+    ids = [int(i) for i in paper_ids]
+    if not ids:
+        return pd.DataFrame(columns=["paper_id"] + CARD_COLUMNS)
+    cols = ", ".join(CARD_COLUMNS)
+    conn = _connect_ro(path)
+    try:
+        return pd.read_sql(
+            f"SELECT rowid AS paper_id, {cols} FROM papers "
+            f"WHERE rowid IN ({', '.join('?' * len(ids))}) ORDER BY rowid",
+            conn,
+            params=ids
+        )
+    finally:
+        conn.close()
+
+def load_paper_cards(path: str = PAPER_STORE_PATH) -> pd.DataFrame:
+    """Evidence-card rows for every drug (no abstracts), in extraction order."""
+    cols = ", ".join(CARD_COLUMNS)
+    conn = _connect_ro(path)
+    try:
+        return pd.read_sql(f"SELECT drug, rowid AS paper_id, {cols} FROM papers ORDER BY rowid", conn)
+    finally:
+        conn.close()
+
+def load_abstract(paper_id: int, path: str = PAPER_STORE_PATH):
+    """Abstract of one stored paper ("" if it has none), None if there is no such paper."""
+    conn = _connect_ro(path)
+    try:
+        row = conn.execute("SELECT abstract FROM papers WHERE rowid = ?", (int(paper_id),)).fetchone()
+    finally:
+        conn.close()
+    return (row[0] or "") if row else None
+
+def load_paper_features(path: str = PAPER_STORE_PATH) -> pd.DataFrame:
+    """Per-paper scoring features for every drug (no titles or abstracts), in compact dtypes."""
+    cols = ", ".join(FEATURE_COLUMNS)
+    conn = _connect_ro(path)
+    try:
+        return compact_papers(pd.read_sql(f"SELECT {cols} FROM papers ORDER BY rowid", conn))
+    finally:
+        conn.close()
@@ -0,0 +1,79 @@
+# tests/test_phase3_ingest.py
+#
+# Offline ingest on two tiny dumps (tests/fixtures): the disease-term gate
+# and the (path, mtime) skip on re-ingest.
+#
+#   python -m pytest tests
+
+import os
+import shutil
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from phase3.phase3_ingest import ingest_dump, iter_dump, is_ad_relevant
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PUBMED_XML = os.path.join(FIXTURES, "pubmed_sample.xml")
+EPMC_JSONL = os.path.join(FIXTURES, "epmc_sample.jsonl")
+
+def indexed(index_path: str) -> dict:
+    conn = sqlite3.connect(index_path)
+    try:
+        return dict(conn.execute("SELECT key, doi FROM papers").fetchall())
+    finally:
+        conn.close()
+
+def test_pubmed_records():
+    records = list(iter_dump(PUBMED_XML))
+    assert [r["pmid"] for r in records] == ["90000001", "90000002", "90000003"]
+    assert records[0]["doi"] == "10.1000/fixture.1"   # ELocationID
+    assert records[2]["doi"] == "10.1000/fixture.3"   # ArticleIdList
+    assert records[1]["pubYear"] == "2019"            # MedlineDate
+    assert "Alzheimer's disease" in records[0]["title"]
+    assert records[0]["chemicalList"]["chemical"] == [{"name": "Donepezil"}]
+
+def test_disease_gate_pubmed(tmp_path):
+    index_path = str(tmp_path / "index.sqlite")
+    stats = ingest_dump(PUBMED_XML, index_path)
+
+    assert stats == {"records": 3, "kept": 2, "added": 2, "skipped": False}
+    # the hypertension paper has no disease term; the tau paper passes on its abstract
+    assert indexed(index_path) == {"90000001": "10.1000/fixture.1", "90000003": "10.1000/fixture.3"}
+
+def test_disease_gate_jsonl(tmp_path):
+    index_path = str(tmp_path / "index.sqlite")
+    stats = ingest_dump(EPMC_JSONL, index_path)
+
+    assert stats == {"records": 3, "kept": 2, "added": 2, "skipped": False}
+    # a record without PMID is keyed by its DOI
+    assert set(indexed(index_path)) == {"90000001", "10.1000/fixture.5"}
+    assert not is_ad_relevant({"title": "Metformin in type 2 diabetes", "abstractText": None})
+
+def test_dumps_share_one_index(tmp_path):
+    index_path = str(tmp_path / "index.sqlite")
+    ingest_dump(PUBMED_XML, index_path)
+    stats = ingest_dump(EPMC_JSONL, index_path)
+
+    # 90000001 is in both dumps and stays indexed once
+    assert stats["kept"] == 2 and stats["added"] == 1
+    assert set(indexed(index_path)) == {"90000001", "90000003", "10.1000/fixture.5"}
+
+def test_reingest_skips_unchanged_dump(tmp_path):
+    dump = str(tmp_path / "pubmed_sample.xml")
+    shutil.copy(PUBMED_XML, dump)
+    index_path = str(tmp_path / "index.sqlite")
+
+    assert not ingest_dump(dump, index_path)["skipped"]
+    assert ingest_dump(dump, index_path) == {"records": 0, "kept": 0, "added": 0, "skipped": True}
+
+    # force re-reads it; nothing new is added
+    stats = ingest_dump(dump, index_path, force=True)
+    assert not stats["skipped"] and stats["records"] == 3 and stats["added"] == 0
+
+    # a newer mtime means the dump changed: read again
+    st = os.stat(dump)
+    os.utime(dump, (st.st_atime, st.st_mtime + 60))
+    stats = ingest_dump(dump, index_path)
+    assert not stats["skipped"] and stats["records"] == 3
+    assert ingest_dump(dump, index_path)["skipped"]
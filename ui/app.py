@@ -1,17 +1,36 @@
+from __future__ import annotations
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import os
+import sys
+import threading
+
+# Project root on the path so the phase packages are importable
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Heavy modules (pandas, plotly, the pipeline packages) are imported inside the
+# functions / the dashboard branch: the Overview page renders without them.
 
 # ---------------------------
 # Constants & Config
 # ---------------------------
 FINAL_PATH = "final_ranked_candidates.csv"
+SNAPSHOT_PATH = "dashboard_snapshot"   # written by final_merge.py (common.snapshot)
 PAPERS_PATH = "phase3/outputs/phase3_papers.csv"
+PAPERS_DB_PATH = "phase3/outputs/phase3_papers.sqlite"
+EVIDENCE_CARDS = 5
+LIT_PAGE_SIZE = 10
+ANALOG_K = 8
 PAGE_TITLE = "NeuroScreen | Alzheimer's Prioritization"
 LAYOUT = "wide"
 
+# Landscape chart: above this many points switch to WebGL + density bins
+LARGE_DATA_THRESHOLD = 20_000
+DETAIL_POINTS = 2_000      # points sent with full hover detail in large mode
+DENSITY_BINS = 120         # bins per axis for the aggregated background
+
 # ---------------------------
 # Page Setup & Custom CSS
 # ---------------------------
@@ -93,19 +112,278 @@ st.markdown("""
 # ---------------------------
 # Data Loading (Cached)
 # ---------------------------
+@st.cache_resource
+def snapshot():
+    """Memory-mapped dashboard snapshot, or None when missing / stale (CSV fallback)."""
+    from common.snapshot import Snapshot
+    return Snapshot.open(SNAPSHOT_PATH)
+
 @st.cache_data
 def load_data():
-    """Loads data with error handling for missing files."""
+    """Loads the final ranking with error handling for missing files."""
+    import pandas as pd
+    from common.schema import load_final
+
     try:
+        snap = snapshot()
+        if snap is not None:
+            return snap.frame()
+
         if not os.path.exists(FINAL_PATH):
-            return pd.DataFrame(), pd.DataFrame()
-            
-        final_df = pd.read_csv(FINAL_PATH)
-        papers_df = pd.read_csv(PAPERS_PATH) if os.path.exists(PAPERS_PATH) else pd.DataFrame()
-        return final_df, papers_df
+            return pd.DataFrame()
+
+        # Compact dtypes: categorical models, int16 counts, float64 scores
+        return load_final(FINAL_PATH)
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return pd.DataFrame(), pd.DataFrame()
+        return pd.DataFrame()
+
+@st.cache_resource
+def paper_store():
+    """Path of the indexed paper store (built once from the CSV if needed)."""
+    from phase3.phase3_store import ensure_paper_store
+
+    try:
+        return ensure_paper_store(PAPERS_PATH, PAPERS_DB_PATH)
+    except Exception as e:
+        st.error(f"Error opening paper store: {e}")
+        return None
+
+@st.cache_data
+def drug_aliases() -> dict:
+    """Candidate name -> representative that Phase 3 mined in its place."""
+    from phase3.phase3_dedup import load_aliases, alias_map
+    return alias_map(load_aliases())
+
+@st.cache_data(max_entries=256)
+def load_evidence(drug: str, row: int, limit: int = EVIDENCE_CARDS) -> pd.DataFrame:
+    """
+    Evidence-card rows for one drug (via its representative); abstracts are fetched separately.
+    `row` is the drug's position in the ranking: the snapshot's paper index maps it to store rowids.
+    """
+    import pandas as pd
+    from phase3.phase3_store import load_drug_papers, load_papers_by_id
+    from phase3.phase3_dedup import resolve_alias
+
+    store = paper_store()
+    if store is None:
+        return pd.DataFrame()
+    snap = snapshot()
+    if snap is not None:
+        return load_papers_by_id(snap.paper_ids(row, limit), path=store)
+    return load_drug_papers(resolve_alias(drug, drug_aliases()), limit=limit, path=store)
+
+@st.cache_data(max_entries=1024)
+def load_paper_abstract(paper_id: int) -> str:
+    from phase3.phase3_store import load_abstract
+
+    store = paper_store()
+    return (load_abstract(paper_id, path=store) or "") if store else ""
+
+@st.cache_resource
+def analog_index():
+    """Fingerprint index in leaderboard order (the file final_merge wrote; rebuilt if stale)."""
+    from common.fingerprints import load_or_build, rdkit_available
+    from final_merge import FP_INDEX_PATH
+
+    final_df = load_data()
+    if final_df.empty or "SMILES" not in final_df.columns or not rdkit_available():
+        return None
+    try:
+        return load_or_build(FP_INDEX_PATH, final_df["drug_name"].astype(str), final_df["SMILES"])
+    except Exception as e:
+        st.error(f"Error building fingerprint index: {e}")
+        return None
+
+@st.cache_resource
+def scoring_kernel():
+    """Feature arrays for live re-weighting, extracted once per process (or mapped from the snapshot)."""
+    from phase3.phase3_kernel import ScoringKernel
+    from phase3.phase3_store import load_paper_features
+
+    snap = snapshot()
+    if snap is not None:
+        kernel = snap.kernel()
+        if kernel is not None:
+            return kernel
+
+    final_df = load_data()
+    if final_df.empty:
+        return None
+    store = paper_store()
+    papers = load_paper_features(store) if store else None
+    return ScoringKernel(final_df, papers, aliases=drug_aliases())
+
+def rescore(final_df: pd.DataFrame, merge_weights: dict, params: dict) -> pd.DataFrame:
+    """
+    Re-scores the final table in memory with the sidebar weights.
+    Row order is left as-is; head lists are taken with top_k.
+    """
+    kernel = scoring_kernel()
+    if kernel is None:
+        return final_df
+    signed, final = kernel.score(merge_weights, params)
+    return final_df.assign(signed_score=signed, final_score=final)
+
+# ---------------------------
+# Landscape Chart Builders
+# ---------------------------
+LANDSCAPE_LABELS = {
+    "phase2_score": "Mechanism Plausibility (Bio)",
+    "signed_score": "Literature Sentiment (Text)",
+    "final_score": "Composite Rank"
+}
+
+def style_landscape(fig):
+    """Applies the dashboard theme to a landscape figure."""
+    fig.update_layout(
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font=dict(size=16, family="Helvetica Neue"),
+        title=dict(font=dict(size=24)),
+        xaxis=dict(title_font=dict(size=18), tickfont=dict(size=14)),
+        yaxis=dict(title_font=dict(size=18), tickfont=dict(size=14)),
+        legend=dict(font=dict(size=14))
+    )
+    return fig
+
+def focus_box(selection_state):
+    """Returns (x0, x1, y0, y1) of the last box selection on the chart, if any."""
+    try:
+        box = selection_state["selection"]["box"][0]
+        xs, ys = box["x"], box["y"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return min(xs), max(xs), min(ys), max(ys)
+
+def top_positions(score: np.ndarray, idx: np.ndarray, k: int) -> np.ndarray:
+    """Positions (from idx) of the k highest scores, without a full sort."""
+    from common.ranking import top_k_positions
+    return idx[top_k_positions(score[idx], k)]
+
+def landscape_figure(df: pd.DataFrame, focus=None):
+    """
+    Builds the Mechanism vs. Literature scatter.
+    Small tables use the full px.scatter encoding. Large tables switch to
+    WebGL: only the top-ranked (and box-selected) drugs are sent as points,
+    the rest is aggregated into density bins.
+    """
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    if len(df) <= LARGE_DATA_THRESHOLD:
+        fig = px.scatter(
+            df,
+            x="phase2_score",
+            y="signed_score",
+            size="final_score",
+            color="final_score",
+            hover_name="drug_name",
+            hover_data=["models", "n_papers"],
+            color_continuous_scale="Teal",
+            template="plotly_dark",
+            labels=LANDSCAPE_LABELS,
+            title="Candidate Cluster Analysis"
+        )
+        return style_landscape(fig)
+
+    x = df["phase2_score"].to_numpy(dtype=float)
+    y = df["signed_score"].to_numpy(dtype=float)
+    score = df["final_score"].to_numpy(dtype=float)
+
+    # Full detail only for the top-ranked drugs + the focused region
+    detail = np.zeros(len(df), dtype=bool)
+    detail[top_positions(score, np.arange(len(df)), DETAIL_POINTS)] = True
+    if focus is not None:
+        x0, x1, y0, y1 = focus
+        in_box = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        detail[top_positions(score, in_box, DETAIL_POINTS)] = True
+
+    zero_mass = ~detail & (y == 0)
+    other_mass = ~detail & (y != 0)
+
+    fig = go.Figure()
+
+    # Zero-evidence drugs collapse onto y=0: bin them along the mechanism axis
+    if zero_mass.any():
+        counts, edges = np.histogram(x[zero_mass], bins=DENSITY_BINS)
+        keep = counts > 0
+        fig.add_trace(go.Scattergl(
+            x=((edges[:-1] + edges[1:]) / 2)[keep],
+            y=np.zeros(int(keep.sum())),
+            mode="markers",
+            marker=dict(
+                symbol="square", color="#4B5563", opacity=0.6,
+                size=np.clip(4 + 3 * np.log10(counts[keep]), 4, 24)
+            ),
+            customdata=counts[keep],
+            hovertemplate="%{customdata} drugs without literature evidence<extra></extra>",
+            name="No evidence (binned)"
+        ))
+
+    # Remaining evidence-bearing drugs as a 2-D density background
+    if other_mass.any():
+        counts, xe, ye = np.histogram2d(x[other_mass], y[other_mass], bins=DENSITY_BINS)
+        fig.add_trace(go.Heatmap(
+            x=(xe[:-1] + xe[1:]) / 2,
+            y=(ye[:-1] + ye[1:]) / 2,
+            z=np.where(counts.T > 0, counts.T, np.nan),
+            colorscale="Greys",
+            opacity=0.5,
+            showscale=False,
+            hovertemplate="%{z:.0f} drugs<extra></extra>",
+            name="Density"
+        ))
+
+    top = df[detail]
+    fig.add_trace(go.Scattergl(
+        x=top["phase2_score"],
+        y=top["signed_score"],
+        mode="markers",
+        marker=dict(
+            color=top["final_score"],
+            colorscale="Teal",
+            size=4 + 16 * top["final_score"].clip(0, 1),
+            showscale=True,
+            colorbar=dict(title=LANDSCAPE_LABELS["final_score"])
+        ),
+        text=top["drug_name"],
+        customdata=top[["models", "n_papers"]].to_numpy(),
+        hovertemplate=(
+            "<b>%{text}</b><br>Bio: %{x:.3f}<br>Lit: %{y:.2f}"
+            "<br>models=%{customdata[0]}<br>n_papers=%{customdata[1]}<extra></extra>"
+        ),
+        name="Top-ranked / focus"
+    ))
+
+    fig.update_layout(
+        template="plotly_dark",
+        title="Candidate Cluster Analysis",
+        xaxis_title=LANDSCAPE_LABELS["phase2_score"],
+        yaxis_title=LANDSCAPE_LABELS["signed_score"]
+    )
+    return style_landscape(fig)
+
+@st.cache_resource
+def warm_dashboard():
+    """
+    Imports the dashboard's modules and builds a throwaway landscape in a
+    background thread, once per process, while the Overview page is read.
+    (Cold: pandas + plotly imports and the first figure cost ~0.7 s.)
+    """
+    def warm():
+        import pandas as pd
+        import final_merge, phase3.phase3_kernel, phase3.phase3_index, phase3.phase3_planner  # noqa: F401
+        import common.snapshot  # noqa: F401
+        landscape_figure(pd.DataFrame({
+            "drug_name": ["-"], "models": [""], "n_papers": [0],
+            "phase2_score": [0.0], "signed_score": [0.0], "final_score": [0.0],
+        }))
+
+    thread = threading.Thread(target=warm, name="warm_dashboard", daemon=True)
+    thread.start()
+    return thread
 
 # ---------------------------
 # SIDEBAR NAVIGATION & CONTROLS
@@ -124,9 +402,38 @@ with st.sidebar:
     
     # Show Controls ONLY if we are on the Dashboard page
     if page_selection == "📊 Analysis Dashboard":
+        from final_merge import MERGE_WEIGHTS
+        from phase3.phase3_kernel import DEFAULT_PARAMS
+
         st.subheader("Filter Candidates")
         top_n = st.slider("Display Top N Candidates", 5, 100, 15)
         min_confidence = st.slider("Min. Confidence Score", 0.0, 1.0, 0.0)
+
+        with st.expander("⚖️ Scoring Weights"):
+            st.caption("Re-rank live. Defaults reproduce the published ranking.")
+            merge_weights = {
+                "phase2": st.slider("Bio-Plausibility weight", 0.0, 1.0, MERGE_WEIGHTS["phase2"], 0.05),
+                "phase3": st.slider("Literature weight", 0.0, 1.0, MERGE_WEIGHTS["phase3"], 0.05),
+                "confidence": st.slider("Confidence weight", 0.0, 1.0, MERGE_WEIGHTS["confidence"], 0.05),
+            }
+            st.markdown("**Evidence model weights**")
+            model_weights = {
+                m: st.slider(m.replace("_", " ").title(), 0.0, 5.0, float(w), 0.1, key=f"mw_{m}")
+                for m, w in DEFAULT_PARAMS["model_weights"].items()
+            }
+            st.markdown("**Literature scoring**")
+            score_params = {
+                "model_weights": model_weights,
+                "net_positive_factor": st.slider(
+                    "Net-positive factor", 0.0, 0.5, DEFAULT_PARAMS["net_positive_factor"], 0.01
+                ),
+                "evidence_cap": st.slider(
+                    "Evidence cap", 5.0, 200.0, DEFAULT_PARAMS["evidence_cap"], 5.0
+                ),
+                "tool_penalty": st.slider(
+                    "Research-tool penalty", 0.0, 1.0, DEFAULT_PARAMS["tool_penalty"], 0.05
+                ),
+            }
         st.markdown("---")
 
     st.markdown(" **System Status**")
@@ -149,6 +456,7 @@ st.markdown("""
 # PAGE 1: PROJECT OVERVIEW (Home)
 # ==========================================
 if page_selection == "🏠 Project Overview":
+    warm_dashboard()
     st.markdown("### Accelerating Alzheimer’s Drug Discovery with AI")
     st.divider()
 
@@ -243,7 +551,15 @@ if page_selection == "🏠 Project Overview":
 # PAGE 2: ANALYSIS DASHBOARD (The Tool)
 # ==========================================
 elif page_selection == "📊 Analysis Dashboard":
-    final_df, papers_df = load_data()
+    import numpy as np
+    from common.ranking import top_k
+    from phase3.config import LIT_INDEX_PATH
+    from phase3.phase3_index import search_drug_papers, count_papers
+    from phase3.phase3_planner import drug_terms
+
+    final_df = load_data()
+    if not final_df.empty:
+        final_df = rescore(final_df, merge_weights, score_params)
 
     col_head_1, col_head_2 = st.columns([3, 1])
     with col_head_1:
@@ -271,35 +587,21 @@ elif page_selection == "📊 Analysis Dashboard":
     filtered_df = final_df[final_df['confidence'] >= min_confidence].copy()
 
     if not filtered_df.empty:
-        fig = px.scatter(
-            filtered_df,
-            x="phase2_score",
-            y="signed_score",
-            size="final_score",
-            color="final_score",
-            hover_name="drug_name",
-            hover_data=["models", "n_papers"],
-            color_continuous_scale="Teal",
-            template="plotly_dark",
-            labels={
-                "phase2_score": "Mechanism Plausibility (Bio)",
-                "signed_score": "Literature Sentiment (Text)",
-                "final_score": "Composite Rank"
-            },
-            title="Candidate Cluster Analysis"
-        )
-        
-        # Customize Layout
-        fig.update_layout(
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            font=dict(size=16, family="Helvetica Neue"),
-            title=dict(font=dict(size=24)),
-            xaxis=dict(title_font=dict(size=18), tickfont=dict(size=14)),
-            yaxis=dict(title_font=dict(size=18), tickfont=dict(size=14)),
-            legend=dict(font=dict(size=14))
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        large_mode = len(filtered_df) > LARGE_DATA_THRESHOLD
+        focus = focus_box(st.session_state.get("landscape")) if large_mode else None
+        fig = landscape_figure(filtered_df, focus)
+
+        if large_mode:
+            st.caption(
+                f"Large-data mode: {len(filtered_df):,} candidates. Top {DETAIL_POINTS:,} shown in detail, "
+                "the rest as density bins. Box-select a region to load its drugs in detail."
+            )
+            st.plotly_chart(
+                fig, use_container_width=True, key="landscape",
+                on_select="rerun", selection_mode="box"
+            )
+        else:
+            st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("No drugs meet the confidence threshold.")
 
@@ -316,7 +618,7 @@ elif page_selection == "📊 Analysis Dashboard":
             "signed_score", "n_papers", "confidence"
         ]
         
-        leaderboard_df = filtered_df[display_cols].head(top_n)
+        leaderboard_df = top_k(filtered_df, "final_score", top_n)[display_cols]
         
         st.dataframe(
             leaderboard_df,
@@ -347,12 +649,13 @@ elif page_selection == "📊 Analysis Dashboard":
     if search_query:
         dropdown_options = final_df[final_df["drug_name"].str.contains(search_query, case=False, na=False)]
     else:
-        dropdown_options = final_df.head(top_n)
+        dropdown_options = top_k(final_df, "final_score", top_n)
 
     if not dropdown_options.empty:
         selected_drug = st.selectbox("Select Candidate for Analysis", dropdown_options["drug_name"].unique())
         
-        drug_row = final_df[final_df["drug_name"] == selected_drug].iloc[0]
+        drug_pos = int(np.flatnonzero(final_df["drug_name"] == selected_drug)[0])
+        drug_row = final_df.iloc[drug_pos]
         
         m1, m2, m3, m4 = st.columns(4)
         with m1:
@@ -372,14 +675,27 @@ elif page_selection == "📊 Analysis Dashboard":
             **AI Confidence:** `{drug_row['confidence']:.2f}`
             """)
 
+        # Structural analogs: Tanimoto top-K over the whole BBB+ set
+        analogs = analog_index()
+        if analogs is not None:
+            with st.expander("🧪 Structural Analogs"):
+                self_pos = np.flatnonzero(analogs.keys == selected_drug)
+                if len(self_pos) == 0 or not isinstance(drug_row.get("SMILES"), str):
+                    st.caption("No structure available for this drug.")
+                else:
+                    pos, sims = analogs.query(analogs.fps[self_pos[0]], ANALOG_K, exclude=self_pos[0])
+                    analog_df = final_df.iloc[pos][["drug_name", "final_score", "phase2_score", "n_papers"]].copy()
+                    analog_df.insert(1, "tanimoto", sims.round(3))
+                    st.dataframe(analog_df, hide_index=True, use_container_width=True)
+
         st.subheader(f"📄 Evidence Stream: {selected_drug}")
         
-        drug_papers = papers_df[papers_df["drug"] == selected_drug]
+        drug_papers = load_evidence(selected_drug, drug_pos)
         
         if drug_papers.empty:
             st.info("No specific literature entries found in the indexed window.")
         else:
-            for _, row in drug_papers.head(5).iterrows():
+            for _, row in drug_papers.iterrows():
                 direction_color = "#00E5FF" if row['direction'] == 'positive' else "#FF5252"
                 
                 st.markdown(f"""
@@ -395,6 +711,26 @@ elif page_selection == "📊 Analysis Dashboard":
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
+
+                # Abstract is only read from the store once the card is expanded
+                if st.toggle("Show abstract", key=f"abstract_{row['paper_id']}"):
+                    st.caption(load_paper_abstract(int(row['paper_id'])) or "No abstract available.")
                 
+        # Offline literature search over every cached Europe PMC record
+        if os.path.exists(LIT_INDEX_PATH):
+            with st.expander("📚 Cached Literature (offline index)"):
+                n_hits = count_papers(drug_terms(selected_drug))
+                if n_hits == 0:
+                    st.caption("No cached papers mention this drug.")
+                else:
+                    n_pages = (n_hits - 1) // LIT_PAGE_SIZE + 1
+                    lit_page = st.number_input(f"Page (of {n_pages})", 1, n_pages, 1, key="lit_page")
+                    hits = search_drug_papers(
+                        selected_drug, limit=LIT_PAGE_SIZE, offset=(lit_page - 1) * LIT_PAGE_SIZE
+                    )
+                    st.caption(f"{n_hits} cached papers")
+                    for paper in hits:
+                        st.markdown(f"- **{paper.get('pubYear', '')}** {paper.get('title', '')}")
+
     else:
         st.info("No drugs found matching criteria.")
\ No newline at end of file